@@ -0,0 +1,106 @@
+"""
+Import time benchmark for study_lyte. Each module is imported in a fresh interpreter
+with python -X importtime and its cumulative import time recorded. Importing must also
+stay free of side effects, heavy dependencies a module does not need and any logging
+configuration are reported as failures.
+
+Usage:
+    python -m benchmarks.importtime
+    python -m benchmarks.importtime --save benchmarks/import_baseline.json
+    python -m benchmarks.importtime --compare benchmarks/import_baseline.json
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+from benchmarks.run_benchmarks import compare
+
+# Module imported and the dependencies it should not pull in
+MODULES = {
+    'study_lyte': ['numpy', 'pandas', 'matplotlib'],
+    'study_lyte.calibrations': ['numpy', 'pandas', 'matplotlib'],
+    'study_lyte.rolling': ['pandas', 'matplotlib'],
+    'study_lyte.stats': ['pandas', 'matplotlib'],
+    'study_lyte.plotting': ['matplotlib'],
+    'study_lyte.profile': ['matplotlib'],
+}
+
+CHECK = ("import json, logging, sys; "
+         "print(json.dumps({{'loaded': [m for m in {forbidden!r} if m in sys.modules], "
+         "'handlers': len(logging.getLogger().handlers)}}))")
+
+
+def import_once(module, forbidden):
+    """
+    Import a module in a new interpreter
+
+    Returns:
+        tuple:
+            **seconds**: Cumulative import time of the module
+            **report**: Dictionary of forbidden modules loaded and root logging handlers added
+    """
+    code = f"import {module}; " + CHECK.format(forbidden=forbidden)
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True, text=True,
+                            check=True)
+    cumulative = None
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        if name.strip() == module:
+            cumulative = int(cumulative_us)
+    return cumulative / 1e6, json.loads(result.stdout.splitlines()[-1])
+
+
+def run(modules, repeat=5):
+    results = {}
+    failures = []
+    for module, forbidden in modules.items():
+        runs = [import_once(module, forbidden) for i in range(repeat)]
+        seconds = min([r[0] for r in runs])
+        report = runs[0][1]
+        results[f'import.{module}'] = {'time': seconds, 'peak_memory': 0}
+
+        problems = []
+        if report['loaded']:
+            problems.append(f"imports {', '.join(report['loaded'])}")
+        if report['handlers']:
+            problems.append('configures logging')
+        if problems:
+            failures.append(module)
+        print(f"{module:<40} {seconds * 1000:10.1f} ms {'  FAIL: ' + '; '.join(problems) if problems else ''}",
+              flush=True)
+    return results, failures
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Benchmark the import time of study_lyte')
+    parser.add_argument('--modules', nargs='+', default=list(MODULES.keys()), help='Modules to import')
+    parser.add_argument('--repeat', type=int, default=5, help='Number of imports per module')
+    parser.add_argument('--save', help='Write results to this json as a baseline')
+    parser.add_argument('--compare', help='Compare results to this baseline json')
+    parser.add_argument('--time-tolerance', type=float, default=0.25, help='Allowed fractional slow down')
+    args = parser.parse_args(args)
+
+    results, failures = run({m: MODULES.get(m, []) for m in args.modules}, repeat=args.repeat)
+
+    if args.save:
+        with open(args.save, 'w') as fp:
+            json.dump(results, fp, indent=2, sort_keys=True)
+
+    regressions = []
+    if args.compare:
+        with open(args.compare) as fp:
+            baseline = json.load(fp)
+        regressions = compare(results, baseline, time_tolerance=args.time_tolerance)
+
+    if failures:
+        print(f'\n{len(failures)} module(s) have import side effects.')
+    if regressions:
+        print(f'\n{len(regressions)} import(s) regressed.')
+    return 1 if failures or regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
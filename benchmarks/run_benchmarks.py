@@ -0,0 +1,281 @@
+"""
+Benchmarks for study_lyte over the large files in tests/data and synthetic versions
+of them upsampled 10x and 100x (opt in with --scales 1 10 100, some of the
+quadratic algorithms take hours at that size). Each case records its best wall time and the peak
+memory allocated while running. Results can be saved as a baseline and later runs
+compared against it to flag regressions. benchmarks/baseline.json is the committed
+baseline make bench compares to, times depend on the machine so record it again
+(make bench-baseline) when comparing on different hardware.
+
+Usage:
+    python -m benchmarks.run_benchmarks --save benchmarks/baseline.json
+    python -m benchmarks.run_benchmarks --compare benchmarks/baseline.json
+    python -m benchmarks.run_benchmarks --scales 1 --filter detect
+    python -m benchmarks.run_benchmarks --scales 1 10 100 --repeat 1
+"""
+import argparse
+import json
+import logging
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+
+from study_lyte.adjustments import (aggregate_by_depth, get_neutral_bias_at_border, merge_on_to_time, merge_time_series,
+                                    remove_ambient, zfilter)
+from study_lyte.depth import get_constrained_baro_depth
+from study_lyte.detect import (get_acceleration_start, get_acceleration_stop, get_ground_strike, get_nir_stop,
+                               get_nir_surface, get_sensor_start, get_upward_motion)
+from study_lyte.io import find_metadata, read_csv, write_csv
+from study_lyte.profile import LyteProfileV6, Sensor
+from study_lyte.stats import bootstrap_regression
+
+DATA_DIR = Path(__file__).parent.parent.joinpath('tests', 'data')
+FIXTURES = ['pilots.csv', 'banner_legacy.csv', 'tester_stick.csv', 'kaslo.csv']
+SCALES = [1, 10]
+
+CASES = []
+
+
+def benchmark(name, requires_motion=False):
+    """Register a benchmark case, the function receives the prepared inputs"""
+    def register(func):
+        CASES.append(SimpleNamespace(name=name, func=func, requires_motion=requires_motion))
+        return func
+    return register
+
+
+@benchmark('io.read_csv')
+def bench_read_csv(ctx):
+    read_csv(str(ctx.path))
+
+
+@benchmark('io.find_metadata')
+def bench_find_metadata(ctx):
+    find_metadata(str(ctx.path))
+
+
+@benchmark('detect.get_acceleration_start', requires_motion=True)
+def bench_acceleration_start(ctx):
+    get_acceleration_start(ctx.neutral)
+
+
+@benchmark('detect.get_acceleration_stop', requires_motion=True)
+def bench_acceleration_stop(ctx):
+    get_acceleration_stop(ctx.neutral_backward)
+
+
+@benchmark('detect.get_nir_surface')
+def bench_nir_surface(ctx):
+    get_nir_surface(ctx.nir)
+
+
+@benchmark('detect.get_nir_stop')
+def bench_nir_stop(ctx):
+    get_nir_stop(ctx.df['Sensor3'])
+
+
+@benchmark('detect.get_sensor_start')
+def bench_sensor_start(ctx):
+    get_sensor_start(ctx.df['Sensor1'])
+
+
+@benchmark('detect.get_ground_strike')
+def bench_ground_strike(ctx):
+    get_ground_strike(ctx.df['Sensor1'], ctx.stop)
+
+
+@benchmark('detect.get_upward_motion')
+def bench_upward_motion(ctx):
+    get_upward_motion(ctx.df['depth'].values)
+
+
+@benchmark('adjustments.remove_ambient')
+def bench_remove_ambient(ctx):
+    remove_ambient(ctx.df['Sensor3'], ctx.df['Sensor2'])
+
+
+@benchmark('adjustments.aggregate_by_depth')
+def bench_aggregate_by_depth(ctx):
+    aggregate_by_depth(ctx.df[['Sensor1', 'depth']], resolution=1)
+
+
+@benchmark('adjustments.zfilter')
+def bench_zfilter(ctx):
+    zfilter(ctx.df['depth'].values, 0.4)
+
+
+@benchmark('adjustments.merge_on_to_time')
+def bench_merge_on_to_time(ctx):
+    merge_on_to_time(ctx.streams, ctx.df['time'].values)
+
+
+@benchmark('adjustments.merge_time_series')
+def bench_merge_time_series(ctx):
+    merge_time_series(ctx.streams)
+
+
+@benchmark('depth.get_constrained_baro_depth')
+def bench_constrained_baro_depth(ctx):
+    get_constrained_baro_depth(ctx.baro, ctx.start, ctx.stop, method='nanmean')
+
+
+@benchmark('depth.get_constrained_baro_depth[decimate=8]')
+def bench_constrained_baro_depth_decimated(ctx):
+    get_constrained_baro_depth(ctx.baro, ctx.start, ctx.stop, method='nanmean', decimate=8)
+
+
+@benchmark('stats.bootstrap_regression')
+def bench_bootstrap_regression(ctx):
+    bootstrap_regression(ctx.design, ctx.df['Sensor1'].values, n_resamples=200, seed=0)
+
+
+@benchmark('profile.fuse_depths', requires_motion=True)
+def bench_fuse_depths(ctx):
+    LyteProfileV6.fuse_depths(ctx.acc_depth, ctx.baro_depth, error=ctx.error)
+
+
+@benchmark('profile.report_card')
+def bench_report_card(ctx):
+    LyteProfileV6(ctx.path).report_card()
+
+
+def upsample(fixture, scale, directory):
+    """
+    Write a synthetic version of a fixture with scale times as many samples by
+    interpolating every column onto a denser time grid.
+    """
+    df, meta = read_csv(str(DATA_DIR.joinpath(fixture)))
+    n = len(df) * scale
+    time_data = df['time'].values
+    new_time = np.linspace(time_data[0], time_data[-1], n)
+    data = {c: np.interp(new_time, time_data, df[c].values) for c in df.columns if c != 'time'}
+    data['time'] = new_time
+
+    meta = meta.copy()
+    if 'SAMPLE RATE' in meta:
+        meta['SAMPLE RATE'] = int(meta['SAMPLE RATE']) * scale
+
+    path = Path(directory).joinpath(f'{Path(fixture).stem}_x{scale}.csv')
+    write_csv(df.__class__(data), meta, str(path))
+    return path
+
+
+def prepare(path):
+    """Build all the inputs for the benchmarks once so setup is not timed"""
+    df, meta = read_csv(str(path))
+    motion = LyteProfileV6.get_motion_name(df.columns)
+    ctx = SimpleNamespace(path=path, df=df, has_motion=motion != Sensor.UNAVAILABLE)
+    ctx.nir = remove_ambient(df['Sensor3'], df['Sensor2'])
+    ctx.design = np.column_stack([df['Sensor2'].values, df['Sensor3'].values, np.ones(len(df))])
+
+    profile = LyteProfileV6(path)
+    ctx.start = profile.start.index
+    ctx.stop = profile.stop.index
+    ctx.baro = df.set_index('time')['depth']
+    # Sensors at the full rate and a barometer at a lower rate
+    ctx.streams = [df[['time', 'Sensor1', 'Sensor2', 'Sensor3']].set_index('time'),
+                   df[['time', 'depth']].iloc[::8].set_index('time')]
+
+    if ctx.has_motion:
+        ctx.neutral = get_neutral_bias_at_border(df[motion])
+        ctx.neutral_backward = get_neutral_bias_at_border(df[motion], direction='backward')
+        ctx.acc_depth = profile.accelerometer.depth.values.copy()
+        ctx.baro_depth = profile.barometer.depth.values.copy()
+        ctx.error = profile.error.index
+    return ctx
+
+
+def measure(func, ctx, repeat):
+    """Return the best time of repeated runs and the peak memory of a separate run"""
+    times = []
+    for i in range(repeat):
+        t0 = time.perf_counter()
+        func(ctx)
+        times.append(time.perf_counter() - t0)
+
+    tracemalloc.start()
+    func(ctx)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'time': min(times), 'peak_memory': peak}
+
+
+def run(fixtures, scales, repeat=3, name_filter=None):
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for fixture in fixtures:
+            for scale in scales:
+                path = DATA_DIR.joinpath(fixture) if scale == 1 else upsample(fixture, scale, directory)
+                ctx = prepare(path)
+                for case in CASES:
+                    if name_filter is not None and name_filter not in case.name:
+                        continue
+                    if case.requires_motion and not ctx.has_motion:
+                        continue
+                    key = f'{case.name}[{fixture}@{scale}x]'
+                    results[key] = measure(case.func, ctx, repeat)
+                    print(f"{key:<60} {results[key]['time']:10.4f} s "
+                          f"{results[key]['peak_memory'] / 1e6:10.1f} MB", flush=True)
+    return results
+
+
+def compare(results, baseline, time_tolerance=0.25, memory_tolerance=0.10, min_time=1e-3):
+    """
+    Compare results to a baseline, returns the list of regressed benchmarks. Slow downs
+    smaller than min_time seconds are timer noise and never flagged.
+    """
+    regressions = []
+    print(f"\n{'Benchmark':<60} {'Time':>8} {'Memory':>8}")
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        base = baseline[key]
+        time_ratio = result['time'] / base['time'] if base['time'] else 1
+        memory_ratio = result['peak_memory'] / base['peak_memory'] if base['peak_memory'] else 1
+        flag = ''
+        slower = time_ratio > 1 + time_tolerance and result['time'] - base['time'] > min_time
+        if slower or memory_ratio > 1 + memory_tolerance:
+            flag = ' REGRESSION'
+            regressions.append(key)
+        print(f"{key:<60} {time_ratio:7.2f}x {memory_ratio:7.2f}x{flag}")
+    return regressions
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Benchmark study_lyte over the test data corpus')
+    parser.add_argument('--fixtures', nargs='+', default=FIXTURES, help='Files in tests/data to benchmark')
+    parser.add_argument('--scales', nargs='+', type=int, default=SCALES, help='Upsampling factors to run')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of timed runs per case')
+    parser.add_argument('--filter', dest='name_filter', help='Only run cases containing this text')
+    parser.add_argument('--save', help='Write results to this json as a baseline')
+    parser.add_argument('--compare', help='Compare results to this baseline json')
+    parser.add_argument('--time-tolerance', type=float, default=0.25, help='Allowed fractional slow down')
+    parser.add_argument('--memory-tolerance', type=float, default=0.10, help='Allowed fractional memory increase')
+    parser.add_argument('--min-time', type=float, default=1e-3, help='Slow downs in seconds always allowed')
+    args = parser.parse_args(args)
+
+    logging.disable(logging.WARNING)
+    results = run(args.fixtures, args.scales, repeat=args.repeat, name_filter=args.name_filter)
+
+    if args.save:
+        with open(args.save, 'w') as fp:
+            json.dump(results, fp, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as fp:
+            baseline = json.load(fp)
+        regressions = compare(results, baseline, time_tolerance=args.time_tolerance,
+                              memory_tolerance=args.memory_tolerance, min_time=args.min_time)
+        if regressions:
+            print(f'\n{len(regressions)} benchmark(s) regressed.')
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,3 +3,24 @@
 __author__ = """Micah Johnson """
 __email__ = 'info@adventuredata.com'
 __version__ = '0.10.2'
+
+import logging as _logging
+from importlib import import_module as _import_module
+
+# Logging is left to applications to configure, see study_lyte.logging.setup_log
+_logging.getLogger(__name__).addHandler(_logging.NullHandler())
+
+# Submodules are imported on first access e.g. study_lyte.profile
+_SUBMODULES = ['adjustments', 'aggregate', 'aio', 'cache', 'calibrations', 'cli', 'cropping', 'decorators', 'depth',
+               'detect', 'io', 'logging', 'plotting', 'profile', 'relationships', 'rolling', 'sharing', 'stats',
+               'styles', 'timeseries']
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        return _import_module(f'.{name}', __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals().keys()) + _SUBMODULES)
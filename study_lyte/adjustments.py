@@ -1,6 +1,9 @@
 import numpy as np
 import pandas as pd
 
+from .rolling import rolling_mean
+
+
 def get_points_from_fraction(n_samples, fraction, maximum=None):
     """
     Return the nearest whole int from a fraction of the
@@ -31,6 +34,62 @@ def get_directional_mean(arr: np.array, fractional_basis: float = 0.01, directio
     return avg
 
 
+class BorderBias:
+    """
+    Bias of a signal estimated from the data at its start and end. Each bias is a
+    scalar computed once, the bias adjusted signal is only built when requested.
+
+    Usage:
+        bias = BorderBias(df['Y-Axis'])
+        start = get_acceleration_start(bias.neutral('forward'))
+        stop = get_acceleration_stop(bias.neutral('backward'))
+    """
+    def __init__(self, series, fractional_basis: float = 0.005):
+        """
+        Args:
+            series: pandas series or numpy array of data with a known bias
+            fractional_basis: Fraction of data at each border used to estimate the bias
+        """
+        self.series = series
+        self.fractional_basis = fractional_basis
+        self._forward = None
+        self._backward = None
+
+    @property
+    def values(self):
+        return self.series.values if hasattr(self.series, 'values') else self.series
+
+    @property
+    def forward(self):
+        """Bias estimated from the start of the data"""
+        if self._forward is None:
+            self._forward = get_directional_mean(self.values, fractional_basis=self.fractional_basis,
+                                                 direction='forward')
+        return self._forward
+
+    @property
+    def backward(self):
+        """Bias estimated from the end of the data"""
+        if self._backward is None:
+            self._backward = get_directional_mean(self.values, fractional_basis=self.fractional_basis,
+                                                  direction='backward')
+        return self._backward
+
+    def bias(self, direction='forward'):
+        if direction == 'forward':
+            return self.forward
+        elif direction == 'backward':
+            return self.backward
+        else:
+            raise ValueError('Invalid Direction used, Use either forward or backward.')
+
+    def neutral(self, direction='forward'):
+        """
+        Bias adjusted data using the bias at the start (forward) or end (backward)
+        """
+        return self.series - self.bias(direction)
+
+
 def get_neutral_bias_at_border(series: pd.Series, fractional_basis: float = 0.005, direction='forward'):
     """
     Bias adjust the series data by using the XX % of the data either at the front of the data
@@ -45,10 +104,7 @@ def get_neutral_bias_at_border(series: pd.Series, fractional_basis: float = 0.00
     Returns:
         bias_adj: bias adjusted data to near zero
     """
-    arr = series.values if hasattr(series,'values') else series
-    bias = get_directional_mean(arr, fractional_basis=fractional_basis, direction=direction)
-    bias_adj = series - bias
-    return bias_adj
+    return BorderBias(series, fractional_basis=fractional_basis).neutral(direction)
 
 def get_neutral_bias_at_index(series: pd.Series, index, fractional_basis: float = 0.005):
     """
@@ -60,15 +116,31 @@ def get_neutral_bias_at_index(series: pd.Series, index, fractional_basis: float
     Returns:
         bias_adj: bias adjusted data to near zero
     """
-    n = get_points_from_fraction(len(series), fractional_basis)
+    bias = get_bias_at_index(series.values, index, fractional_basis=fractional_basis)
+    bias_adj = series - bias
+    return bias_adj
+
+
+def get_bias_at_index(values: np.ndarray, index, fractional_basis: float = 0.005):
+    """
+    Mean of the XX % of the data centered on an provided index
+
+    Args:
+        values: numpy array of data with a known bias
+        index: Index to center the data on
+        fractional_basis: Fraction of data to use to estimate the bias
+    Returns:
+        bias: Mean of the data around the index, nan if the index is past the data
+    """
+    n = get_points_from_fraction(len(values), fractional_basis)
     start = index-n
     start = start if start > 0 else 0
     stop = index + n
-    stop = stop if stop < len(series) else len(series)-1
+    stop = stop if stop < len(values) else len(values)-1
 
-    bias = series.values[start:stop].mean()
-    bias_adj = series - bias
-    return bias_adj
+    if stop <= start:
+        return np.nan
+    return values[start:stop].mean()
 
 def get_normalized_at_border(series: pd.Series, fractional_basis: float = 0.01, direction='forward'):
     """
@@ -89,25 +161,162 @@ def get_normalized_at_border(series: pd.Series, fractional_basis: float = 0.01,
         border_norm = series
     return border_norm
 
-def merge_on_to_time(df_list, final_time):
-    """"""
-    result = None
-    for df in df_list:
-
-        time_df = df.copy()
-        if df.index.name != 'time':
-            time_df = time_df.set_index('time')
-
-        new = pd.DataFrame(columns=time_df.columns, index=final_time)
-        for c in time_df.columns:
-            new[c] = np.interp(final_time,  # Target indices (100 Hz)
-                               time_df.index,  # Original 75 Hz indices
-                               time_df[c])
-        if result is None:
-            result = new
+def compact_dtypes(df, adc_columns=('Sensor1', 'Sensor2', 'Sensor3', 'Sensor4'), keep=('time',)):
+    """
+    Reduce the memory footprint of a dataframe. ADC channels are stored as int16 when
+    all their values are finite whole numbers in range, all other float columns are
+    stored as float32.
+
+    Args:
+        df: pandas Dataframe to compact
+        adc_columns: Column names holding raw ADC counts
+        keep: Column names to leave untouched e.g. time
+
+    Returns:
+        compact: pandas Dataframe with the same index and columns in reduced precision
+    """
+    int16 = np.iinfo(np.int16)
+    data = {}
+    for c in df.columns:
+        arr = df[c].values
+        if c in keep or arr.dtype.kind not in 'iuf':
+            data[c] = arr
+
+        elif c in adc_columns and np.all(np.isfinite(arr)) and np.all(arr == np.round(arr)) \
+                and arr.min() >= int16.min and arr.max() <= int16.max:
+            data[c] = arr.astype(np.int16)
+
         else:
-            result = result.join(new)
-    return result
+            data[c] = arr.astype(np.float32)
+
+    return pd.DataFrame(data, index=df.index)
+
+
+def resample(time, values, target, method='linear', left=None, right=None, skipna=False, out=None):
+    """
+    Resample all the columns of values onto new times writing into a single array. For
+    the nearest and previous sample the position of each target time is searched once and
+    shared by every column, linear interpolation matches np.interp exactly.
+
+    Args:
+        time: Increasing 1D array of the sample times of values
+        values: 1D array or 2D array of shape (samples, columns)
+        target: 1D array of times to resample onto
+        method: linear, nearest or previous sample
+        left: Value before the first sample, defaults to the first value
+        right: Value after the last sample, defaults to the last value
+        skipna: Interpolate over nans in values using only the valid samples of each column
+        out: Optional preallocated float64 array of shape (target samples, columns) to write to
+    Returns:
+        out: Resampled values
+    """
+    time = np.asarray(time, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    target = np.asarray(target, dtype=np.float64)
+    if out is None:
+        out = np.empty((len(target),) + values.shape[1:], dtype=np.float64)
+
+    if len(time) == 0:
+        out[:] = np.nan
+        return out
+
+    if skipna:
+        columns = values.reshape(len(time), -1)
+        result = out.reshape(len(target), -1)
+        nans = np.isnan(columns).any(axis=0)
+        if nans.any():
+            # Columns without gaps are still done together
+            complete = np.flatnonzero(~nans)
+            if len(complete):
+                result[:, complete] = resample(time, columns[:, complete], target, method=method, left=left,
+                                               right=right)
+            for c in np.flatnonzero(nans):
+                valid = ~np.isnan(columns[:, c])
+                resample(time[valid], columns[valid, c], target, method=method, left=left, right=right,
+                         out=result[:, c])
+            return out
+
+    if method == 'linear':
+        # np.interp is the fastest linear kernel, each column is written straight into the buffer
+        columns = values.reshape(len(time), -1)
+        result = out.reshape(len(target), -1)
+        for c in range(columns.shape[1]):
+            result[:, c] = np.interp(target, time, columns[:, c], left=left, right=right)
+        return out
+
+    last = len(time) - 1
+    if method == 'previous':
+        j = np.clip(np.searchsorted(time, target, side='right') - 1, 0, last)
+        np.take(values, j, axis=0, out=out)
+
+    elif method == 'nearest':
+        j = np.clip(np.searchsorted(time, target, side='left'), 1, max(last, 1))
+        if last > 0:
+            # Ties go to the later sample like pandas
+            j -= (target - time[j - 1]) < (time[j] - target)
+        else:
+            j[:] = 0
+        np.take(values, j, axis=0, out=out)
+
+    else:
+        raise ValueError(f'Invalid method {method}, use linear, nearest or previous.')
+
+    out[target < time[0]] = values[0] if left is None else left
+    out[target > time[-1]] = values[-1] if right is None else right
+    return out
+
+
+def get_time_base(df):
+    """
+    Return the sample times and the data columns of a dataframe using the time index or column
+    """
+    if df.index.name == 'time':
+        return df.index.values, list(df.columns)
+    return df['time'].values, [c for c in df.columns if c != 'time']
+
+
+def resample_frames(df_list, target, method='linear', left=None, right=None, skipna=False):
+    """
+    Resample every column of many dataframes onto the same times into a single
+    preallocated array, each dataframe can have its own sample times.
+
+    Args:
+        df_list: List of pandas dataframes with a time index or column
+        target: Times to resample onto
+        method: linear, nearest or previous sample, see resample
+        left: Value before the first sample of each column, defaults to the first value
+        right: Value after the last sample of each column, defaults to the last value
+        skipna: Interpolate over nans using the valid samples of each column
+    Returns:
+        result: pandas Dataframe of all the columns indexed by target
+    """
+    bases = [get_time_base(df) for df in df_list]
+    names = [c for t, columns in bases for c in columns]
+    if len(set(names)) != len(names):
+        raise ValueError(f'Columns overlap between dataframes: {names}')
+
+    buffer = np.empty((len(target), len(names)), dtype=np.float64)
+    col = 0
+    for df, (time, columns) in zip(df_list, bases):
+        block = buffer[:, col:col + len(columns)]
+        resample(time, df[columns].to_numpy(dtype=np.float64), target, method=method, left=left, right=right,
+                 skipna=skipna, out=block)
+        col += len(columns)
+
+    return pd.DataFrame(buffer, index=target, columns=names, copy=False)
+
+
+def merge_on_to_time(df_list, final_time):
+    """
+    Linearly interpolate all the columns of the dataframes on to the final time
+
+    Args:
+        df_list: List of pandas dataframes with a time index or column
+        final_time: Times to interpolate on to
+    Returns:
+        result: pandas Dataframe indexed by the final time
+    """
+    return resample_frames(df_list, final_time)
 
 
 def merge_time_series(df_list):
@@ -124,54 +333,105 @@ def merge_time_series(df_list):
                 into the same dataframe using the high resolution
     """
     # Build dummy result in case no data is passed
-    result = pd.DataFrame()
-
-    # Merge everything else to it
-    for i, df in enumerate(df_list):
-        if i == 0:
-            result = df.copy()
-        else:
-            result = pd.merge_ordered(result, df, on='time')
+    if len(df_list) == 0:
+        return pd.DataFrame()
+    elif len(df_list) == 1:
+        return df_list[0].copy().interpolate(method='index')
+
+    # Every time sampled by any dataframe
+    bases = [get_time_base(df) for df in df_list]
+    time = np.unique(np.concatenate([b[0] for b in bases]))
+
+    names = ['time'] + [c for t, columns in bases for c in columns]
+    if len(set(names)) != len(names):
+        raise ValueError(f'Columns overlap between dataframes: {names}')
+
+    # Gaps are filled by position on the merged times, leading gaps are left as nan
+    buffer = np.empty((len(time), len(names)), dtype=np.float64)
+    buffer[:, 0] = time
+    position = np.arange(len(time), dtype=np.float64)
+    col = 1
+    for df, (t, columns) in zip(df_list, bases):
+        block = buffer[:, col:col + len(columns)]
+        resample(np.searchsorted(time, t), df[columns].to_numpy(dtype=np.float64), position, left=np.nan,
+                 skipna=True, out=block)
+        col += len(columns)
+
+    return pd.DataFrame(buffer, columns=names, copy=False)
+
+
+def fill_interior_gaps(arr):
+    """
+    Linearly interpolate nans between valid values in place. Leading and
+    trailing nans are left untouched.
 
-    # interpolate the nan's
-    result = result.interpolate(method='index')
-    return result
+    Args:
+        arr: Float numpy array
+    Returns:
+        arr: The same array with its interior gaps filled
+    """
+    nans = np.isnan(arr)
+    if nans.any():
+        valid = np.flatnonzero(~nans)
+        if len(valid) > 1:
+            gaps = np.flatnonzero(nans[valid[0]:valid[-1]]) + valid[0]
+            arr[gaps] = np.interp(gaps, valid, arr[valid])
+    return arr
 
 
-def remove_ambient(active, ambient, min_ambient_range=100, direction='forward'):
+def remove_ambient(active, ambient, min_ambient_range=100, direction='forward', out=None):
     """
-    Attempts to remove the ambient signal from the active signal
+    Attempts to remove the ambient signal from the active signal. Gaps in the data are
+    filled linearly, for a gap spanning h samples this is within h**2 / 8 * max|f''|
+    of a cubic fill, negligible for the few sample dropouts seen in NIR data.
+
+    Args:
+        active: Array like of the active NIR signal
+        ambient: Array like of the ambient NIR signal
+        min_ambient_range: Minimum range of the ambient signal to attempt removing it
+        direction: Border used to normalize the signals, forward or backward
+        out: Optional preallocated float array to write the result to
+    Returns:
+        clean: Active signal with the ambient removed, a Series if active is a Series
     """
-    amb_max = ambient.max()
-    amb_min = ambient.min()
-    if abs(amb_max - amb_min) > min_ambient_range:
+    active_arr = np.asarray(active, dtype=np.float64)
+    ambient_arr = np.asarray(ambient, dtype=np.float64)
+
+    # Nothing to remove without a valid ambient range to remove
+    valid = ambient_arr[~np.isnan(ambient_arr)]
+    if len(valid) == 0 or not abs(valid.max() - valid.min()) > min_ambient_range:
+        if out is None:
+            return active
+        out[:] = active_arr
+        clean = out
+
+    else:
         # Only adjust up to the dropdown
         tol = 0.05
-        n = get_points_from_fraction(len(ambient), 0.01)
-        amb = ambient.rolling(window=n, center=True, closed='both', min_periods=1).mean()
+        n = get_points_from_fraction(len(ambient_arr), 0.01)
+        amb = rolling_mean(ambient_arr, n, center=True, closed='both', min_periods=1)
         amb_back = get_directional_mean(amb, direction='backward', fractional_basis=0.1)
-        active_forward = get_directional_mean(active, direction='forward', fractional_basis=0.1)
+        active_forward = get_directional_mean(active_arr, direction='forward', fractional_basis=0.1)
 
-        ind = amb < (amb_back * (1 + tol))
-        decayed_idx = np.argwhere(ind.values)
-        if decayed_idx.any():
-            decayed_idx = decayed_idx[0][0]
-        else:
-            decayed_idx = 0
-
-        norm_ambient = get_normalized_at_border(amb, direction=direction)
-        norm_active = get_normalized_at_border(active, direction=direction)
-        norm_ambient[decayed_idx:] = 0
-        norm_diff = norm_active - norm_ambient
-        norm_diff[ norm_diff <= 0] = 0  #np.nan
-        norm_diff = norm_diff.interpolate(method='cubic')
-        clean = active_forward * norm_diff
+        decayed = np.flatnonzero(amb < (amb_back * (1 + tol)))
+        decayed_idx = decayed[0] if len(decayed) else 0
+
+        # Normalized active minus the normalized ambient up to where it decayed
+        clean = out if out is not None else np.empty(len(active_arr))
+        amb_border = get_directional_mean(amb, direction=direction)
+        active_border = get_directional_mean(active_arr, direction=direction)
+        np.divide(active_arr, active_border if active_border != 0 else 1, out=clean)
+        clean[:decayed_idx] -= amb[:decayed_idx] / (amb_border if amb_border != 0 else 1)
+        clean[clean <= 0] = 0
+        fill_interior_gaps(clean)
+
+        clean *= active_forward
         clean[:int(decayed_idx*(0.5))] = 1
         # Zero cant work here
         clean[clean < 1] = 1
 
-    else:
-        clean = active
+    if isinstance(active, pd.Series):
+        clean = pd.Series(clean, index=active.index, copy=False)
     return clean
 
 
@@ -0,0 +1,188 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+
+class DepthGridAggregator:
+    """
+    Statistics by depth across many profiles on one shared depth grid. Each profile
+    is reduced to its mean in every layer as it is added and only running
+    accumulators (and optionally the per layer means for percentiles) are kept,
+    so memory scales with the grid and not the samples.
+
+    Usage:
+        agg = DepthGridAggregator(resolution=1, max_depth=150)
+        agg.add_profiles(profiles, 'pressure')
+        df = agg.result()
+    """
+    def __init__(self, grid=None, resolution=None, max_depth=None, percentiles=(25, 50, 75), keep_values=True):
+        """
+        Args:
+            grid: Depths of the bottom of each layer like adjustments.aggregate_by_depth e.g. -10, -20 == 0-10, 10-20.
+                Negative depths are from the surface
+            resolution: Layer thickness in centimeters to build a grid from the surface to max_depth instead
+            max_depth: Deepest depth in centimeters of the grid when using resolution
+            percentiles: Percentiles across the profiles to report, the median is always included
+            keep_values: Keep the per layer mean of each profile needed for the median and percentiles.
+                Without it only count, mean and std are available with a fixed memory footprint
+        """
+        if grid is None:
+            if resolution is None or max_depth is None:
+                raise ValueError('Provide a grid or a resolution and max_depth')
+            resolution = abs(resolution)
+            grid = -1 * np.arange(resolution, abs(max_depth) + resolution, resolution)
+        self.grid = np.asarray(grid, dtype=np.float64)
+
+        # Surface datum depths are negative, search on the distance from the datum
+        self._sign = -1 if self.grid[-1] < 0 else 1
+        self._bottoms = self._sign * self.grid
+        if np.any(np.diff(self._bottoms) <= 0):
+            raise ValueError('Depth grid must be monotonic')
+
+        self.percentiles = sorted(set(percentiles) | {50})
+        self.keep_values = keep_values
+
+        # Running accumulators per layer (Chan et al. parallel variance)
+        n = len(self.grid)
+        self._count = np.zeros(n, dtype=np.int64)
+        self._mean = np.zeros(n, dtype=np.float64)
+        self._m2 = np.zeros(n, dtype=np.float64)
+        self._values = []
+        self._names = []
+
+    @property
+    def n_profiles(self):
+        return len(self._names)
+
+    def layer_means(self, depths, values):
+        """
+        Mean of each profile in each layer of the grid. Profiles are ragged so they are
+        concatenated and binned with a single searchsorted and bincount.
+
+        Args:
+            depths: List of depth arrays, one per profile
+            values: List of value arrays matching depths
+        Returns:
+            means: array shaped (profiles, layers) with nan where a profile has no data
+        """
+        n_layers = len(self.grid)
+        lengths = [len(d) for d in depths]
+        depth = np.concatenate([np.asarray(d, dtype=np.float64) for d in depths]) if depths else np.empty(0)
+        value = np.concatenate([np.asarray(v, dtype=np.float64) for v in values]) if values else np.empty(0)
+        if len(depth) != len(value):
+            raise ValueError('Each profile needs a value for every depth')
+
+        layer = np.searchsorted(self._bottoms, self._sign * depth, side='left')
+        flat = np.repeat(np.arange(len(lengths)), lengths) * n_layers + layer
+        keep = (layer < n_layers) & ~np.isnan(value) & ~np.isnan(depth)
+
+        size = len(lengths) * n_layers
+        counts = np.bincount(flat[keep], minlength=size)
+        sums = np.bincount(flat[keep], weights=value[keep], minlength=size)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            means = sums / counts
+        return means.reshape(len(lengths), n_layers)
+
+    def add_arrays(self, depths, values, names=None):
+        """
+        Add profiles as lists of depth and value arrays
+
+        Args:
+            depths: List of depth arrays, one per profile
+            values: List of value arrays matching depths
+            names: Optional name for each profile
+        """
+        means = self.layer_means(depths, values)
+        self._update(means)
+        if self.keep_values:
+            self._values.append(means)
+        start = self.n_profiles
+        self._names.extend(names if names is not None else range(start, start + len(means)))
+
+    def add(self, df, column, name=None, depth_col='depth'):
+        """
+        Add a single profile from a dataframe with a depth column
+        """
+        self.add_arrays([df[depth_col].values], [df[column].values], names=[name] if name is not None else None)
+
+    def add_profiles(self, profiles, column='force', chunk_size=50):
+        """
+        Add profiles using one of their depth cropped dataframes
+
+        Args:
+            profiles: Iterable of profiles e.g. LyteProfileV6, read lazily in chunks
+            column: force, pressure or nir
+            chunk_size: Number of profiles binned together
+        Returns:
+            skipped: Names of profiles without usable data for the column
+        """
+        skipped = []
+        depths, values, names = [], [], []
+        for profile in profiles:
+            df = getattr(profile, column)
+            name = getattr(profile, 'filename', None)
+            if not isinstance(df, pd.DataFrame):
+                skipped.append(name)
+                continue
+            depths.append(df['depth'].values)
+            values.append(df[column].values)
+            names.append(name)
+            if len(depths) >= chunk_size:
+                self.add_arrays(depths, values, names=names)
+                depths, values, names = [], [], []
+
+        if depths:
+            self.add_arrays(depths, values, names=names)
+        return skipped
+
+    def _update(self, means):
+        """Merge the per layer statistics of a batch of profiles into the accumulators"""
+        valid = ~np.isnan(means)
+        count = valid.sum(axis=0)
+        if not count.any():
+            return
+        total = np.where(valid, means, 0).sum(axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = np.where(count > 0, total / count, 0)
+        m2 = np.where(valid, (means - mean) ** 2, 0).sum(axis=0)
+
+        combined = self._count + count
+        delta = mean - self._mean
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self._mean = np.where(combined > 0, self._mean + delta * count / combined, 0)
+            self._m2 = self._m2 + m2 + np.where(combined > 0, delta ** 2 * self._count * count / combined, 0)
+        self._count = combined
+
+    @property
+    def values(self):
+        """Dataframe of the mean of every profile (rows) in every layer (columns)"""
+        if not self.keep_values:
+            raise ValueError('Profile values were not kept, use keep_values=True')
+        data = np.concatenate(self._values) if self._values else np.empty((0, len(self.grid)))
+        return pd.DataFrame(data, index=self._names, columns=pd.Index(self.grid, name='depth'))
+
+    def result(self):
+        """
+        Statistics across the profiles in each layer
+
+        Returns:
+            df: Dataframe indexed by depth with count, mean, std and when values are kept median and
+                percentile columns e.g. p25
+        """
+        with np.errstate(divide='ignore', invalid='ignore'):
+            std = np.sqrt(self._m2 / (self._count - 1))
+        result = pd.DataFrame({'count': self._count,
+                               'mean': np.where(self._count > 0, self._mean, np.nan),
+                               'std': np.where(self._count > 1, std, np.nan)},
+                              index=pd.Index(self.grid, name='depth'))
+
+        if self.keep_values and self._values:
+            data = np.concatenate(self._values)
+            # Layers no profile reached are all nan
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', RuntimeWarning)
+                pct = np.nanpercentile(data, self.percentiles, axis=0)
+            for p, v in zip(self.percentiles, pct):
+                result['median' if p == 50 else f'p{p:g}'] = v
+        return result
@@ -0,0 +1,190 @@
+"""
+Asyncio interface for loading and processing profiles without blocking the event loop.
+
+Usage:
+    profile = await load_profile('profile.csv')
+
+    async for summary in process_many(paths):
+        ...
+"""
+import asyncio
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+
+LOG = logging.getLogger('study_lyte.aio')
+
+# Results computed by process() for a profile to be considered processed
+PROCESSED = ['_depth', '_start', '_stop', '_surface', '_ground', '_force', '_nir']
+
+
+def open_profile(filename, kwargs):
+    """
+    Open a profile reading only its metadata and any cached results
+    """
+    from .profile import LyteProfileV6
+
+    profile = LyteProfileV6(filename, **kwargs)
+    profile.metadata
+    return profile
+
+
+def process_profile(profile):
+    """Compute all the analysis stages of a profile"""
+    return profile.process()
+
+
+def summarize_profile(filename, kwargs):
+    """Process a profile and return just its summary to keep what is sent between processes small"""
+    profile = open_profile(filename, kwargs)
+    summary = profile.summary()
+    profile.store_results()
+    return dict(summary, file=str(filename))
+
+
+def is_processed(profile):
+    return all([getattr(profile, name, None) is not None for name in PROCESSED])
+
+
+class ProfileLoader:
+    """
+    Runs file I/O in a thread pool and the CPU bound parsing and processing in a bounded
+    process pool. The number of profiles in flight is limited so a large batch never
+    queues more work or memory than the workers can handle.
+    """
+    def __init__(self, max_workers: int = None, max_pending: int = None, thread_workers: int = None):
+        """
+        Args:
+            max_workers: Number of processes used for processing, defaults to the number of cpus
+            max_pending: Maximum profiles loading at once, defaults to twice the workers
+            thread_workers: Number of threads used for file I/O
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_pending = max_pending or 2 * self.max_workers
+        self.thread_workers = thread_workers
+        self._processes = None
+        self._threads = None
+        self._limit = None  # (event loop, semaphore)
+
+    @property
+    def processes(self):
+        if self._processes is None:
+            self._processes = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._processes
+
+    @property
+    def threads(self):
+        if self._threads is None:
+            self._threads = ThreadPoolExecutor(max_workers=self.thread_workers, thread_name_prefix='study_lyte')
+        return self._threads
+
+    @property
+    def limit(self):
+        """Semaphore limiting the profiles in flight, one per event loop"""
+        loop = asyncio.get_running_loop()
+        if self._limit is None or self._limit[0] is not loop:
+            self._limit = (loop, asyncio.Semaphore(self.max_pending))
+        return self._limit[1]
+
+    async def run_io(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.threads, partial(func, *args))
+
+    async def run_cpu(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.processes, partial(func, *args))
+
+    async def load(self, filename: Path, process=True, **kwargs):
+        """
+        Load a profile
+
+        Args:
+            filename: Path to the profile
+            process: Compute depth, events, force and nir before returning
+            kwargs: Keyword arguments passed to LyteProfileV6
+        Returns:
+            profile: LyteProfileV6
+        """
+        async with self.limit:
+            profile = await self.run_io(open_profile, filename, kwargs)
+            if process and not is_processed(profile):
+                profile = await self.run_cpu(process_profile, profile)
+        return profile
+
+    async def summarize(self, filename: Path, **kwargs):
+        """
+        Process a profile and return its summary, see LyteProfileV6.summary
+        """
+        async with self.limit:
+            return await self.run_cpu(summarize_profile, filename, kwargs)
+
+    async def process_many(self, filenames, return_exceptions=False, **kwargs):
+        """
+        Summarize many profiles yielding each summary as soon as it is ready. Closing the
+        generator (aclose) or cancelling cancels all the profiles not yet finished.
+
+        Args:
+            filenames: Paths of the profiles
+            return_exceptions: Yield exceptions instead of raising them
+            kwargs: Keyword arguments passed to LyteProfileV6
+        """
+        tasks = [asyncio.ensure_future(self.summarize(f, **kwargs)) for f in filenames]
+        try:
+            for task in asyncio.as_completed(tasks):
+                try:
+                    yield await task
+                except Exception as e:
+                    if not return_exceptions:
+                        raise
+                    yield e
+        finally:
+            pending = [t for t in tasks if not t.done()]
+            for task in pending:
+                task.cancel()
+            if pending:
+                LOG.info(f'Cancelled {len(pending):,} profiles')
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    def close(self, wait=True):
+        """Shutdown the pools, pending work is cancelled"""
+        for name in ['_processes', '_threads']:
+            pool = getattr(self, name)
+            if pool is not None:
+                pool.shutdown(wait=wait, cancel_futures=True)
+                setattr(self, name, None)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        self.close(wait=False)
+
+
+_LOADER = None
+
+
+def get_loader():
+    """Loader shared by load_profile and process_many"""
+    global _LOADER
+    if _LOADER is None:
+        _LOADER = ProfileLoader()
+    return _LOADER
+
+
+async def load_profile(filename: Path, process=True, loader: ProfileLoader = None, **kwargs):
+    """
+    Load a profile without blocking the event loop, see ProfileLoader.load
+    """
+    loader = loader or get_loader()
+    return await loader.load(filename, process=process, **kwargs)
+
+
+def process_many(filenames, return_exceptions=False, loader: ProfileLoader = None, **kwargs):
+    """
+    Summarize many profiles as they finish, see ProfileLoader.process_many
+
+    Returns:
+        summaries: Async generator of summaries
+    """
+    loader = loader or get_loader()
+    return loader.process_many(filenames, return_exceptions=return_exceptions, **kwargs)
@@ -0,0 +1,160 @@
+"""
+Disk backed cache of profile results so unchanged files processed with the same
+parameters are never computed twice.
+"""
+import json
+import logging
+import os
+import pickle
+import threading
+from hashlib import sha256
+from pathlib import Path
+
+from . import __version__
+
+LOG = logging.getLogger('study_lyte.cache')
+
+
+class ResultCache:
+    """
+    Cache of computed results keyed by the data in the file, the parameters used to
+    process it and the package version. Entries are pickled to a directory and the least
+    recently used are removed when the cache grows past its limits.
+    """
+    suffix = '.result'
+
+    def __init__(self, directory: Path, max_bytes: int = None, max_entries: int = None):
+        """
+        Args:
+            directory: Directory to store the results in, shared between processes
+            max_bytes: Optional limit on the total size of the cache on disk
+            max_entries: Optional limit on the number of results kept
+        """
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def hash_file(filename: Path, chunk_size=1 << 20):
+        """
+        Hash the data section of a file so renamed or touched files still hit the cache.
+        The header (key = value lines, see io.find_metadata) is skipped so editing it e.g. the
+        location doesn't invalidate results, metadata results depend on belongs in the parameters.
+        """
+        digest = sha256()
+        with open(filename, 'rb') as fp:
+            for line in fp:
+                if b'=' not in line:
+                    digest.update(line)
+                    break
+            for chunk in iter(lambda: fp.read(chunk_size), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def hash_parameters(parameters: dict):
+        """Hash parameters written canonically so the order of keys doesn't matter"""
+        parameters = dict(parameters, version=__version__)
+        content = json.dumps(parameters, sort_keys=True, default=str)
+        return sha256(content.encode()).hexdigest()
+
+    def get_key(self, filename: Path, parameters: dict):
+        """
+        Args:
+            filename: Path to the file the results are computed from
+            parameters: Dictionary of everything else the results depend on
+        Returns:
+            key: String identifying the results
+        """
+        return f'{self.hash_file(filename)[:32]}-{self.hash_parameters(parameters)[:16]}'
+
+    def get_path(self, key: str):
+        return self.directory.joinpath(key + self.suffix)
+
+    def __contains__(self, key):
+        return self.get_path(key).exists()
+
+    def __len__(self):
+        return len(self.entries())
+
+    def entries(self):
+        """List of (path, size, last used) of each result in the cache"""
+        entries = []
+        for path in self.directory.glob('*' + self.suffix):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                # Removed by another process
+                continue
+            entries.append((path, stat.st_size, stat.st_mtime_ns))
+        return entries
+
+    @property
+    def size(self):
+        """Total bytes held by the cache"""
+        return sum([e[1] for e in self.entries()])
+
+    def load(self, key: str):
+        """
+        Retrieve results from the cache
+
+        Returns:
+            results: Dictionary of results or None if they are not cached
+        """
+        path = self.get_path(key)
+        try:
+            with open(path, 'rb') as fp:
+                results = pickle.load(fp)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            LOG.warning(f'Unable to read cached results {path}, removing ({e})')
+            path.unlink(missing_ok=True)
+            return None
+
+        # Mark as recently used for eviction
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return results
+
+    def store(self, key: str, results: dict):
+        """
+        Write results to the cache and remove old entries if over the limits
+        """
+        path = self.get_path(key)
+        # Write then rename so other processes never read a partial file
+        tmp = path.with_suffix(f'.{os.getpid()}.{threading.get_ident()}.tmp')
+        with open(tmp, 'wb') as fp:
+            pickle.dump(results, fp, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+        self.evict()
+
+    def evict(self):
+        """
+        Remove the least recently used results until the cache is within its limits
+
+        Returns:
+            removed: Number of results removed
+        """
+        if self.max_bytes is None and self.max_entries is None:
+            return 0
+
+        entries = sorted(self.entries(), key=lambda e: e[2], reverse=True)
+        total = 0
+        removed = 0
+        for i, (path, size, used) in enumerate(entries):
+            total += size
+            over_bytes = self.max_bytes is not None and total > self.max_bytes
+            over_entries = self.max_entries is not None and i >= self.max_entries
+            if over_bytes or over_entries:
+                path.unlink(missing_ok=True)
+                total -= size
+                removed += 1
+        return removed
+
+    def clear(self):
+        for path, size, used in self.entries():
+            path.unlink(missing_ok=True)
@@ -1,77 +1,295 @@
-from enum import Enum
 import json
+from copy import deepcopy
+import os
+import pickle
+import threading
+import time
+from bisect import bisect_right
+from hashlib import sha1, sha256
 from pathlib import Path
-from .logging import setup_log
 import logging
 from dataclasses import dataclass
 from typing import List
 from datetime import datetime
-import pandas as pd
-
-setup_log()
 
 LOG = logging.getLogger('study_lyte.calibrations')
 
 class MissingMeasurementDateException(Exception):
     """
-    Exception to raise when a probe has multiple calibrations but the date has 
+    Exception to raise when a probe has multiple calibrations but the date has
     not been specified.
     """
     pass
 
 
+def parse_date(value) -> datetime:
+    """
+    Parse a calibration date, pandas is only imported for formats that are not ISO 8601
+    """
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        import pandas as pd
+        return pd.to_datetime(value).to_pydatetime()
+
+
 @dataclass()
 class Calibration:
     """Small class to make accessing calibration data a bit more convenient"""
     serial: str
     calibration: dict[str, List[float]]
     date: datetime = None
+    version: str = None
+
+
+class CompiledCalibrations:
+    """
+    Calibrations validated and indexed for fast lookups. Serials with multiple
+    calibrations hold a sorted list of dates searched with a binary search. Lookups
+    return copies so the shared compiled calibrations can't be modified by a profile.
+
+    Coefficients are kept as the dictionaries of lists they were read as rather than
+    stacked into arrays. Lookups hand each profile its own dictionary of lists, entries
+    mix polynomials of different degrees with other values, and this module avoids
+    importing numpy and pandas, so arrays would be converted back on every lookup.
+    """
+    def __init__(self, info: dict, version: str = None):
+        """
+        Args:
+            info: Dictionary of calibrations as read from the json
+            version: Identifier of the content the calibrations were compiled from
+        """
+        self.info = info
+        self.version = version
+        self.single = {}
+        self.dated = {}
+        # Malformed entries only fail lookups of their own serial
+        self.invalid = {}
+
+        for serial, calibrations in info.items():
+            try:
+                self.compile(serial, calibrations)
+            except Exception as e:
+                LOG.warning(f'Skipping invalid calibration for {serial}: {e}')
+                self.invalid[serial] = str(e)
+
+    def compile(self, serial: str, calibrations):
+        """Validate and index the calibrations of one serial"""
+        if isinstance(calibrations, dict):
+            self.single[serial] = calibrations
+
+        elif isinstance(calibrations, list):
+            if not all([isinstance(c, dict) and 'date' in c for c in calibrations]):
+                raise ValueError(f'Calibrations for {serial} must all be dictionaries with a date')
+            # Stable sort so the last listed wins for duplicate dates
+            dates = [parse_date(c['date']) for c in calibrations]
+            order = sorted(range(len(dates)), key=lambda i: dates[i])
+            self.dated[serial] = ([dates[i] for i in order], [calibrations[i] for i in order])
+
+        else:
+            raise ValueError(f'Calibration for {serial} must be a dictionary or a list of dictionaries')
+
+    def lookup(self, serial: str, date: datetime = None):
+        """
+        Find the calibration for a serial number at a date
+
+        Returns:
+            tuple:
+                **serial**: Serial number, UNKNOWN if the default was used
+                **calibration**: Copy of the dictionary of calibration values
+        Raises:
+            ValueError: If the calibration for the serial is malformed
+        """
+        serial, calibration = self._lookup(serial, date=date)
+        return serial, deepcopy(calibration)
+
+    def _lookup(self, serial: str, date: datetime = None):
+        if serial in self.invalid:
+            raise ValueError(self.invalid[serial])
+
+        if serial in self.single:
+            return serial, self.single[serial]
+
+        if serial not in self.dated:
+            return 'UNKNOWN', self.info['default']
+
+        dates, calibrations = self.dated[serial]
+        if date is None:
+            if len(calibrations) > 1:
+                raise MissingMeasurementDateException("Multiple calibrations found, but no date provided")
+            return serial, calibrations[0]
+
+        # Find the latest calibration on or before the date
+        idx = bisect_right(dates, parse_date(date)) - 1
+        if idx < 0:
+            LOG.warning(f"All available calibrations for {serial} are not available before {date}, using default")
+            return 'UNKNOWN', self.info['default']
+        return serial, calibrations[idx]
+
+
+class CalibrationRegistry:
+    """
+    Process wide, thread safe cache of compiled calibration files keyed by path and
+    modification time. Compiled files can also be persisted to a directory so short
+    lived processes skip parsing the json.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._compiled = {}
+
+    @staticmethod
+    def get_key(filename: Path):
+        """Identify the current state of a file by its path, mtime and size"""
+        path = Path(filename).resolve()
+        stat = path.stat()
+        return str(path), stat.st_mtime_ns, stat.st_size
+
+    @staticmethod
+    def get_cache_path(key, cache_dir: Path):
+        """Location of the persisted compiled calibrations for a file"""
+        name = sha1(key[0].encode()).hexdigest()[:16]
+        return Path(cache_dir).joinpath(f'{Path(key[0]).stem}-{name}.calcache')
+
+    def load(self, filename: Path, cache_dir: Path = None) -> CompiledCalibrations:
+        """
+        Retrieve the compiled calibrations for a file, only reading it when it is new
+        or has changed since it was last loaded.
+
+        Args:
+            filename: Path to the calibrations json
+            cache_dir: Optional directory to persist the compiled calibrations in
+        Returns:
+            compiled: CompiledCalibrations of the file
+        """
+        key = self.get_key(filename)
+        with self._lock:
+            cached = self._compiled.get(key[0])
+            if cached is not None and cached[0] == key:
+                return cached[1]
+
+            compiled = None
+            if cache_dir is not None:
+                compiled = self.read_cache(key, cache_dir)
+
+            if compiled is None:
+                with open(key[0], mode='rb') as fp:
+                    content = fp.read()
+                compiled = CompiledCalibrations(json.loads(content), version=sha256(content).hexdigest()[:12])
+                if cache_dir is not None:
+                    self.write_cache(key, compiled, cache_dir)
+
+            self._compiled[key[0]] = (key, compiled)
+            return compiled
+
+    def read_cache(self, key, cache_dir: Path):
+        path = self.get_cache_path(key, cache_dir)
+        if path.exists():
+            try:
+                with open(path, 'rb') as fp:
+                    cached_key, compiled = pickle.load(fp)
+                if cached_key == key:
+                    return compiled
+            except Exception as e:
+                LOG.warning(f'Unable to read calibration cache {path}, rebuilding ({e})')
+        return None
+
+    def write_cache(self, key, compiled: CompiledCalibrations, cache_dir: Path):
+        path = self.get_cache_path(key, cache_dir)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write then rename so other processes never read a partial file
+        tmp = path.with_suffix(f'.{os.getpid()}.{threading.get_ident()}.tmp')
+        with open(tmp, 'wb') as fp:
+            pickle.dump((key, compiled), fp, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    def clear(self):
+        with self._lock:
+            self._compiled.clear()
+
+
+REGISTRY = CalibrationRegistry()
 
 
 class Calibrations:
     """
     Class to read in a json containing calibrations, keyed by serial number and
-     valued by dictionary of sensor names containing cal values
+     valued by dictionary of sensor names containing cal values. Files are only
+     parsed once per process, see CalibrationRegistry.
+
+     With watch=True the file modification time is polled during lookups and a changed
+     file is rebuilt and swapped in without blocking other lookups, for long running processes.
     """
-    def __init__(self, filename:Path):
-        with open(filename, mode='r') as fp:
-            self._info = json.load(fp)
+    def __init__(self, filename:Path, cache_dir:Path=None, watch=False, poll_interval=5.0):
+        """
+        Args:
+            filename: Path to the calibrations json
+            cache_dir: Optional directory to persist the compiled calibrations in for fast startup
+            watch: Reload the calibrations when the file changes
+            poll_interval: Minimum seconds between checks of the file when watching
+        """
+        self.filename = Path(filename)
+        self.cache_dir = cache_dir
+        self.watch = watch
+        self.poll_interval = poll_interval
+        self._compiled = REGISTRY.load(self.filename, cache_dir=cache_dir)
+        self._key = REGISTRY.get_key(self.filename)
+        self._last_poll = time.monotonic()
+        self._reload_lock = threading.Lock()
 
-    def from_serial(self, serial:str, date: datetime=None) -> Calibration:
-        """ Build data object from the calibration result """
-        calibrations = self._info.get(serial)
-        cal = None
+    @property
+    def _info(self):
+        return self._compiled.info
 
-        if calibrations is None:
-            cal = self._info['default']
-            serial = 'UNKNOWN'
+    @property
+    def version(self):
+        """Identifier of the calibrations currently in use"""
+        return self._compiled.version
 
+    def refresh(self, force=False):
+        """
+        Swap in the calibrations from the file if it changed. Only one thread checks the
+        file at a time, others continue with the current calibrations.
+
+        Args:
+            force: Check the file regardless of the poll interval
+        Returns:
+            reloaded: Bool indicating new calibrations were loaded
+        """
+        if not force and time.monotonic() - self._last_poll < self.poll_interval:
+            return False
+        if not self._reload_lock.acquire(blocking=False):
+            return False
+
+        try:
+            self._last_poll = time.monotonic()
+            key = REGISTRY.get_key(self.filename)
+            if key == self._key:
+                return False
+            compiled = REGISTRY.load(self.filename, cache_dir=self.cache_dir)
+        except Exception as e:
+            # Keep using the current calibrations if the file is mid write or invalid
+            LOG.warning(f"Unable to reload calibrations from {self.filename}, keeping version {self.version} ({e})")
+            return False
         else:
-            # Single calibration, returned as a dict
-            if isinstance(calibrations, dict):
-                cal = calibrations
-
-            # Account for multiple calibrations
-            elif isinstance(calibrations, list):
-                # Check the date is provided
-                if date is None and len(calibrations) > 1:
-                    raise MissingMeasurementDateException("Multiple calibrations found, but no date provided")
-                else:
-                    # Find the calibration that matches the date
-                    for c in calibrations:
-                        if date >= pd.to_datetime(c['date']):
-                            cal = c
-
-                    # No matches were found, date is too early
-                    if cal is None:
-                        LOG.warning(f"All available calibrations for {serial} are not available before {date}, using default")
-                        cal = self._info['default']
-                        serial = 'UNKNOWN'
+            self._compiled, self._key = compiled, key
+            LOG.info(f"Reloaded calibrations from {self.filename} (version {self.version})")
+            return True
+        finally:
+            self._reload_lock.release()
+
+    def from_serial(self, serial:str, date: datetime=None) -> Calibration:
+        """ Build data object from the calibration result """
+        if self.watch:
+            self.refresh()
+        compiled = self._compiled
+        serial, cal = compiled.lookup(serial, date=date)
 
         if cal is not None and serial != 'UNKNOWN':
             LOG.info(f"Calibration found ({serial})!")
         else:
             LOG.warning(f"No calibration found for {serial}, using default")
 
-        result = Calibration(serial=serial, calibration=cal)
+        result = Calibration(serial=serial, calibration=cal, version=compiled.version)
         return result
@@ -0,0 +1,305 @@
+"""
+Command line interface for processing many Lyte profiles.
+
+Usage:
+    # Process a directory with 8 workers
+    study-lyte process data/ --output results/ --workers 8
+
+    # Spread the same job over 4 nodes sharing a filesystem, on node 2
+    study-lyte process 'data/**/*.csv' --output results/ --shard 2/4 --resume
+
+    # Combine the results of all the shards
+    study-lyte merge results/
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+import sys
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
+from pathlib import Path
+
+from .logging import setup_log
+
+LOG = logging.getLogger('study_lyte.cli')
+
+
+def parse_shard(value):
+    """
+    Parse a shard written as i/n where i is zero based
+
+    Returns:
+        tuple: (index, count)
+    """
+    try:
+        index, count = [int(v) for v in value.split('/')]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'Invalid shard {value}, use i/n e.g. 0/4')
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f'Invalid shard {value}, i must be between 0 and n - 1')
+    return index, count
+
+
+def find_files(inputs, pattern='*.csv'):
+    """
+    Gather the files to process from paths, directories and glob patterns
+
+    Args:
+        inputs: List of files, directories searched recursively with the pattern, or glob patterns
+        pattern: Glob pattern of files to find in directories
+    Returns:
+        files: Sorted list of unique resolved paths
+    """
+    files = set()
+    for value in inputs:
+        path = Path(value)
+        if path.is_dir():
+            files.update(path.rglob(pattern))
+        elif path.is_file():
+            files.add(path)
+        else:
+            files.update([Path(f) for f in glob.glob(value, recursive=True) if Path(f).is_file()])
+    return sorted([f.resolve() for f in files])
+
+
+def input_root(value):
+    """Directory an input is found from, the leading directories of a glob pattern"""
+    path = Path(value)
+    if path.is_dir():
+        return path.resolve()
+    elif path.is_file():
+        return path.resolve().parent
+    parts = []
+    for part in path.parts:
+        if any(c in part for c in '*?['):
+            break
+        parts.append(part)
+    return Path(*parts).resolve() if parts else Path.cwd()
+
+
+def find_root(inputs):
+    """Deepest directory containing every input, files are named relative to it"""
+    return Path(os.path.commonpath([input_root(v) for v in inputs]))
+
+
+def relative_name(filename, root=None):
+    """Path of a file relative to the input root so files with the same name in different directories differ"""
+    filename = Path(filename)
+    if root is None:
+        return filename.name
+    try:
+        return filename.resolve().relative_to(root).as_posix()
+    except ValueError:
+        return filename.resolve().as_posix()
+
+
+def in_shard(filename, shard, root=None):
+    """Deterministically assign a file to a shard using its path relative to the input root"""
+    if shard is None:
+        return True
+    index, count = shard
+    return zlib.crc32(relative_name(filename, root).encode()) % count == index
+
+
+def manifest_name(shard):
+    return 'manifest.jsonl' if shard is None else f'manifest-{shard[0]}-of-{shard[1]}.jsonl'
+
+
+def read_manifests(output):
+    """
+    Read every manifest in an output directory, later entries for a file replace earlier ones
+
+    Returns:
+        entries: Dictionary of manifest entries keyed by file
+    """
+    entries = {}
+    for path in sorted(Path(output).glob('manifest*.jsonl')):
+        with open(path) as fp:
+            for line in fp:
+                line = line.strip()
+                if line:
+                    entry = json.loads(line)
+                    entries[entry['file']] = entry
+    return entries
+
+
+def to_json(value):
+    """Convert numpy scalars and other values json can't handle"""
+    return value.item() if hasattr(value, 'item') else str(value)
+
+
+def write_profile(profile, directory, name=None):
+    """
+    Write the force and nir of a processed profile as csvs with the profile metadata
+
+    Args:
+        profile: Processed profile
+        directory: Directory to write to
+        name: Path of the profile relative to the input root, its directories are recreated
+            under directory. Defaults to the file name
+    """
+    from .io import write_csv
+    from .profile import Sensor
+
+    name = Path(name or profile.filename.name)
+    directory = Path(directory).joinpath(name.parent)
+    directory.mkdir(parents=True, exist_ok=True)
+    for data in ['force', 'nir']:
+        df = getattr(profile, data)
+        if isinstance(df, Sensor):
+            continue
+        write_csv(df, profile.metadata, str(directory.joinpath(f'{name.stem}_{data}.csv')))
+
+
+def process_file(filename, name=None, depth_method='fused', calibrations=None, profiles_dir=None, cache_dir=None):
+    """
+    Process a single profile, errors are recorded instead of raised so one bad file
+    doesn't stop a batch.
+
+    Args:
+        name: Path of the file relative to the input root used to name its outputs
+
+    Returns:
+        entry: Dictionary for the manifest with the file, status and profile summary
+    """
+    from .cache import ResultCache
+    from .calibrations import Calibrations
+    from .profile import LyteProfileV6
+
+    entry = {'file': str(filename), 'status': 'ok'}
+    try:
+        cache = None if cache_dir is None else ResultCache(cache_dir)
+        profile = LyteProfileV6(filename, depth_method=depth_method, cache=cache)
+        if calibrations is not None:
+            profile.set_calibration(Calibrations(calibrations))
+        entry['summary'] = profile.summary()
+        if profiles_dir is not None:
+            write_profile(profile, profiles_dir, name=name)
+        # After writing so the force and nir frames are cached too
+        profile.store_results()
+
+    except Exception as e:
+        LOG.error(f'Unable to process {filename}: {e}')
+        entry['status'] = 'error'
+        entry['error'] = f'{type(e).__name__}: {e}'
+    return entry
+
+
+def process(files, output, workers=1, shard=None, resume=False, depth_method='fused', calibrations=None,
+            profiles=True, cache_dir=None, root=None):
+    """
+    Process files writing each result to the manifest as soon as it finishes
+
+    Args:
+        root: Directory outputs and shards are named relative to, see find_root. Defaults
+            to the deepest directory containing the files
+
+    Returns:
+        entries: List of manifest entries for the files processed
+    """
+    output = Path(output)
+    output.mkdir(parents=True, exist_ok=True)
+    profiles_dir = None
+    if profiles:
+        profiles_dir = output.joinpath('profiles')
+        profiles_dir.mkdir(exist_ok=True)
+
+    if root is None and files:
+        root = Path(os.path.commonpath([Path(f).resolve().parent for f in files]))
+    files = [f for f in files if in_shard(f, shard, root=root)]
+    if resume:
+        # Files that failed are tried again
+        done = {file for file, entry in read_manifests(output).items() if entry['status'] == 'ok'}
+        files = [f for f in files if str(f) not in done]
+    LOG.info(f'Processing {len(files):,} files...')
+
+    worker = partial(process_file, depth_method=depth_method, calibrations=calibrations, profiles_dir=profiles_dir,
+                     cache_dir=cache_dir)
+    entries = []
+    with open(output.joinpath(manifest_name(shard)), 'a') as fp:
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(worker, f, relative_name(f, root)) for f in files]
+                for future in as_completed(futures):
+                    entry = future.result()
+                    fp.write(json.dumps(entry, default=to_json) + '\n')
+                    fp.flush()
+                    entries.append(entry)
+        else:
+            for f in files:
+                entry = worker(f, relative_name(f, root))
+                fp.write(json.dumps(entry, default=to_json) + '\n')
+                fp.flush()
+                entries.append(entry)
+    return entries
+
+
+def merge(output, filename='summary.csv'):
+    """
+    Combine the manifests of every shard in an output directory into a single summary table
+
+    Returns:
+        path: Path to the summary
+    """
+    import pandas as pd
+
+    rows = []
+    for file, entry in sorted(read_manifests(output).items()):
+        row = {'file': file, 'status': entry['status'], 'error': entry.get('error')}
+        row.update(entry.get('summary', {}))
+        rows.append(row)
+
+    path = Path(output).joinpath(filename)
+    # Write then rename so shards finishing together never leave a partial summary
+    tmp = path.with_suffix(f'.{os.getpid()}.tmp')
+    pd.DataFrame(rows).to_csv(tmp, index=False)
+    os.replace(tmp, path)
+    return path
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog='study-lyte', description='Batch processing of Lyte probe profiles')
+    parser.add_argument('-v', '--verbose', action='store_true', help='Show debug logging')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    proc = commands.add_parser('process', help='Process profiles and summarize them')
+    proc.add_argument('inputs', nargs='+', help='Files, directories or glob patterns of profiles')
+    proc.add_argument('-o', '--output', required=True, help='Directory to write results to')
+    proc.add_argument('--pattern', default='*.csv', help='Pattern of files to find in directories')
+    proc.add_argument('--workers', type=int, default=1, help='Number of processes to use')
+    proc.add_argument('--shard', type=parse_shard, help='Only process shard i of n (zero based) e.g. 0/4')
+    proc.add_argument('--resume', action='store_true', help='Skip files already in the manifest')
+    proc.add_argument('--depth-method', default='fused', choices=['fused', 'accelerometer', 'barometer'],
+                      help='Method used to compute depth')
+    proc.add_argument('--calibrations', help='Calibrations json to apply to each profile')
+    proc.add_argument('--cache', help='Directory to cache results in so unchanged files are not processed again')
+    proc.add_argument('--no-profiles', dest='profiles', action='store_false',
+                      help='Only write the summary, not the processed profiles')
+
+    mrg = commands.add_parser('merge', help='Combine the results of all shards into one summary')
+    mrg.add_argument('output', help='Directory results were written to')
+
+    args = parser.parse_args(args)
+    setup_log(debug=args.verbose)
+
+    if args.command == 'process':
+        files = find_files(args.inputs, pattern=args.pattern)
+        entries = process(files, args.output, workers=args.workers, shard=args.shard, resume=args.resume,
+                          depth_method=args.depth_method, calibrations=args.calibrations,
+                          profiles=args.profiles, cache_dir=args.cache, root=find_root(args.inputs))
+        path = merge(args.output)
+        failed = [e for e in entries if e['status'] != 'ok']
+        LOG.info(f'Processed {len(entries) - len(failed):,} of {len(entries):,} files, summary at {path}')
+        return 1 if failed else 0
+
+    elif args.command == 'merge':
+        path = merge(args.output)
+        LOG.info(f'Summary written to {path}')
+        return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
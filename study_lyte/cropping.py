@@ -1,6 +1,6 @@
 from study_lyte.adjustments import remove_ambient
 from .detect import get_acceleration_start, get_acceleration_stop, get_nir_surface
-from .adjustments import  get_neutral_bias_at_border
+from .adjustments import BorderBias
 from .decorators import time_series
 import pandas as pd
 
@@ -22,10 +22,9 @@ def crop_to_motion(df: pd.DataFrame, detect_col='Y-Axis', start_kwargs=None, sto
     start_kwargs = start_kwargs or {}
     stop_kwargs = stop_kwargs or {}
 
-    neutral = get_neutral_bias_at_border(df[detect_col])
-    start = get_acceleration_start(neutral, **start_kwargs)
-    neutral = get_neutral_bias_at_border(df[detect_col], direction='backward')
-    stop = get_acceleration_stop(neutral, **stop_kwargs)
+    bias = BorderBias(df[detect_col])
+    start = get_acceleration_start(bias.neutral('forward'), **start_kwargs)
+    stop = get_acceleration_stop(bias.neutral('backward'), **stop_kwargs)
     cropped = df.iloc[start:stop]
     return cropped
 
@@ -3,8 +3,9 @@ import numpy as np
 from types import SimpleNamespace
 
 from .decorators import time_series
-from .detect import nearest_peak
-from .adjustments import zfilter
+from .detect import nearest_peak, get_upward_motion
+from .adjustments import resample, zfilter
+from .timeseries import MultiRateTimeseries
 
 
 def cumulative_trapezoid(y, x=None, initial=0):
@@ -17,12 +18,13 @@ def cumulative_trapezoid(y, x=None, initial=0):
     Returns:
         cumulative integral array
     """
-    y = np.asarray(y)
+    # Always integrate in double precision
+    y = np.asarray(y, dtype=np.float64)
     if x is None:
         dx = 1.0
         x = np.arange(len(y))
     else:
-        x = np.asarray(x)
+        x = np.asarray(x, dtype=np.float64)
         dx = np.diff(x)
     # Calculate area for each interval
     area = (y[:-1] + y[1:]) / 2 * dx
@@ -99,7 +101,7 @@ def get_fitted_depth(df: pd.DataFrame, column='depth', poly_deg=5) -> pd.DataFra
     return df
 
 @time_series
-def get_constrained_baro_depth(baro_depth, start, stop, method='nanmedian'):
+def get_constrained_baro_depth(baro_depth, start, stop, method='nanmedian', decimate=1):
     """
     The Barometer depth is often stretched in time. Use the start and stop of the
     Accelerometer to constrain the peak/valley of the barometer, then rescale
@@ -109,13 +111,15 @@ def get_constrained_baro_depth(baro_depth, start, stop, method='nanmedian'):
         start: Index of start of motion to constrain the barometer
         stop: Index of stop of motion to constrain barometer
         method: aggregating method applied to data before the start and after stop
+        decimate: Search for the peak and valley on every nth sample then refine them at full resolution
     """
     window_func = getattr(np, method)
     mid = int((stop + start) / 2)
     n_points = len(baro_depth)
     top_search = baro_depth.iloc[:mid]
     default_top = np.where(top_search == top_search.max())[0][0]
-    top = nearest_peak(baro_depth.values, start, default_index=default_top, height=-10, distance=100)
+    top = nearest_peak(baro_depth.values, start, default_index=default_top, height=-10, distance=100,
+                       decimate=decimate)
 
     # Find valleys after, select closest to midpoint
     soft_stop = mid + int(0.1 * n_points)
@@ -125,7 +129,8 @@ def get_constrained_baro_depth(baro_depth, start, stop, method='nanmedian'):
     valley_search = baro_depth.iloc[mid:].values
     v_min = np.nanmin(valley_search)
     vmin_idx = np.where(valley_search == v_min)[0][0]
-    bottom = nearest_peak(-1 * valley_search, stop - mid, default_index=vmin_idx, height=-10, distance=100)
+    bottom = nearest_peak(-1 * valley_search, stop - mid, default_index=vmin_idx, height=-10, distance=100,
+                          decimate=decimate)
     bottom += mid
 
     if bottom == stop:
@@ -153,13 +158,61 @@ def get_constrained_baro_depth(baro_depth, start, stop, method='nanmedian'):
     return constrained
 
 
+def get_nearest_uniform_index(grid, time):
+    """
+    Index of the nearest sample of an evenly spaced grid to each time, computed from the
+    spacing rather than searched for. Ties go to the later sample like pandas.
+
+    Args:
+        grid: Evenly spaced increasing times e.g. from np.linspace
+        time: Times to find the nearest sample for
+    Returns:
+        idx: Integer array of indices into grid
+    """
+    grid = np.asarray(grid, dtype=np.float64)
+    time = np.asarray(time, dtype=np.float64)
+    last = len(grid) - 1
+    if last < 1:
+        return np.zeros(len(time), dtype=int)
+
+    position = (time - grid[0]) * (last / (grid[-1] - grid[0]))
+    left = np.clip(np.floor(position), 0, last - 1).astype(int)
+    # Correct for rounding so grid[left] <= time < grid[left + 1] where possible
+    left -= (left > 0) & (grid[left] > time)
+    left += (left < last - 1) & (grid[left + 1] <= time)
+
+    right = left + 1
+    idx = np.where(time - grid[left] < grid[right] - time, left, right)
+    idx[time <= grid[0]] = 0
+    idx[time >= grid[-1]] = last
+    return idx
+
+
 class DepthTimeseries:
     """
     Class for managing depth time series data
     """
-    def __init__(self, series, start_idx=None, stop_idx=None, origin=None):
+    def __init__(self, series, start_idx=None, stop_idx=None, origin=None, dtype=None, channel=None):
+        """
+        Args:
+            series: pandas Series of data indexed by time or a MultiRateTimeseries
+            start_idx: Index of the start of motion in the samples of the series
+            stop_idx: Index of the stop of motion in the samples of the series
+            origin: Index to zero the depth at, defaults to start_idx
+            dtype: Optional numpy dtype to store results in, computations are done in float64
+            channel: Name of the channel to use when series is a MultiRateTimeseries
+        """
+        # Use the channel at its own rate
+        if isinstance(series, MultiRateTimeseries):
+            if channel is None:
+                if len(series) != 1:
+                    raise ValueError(f'A channel is required to choose from {", ".join(series.channels)}')
+                channel = series.channels[0]
+            series = series.series(channel)
+
         # Hang on to the raw data
         self.raw = series
+        self.dtype = dtype
 
         # Keep track of the start stop
         self.start_idx = start_idx
@@ -180,25 +233,44 @@ class DepthTimeseries:
         self._distance_traveled_during_motion = None
         self._avg_distance_traveled = None
 
-        self._has_upward_motion = None
+        self._upward_motion = None
         self._velocity = None
         self._velocity_range = None
         self._max_velocity = None
 
+    def _store(self, series):
+        """Store a result series in the requested dtype"""
+        if self.dtype is not None:
+            series = series.astype(self.dtype, copy=False)
+        return series
+
     @property
     def depth(self):
         if self._depth is None:
-            self._depth = self.raw - self.raw.iloc[self.origin]
+            self._depth = self._store(self.raw - self.raw.iloc[self.origin])
         return self._depth
 
+    def at(self, time, method='linear'):
+        """
+        Depth resampled to other times e.g. those of a faster sensor
+
+        Args:
+            time: Times to resample to
+            method: linear, nearest or previous sample, see adjustments.resample
+        Returns:
+            depth: pandas Series indexed by time
+        """
+        depth = resample(self.depth.index.values, self.depth.values, time, method=method)
+        return self._store(pd.Series(depth, index=pd.Index(time, name='time'), name=self.depth.name))
+
     @property
     def velocity(self):
         if self._velocity is None:
             dt = self.depth.index[1] - self.depth.index[0]
-            velocity = np.gradient(self.depth, dt)
+            velocity = np.gradient(self.depth.values.astype(np.float64), dt)
             # Due to rounding issues the index is not evenly space, so filter the velocity
             velocity = zfilter(velocity, 0.01)
-            self._velocity = pd.Series(velocity, self.depth.index, name='velocity')
+            self._velocity = self._store(pd.Series(velocity, self.depth.index, name='velocity'))
         return self._velocity
 
     @property
@@ -245,45 +317,46 @@ class DepthTimeseries:
             self._distance_traveled_during_motion = abs(self.depth.iloc[self.start_idx] - self.depth.iloc[self.stop_idx])
         return self._distance_traveled_during_motion
 
+    @property
+    def upward_motion(self):
+        """Location and size of any upward motion in between the start and stop"""
+        if self._upward_motion is None:
+            self._upward_motion = get_upward_motion(self.raw.iloc[self.start_idx:self.stop_idx].values)
+        return self._upward_motion
+
     @property
     def has_upward_motion(self):
         """Contains upward motion in between the start and stop"""
-        if self._has_upward_motion is None:
-            self._has_upward_motion = False
-            # crop the depth data and downsample for speedy check
-            data = self.raw.iloc[self.start_idx:self.stop_idx]
-            if len(data) > 1000:
-                coarse = data.groupby(data.index // 200).first()
-            else:
-                coarse = data
-
-            # loop and find any values greater than the current value
-            for i, v in enumerate(coarse):
-                upward = np.any(coarse.iloc[i:] > v + 5)
-                if upward:
-                    self._has_upward_motion = True
-                    break
-
-        return self._has_upward_motion
+        return self.upward_motion.detected
 
 
 class BarometerDepth(DepthTimeseries):
-    def __init__(self, *args, angle=None, **kwargs):
+    def __init__(self, *args, angle=None, decimate=1, **kwargs):
+        """
+        Args:
+            angle: Angle of the probe in degrees to correct the depth for
+            decimate: Search for the barometer peak and valley on every nth sample, see get_constrained_baro_depth
+        """
         super().__init__(*args, **kwargs)
         self.angle = angle
+        self.decimate = decimate
 
     @property
     def depth(self):
         if self._depth is None:
             if self.stop_idx > self.start_idx:
-                self._depth = get_constrained_baro_depth(self.raw, self.start_idx, self.stop_idx, method='nanmean')['baro']
-                self._depth = self._depth.reindex(self.raw.index, method='nearest')
+                constrained = get_constrained_baro_depth(self.raw, self.start_idx, self.stop_idx, method='nanmean',
+                                                         decimate=self.decimate)['baro']
+                # Map back on to the raw times using the nearest sample
+                idx = get_nearest_uniform_index(constrained.index.values, self.raw.index.values)
+                self._depth = pd.Series(constrained.values[idx], index=self.raw.index, name='baro')
                 # Adjust for an angle
                 if self.angle is not None:
                     self._depth = self._depth / np.cos(np.pi * self.angle / 180)
 
             else:
                 self._depth = pd.Series(index=self.raw.index, data=np.zeros_like(self.raw.values))
+            self._depth = self._store(self._depth)
         return self._depth
 
 
@@ -296,6 +369,6 @@ class AccelerometerDepth(DepthTimeseries):
             self._depth = get_depth_from_acceleration(self.raw[valid])[self.raw.name]
             # Flatten out the depth at the end
             self._depth.iloc[self.stop_idx:] = self._depth.iloc[self.stop_idx]
-            self._depth = self._depth - self._depth.iloc[self.origin]
+            self._depth = self._store(self._depth - self._depth.iloc[self.origin])
 
         return self._depth
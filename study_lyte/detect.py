@@ -1,7 +1,10 @@
 import numpy as np
+from types import SimpleNamespace
 
-from .adjustments import (get_neutral_bias_at_border, get_normalized_at_border, get_points_from_fraction, get_neutral_bias_at_index,zfilter)
+from .adjustments import (BorderBias, get_bias_at_index, get_neutral_bias_at_border, get_normalized_at_border,
+                          get_points_from_fraction, zfilter)
 from .decorators import directional
+from .rolling import rolling_mean, rolling_std
 
 def find_nearest_value_index(search_value, series):
     """
@@ -16,18 +19,24 @@ def find_peaks(arr, height=None, distance=1):
     """
     Basic replacement for scipy.signal.find_peaks.
     Finds indices where arr[i] > arr[i-1] and arr[i] > arr[i+1].
-    Supports optional height and minimum distance between peaks.
+    Supports optional height and minimum distance between peaks, peaks
+    closer than the distance to the last peak kept are skipped.
     """
-    peaks = []
     arr = np.asarray(arr)
-    for i in range(1, len(arr) - 1):
-        if arr[i] > arr[i - 1] and arr[i] > arr[i + 1]:
-            if height is not None and arr[i] < height:
-                continue
-            if peaks and (i - peaks[-1]) < distance:
-                continue
-            peaks.append(i)
-    return np.array(peaks), arr[peaks]
+    candidates = np.flatnonzero((arr[1:-1] > arr[:-2]) & (arr[1:-1] > arr[2:])) + 1
+    if height is not None:
+        candidates = candidates[~(arr[candidates] < height)]
+
+    if distance > 1 and len(candidates) > 1:
+        # Jump straight to the next candidate far enough from the last peak
+        peaks = []
+        i = 0
+        while i < len(candidates):
+            peaks.append(candidates[i])
+            i = np.searchsorted(candidates, candidates[i] + distance, side='left')
+        candidates = np.array(peaks, dtype=int)
+
+    return candidates, arr[candidates]
 
 
 def first_peak(arr, default_index=1, **find_peak_kwargs):
@@ -43,8 +52,22 @@ def first_peak(arr, default_index=1, **find_peak_kwargs):
     return pk
 
 
-def nearest_peak(arr, nearest_to_index, default_index=0, **find_peak_kwargs):
-    """Find the nearest peak to a designated point"""
+def nearest_peak(arr, nearest_to_index, default_index=0, decimate=1, **find_peak_kwargs):
+    """
+    Find the nearest peak to a designated point. With decimate > 1 peaks are searched for
+    on every nth sample, which suits oversampled signals, and the one found is refined to
+    the maximum around it at full resolution.
+    """
+    if decimate > 1:
+        arr = np.asarray(arr)
+        kwargs = dict(find_peak_kwargs, distance=max(find_peak_kwargs.get('distance', 1) // decimate, 1))
+        pk = nearest_peak(arr[::decimate], nearest_to_index / decimate, default_index=None, **kwargs)
+        if pk is None:
+            return default_index
+        lo = max((pk - 1) * decimate, 0)
+        hi = min((pk + 1) * decimate + 1, len(arr))
+        return lo + int(np.nanargmax(arr[lo:hi]))
+
     pk_idx, pk_hgt = find_peaks(arr, **find_peak_kwargs)
     if len(pk_idx) > 0:
         nearest_val = pk_idx[(np.abs(pk_idx - nearest_to_index)).argmin()]
@@ -58,11 +81,7 @@ def find_valleys(arr):
     Finds indices where arr[i] < arr[i-1] and arr[i] < arr[i+1].
     """
     arr = np.asarray(arr)
-    valleys = []
-    for i in range(1, len(arr) - 1):
-        if arr[i] < arr[i - 1] and arr[i] < arr[i + 1]:
-            valleys.append(i)
-    return np.array(valleys)
+    return np.flatnonzero((arr[1:-1] < arr[:-2]) & (arr[1:-1] < arr[2:])) + 1
 
 
 def nearest_valley(arr, nearest_to_index, default_index=1):
@@ -226,7 +245,7 @@ def get_nir_surface(clean_active, threshold=30, max_threshold=None):
 
     # Retrieve a likely candidate under challenging ambient conditions
     window = get_points_from_fraction(len(neutral), 0.01)
-    diff = neutral.rolling(window=window).std().values
+    diff = rolling_std(neutral, window)
 
     # Detect likely candidate normal ambient conditions
     surface = get_signal_event(diff, search_direction='backward', threshold=threshold,
@@ -247,11 +266,10 @@ def get_nir_stop(active, fractional_basis=0.05, max_threshold=0.008, threshold=-
     n = get_points_from_fraction(len(active), 0.1)
     border_fract = 0.3
     norm_active = get_normalized_at_border(active, fractional_basis=border_fract, direction='backward')
-    norm_active = norm_active.rolling(window=n, center=True, closed='both', min_periods=1).mean()
-    norm_active = norm_active - 1
+    norm_active = rolling_mean(norm_active, n, center=True, closed='both', min_periods=1) - 1
 
-    ind = np.where(norm_active == norm_active.max())[0][0]
-    data = norm_active.iloc[ind:]
+    ind = np.where(norm_active == np.nanmax(norm_active))[0][0]
+    data = norm_active[ind:]
     # diff = diff.rolling(window=n, center=True, closed='both', min_periods=1).median()
 
     n_points = get_points_from_fraction(len(data), fractional_basis)
@@ -276,42 +294,327 @@ def get_sensor_start(signal, fractional_basis=0.05, max_threshold=0.05, threshol
     return first_change
 
 
-def get_ground_strike(signal, stop_idx):
+def get_ground_strike(signal, stop_idx, diagnostics=False):
+    """
+    The probe hits ground somtimes before we detect stop. Looks around the stop for a large
+    change in the signal (impact) that coincides with a long stretch of unchanging data (long press).
+
+    Args:
+        signal: Numpy Array or pandas Series of the force signal
+        stop_idx: Integer index of the stop
+        diagnostics: Bool to also return the intermediate signals, off by default so they cost nothing
+
+    Returns:
+        ground: Integer index of the ground strike, None if not detected
+        diagnostics: Only when requested, SimpleNamespace with attributes:
+            **start**: Integer index in the signal where the searched window starts
+            **diff**: Numpy array of the bias adjusted rolling std in the window
+            **norm1**: Numpy array of the signal in the window adjusted by its bias at the stop
+            **impact**: Integer index of the large change in signal, None if not found
+            **long_press**: Integer index of the unchanging data, None if not found
+    """
+    packed, lengths = pack_arrays([signal])
+    result = get_batch_ground_strike(packed, lengths, np.array([stop_idx]), diagnostics=diagnostics)
+    ground, info = result if diagnostics else (result, None)
+    ground = None if ground[0] == -1 else int(ground[0])
+
+    # from .plotting import  plot_ground_strike, plot_ts
+    # plot_ground_strike(signal, diff, norm1, start, stop_idx, impact, long_press,ground)
+    if diagnostics:
+        n = info.length[0]
+        info = SimpleNamespace(start=int(info.start[0]), diff=info.diff[0, :n], norm1=info.norm1[0, :n],
+                               impact=None if info.impact[0] == -1 else int(info.impact[0]),
+                               long_press=None if info.long_press[0] == -1 else int(info.long_press[0]))
+        return ground, info
+    return ground
+
+
+def get_upward_motion(depth, threshold=5):
+    """
+    Detect upward motion in a depth timeseries in a single vectorized pass. A suffix maximum
+    provides the highest position reached at or after every sample, so the upward excursion
+    from each sample is the difference between the two.
+
+    Args:
+        depth: Numpy Array or pandas Series of depth in cm, negative is down
+        threshold: Float minimum rise in cm to be considered upward motion
+
+    Returns:
+        upward: SimpleNamespace with attributes:
+            **detected**: Bool indicating any excursion exceeded the threshold
+            **index**: Integer index where the largest excursion begins, None if not detected
+            **peak**: Integer index of the highest point reached after index, None if not detected
+            **magnitude**: Float of the largest upward excursion in cm
+            **excursions**: Numpy array of the upward excursion in cm available from each sample
+    """
+    arr = np.asarray(depth, dtype=float)
+    upward = SimpleNamespace(detected=False, index=None, peak=None, magnitude=0.0,
+                             excursions=np.zeros_like(arr))
+    if len(arr) == 0 or np.all(np.isnan(arr)):
+        return upward
+
+    # Highest point reached from each sample onward, ignoring nans
+    suffix_max = np.fmax.accumulate(arr[::-1])[::-1]
+    excursions = np.nan_to_num(suffix_max - arr, nan=0.0)
+    idx = int(np.argmax(excursions))
+
+    upward.excursions = excursions
+    upward.magnitude = float(excursions[idx])
+    if upward.magnitude > threshold:
+        upward.detected = True
+        upward.index = idx
+        upward.peak = idx + int(np.nanargmax(arr[idx:]))
+    return upward
+
+
+def pack_arrays(arrays, fill=np.nan):
+    """
+    Pack a ragged collection of arrays into a padded 2D float array
+
+    Args:
+        arrays: List of numpy arrays or pandas Series
+        fill: Value used to pad the rows
+    Returns:
+        tuple:
+            **packed**: 2D numpy array with one row per array
+            **lengths**: Integer numpy array of the length of each array
+    """
+    lengths = np.array([len(a) for a in arrays], dtype=np.int64)
+    packed = np.full((len(arrays), lengths.max(initial=0)), fill, dtype=np.float64)
+    for i, arr in enumerate(arrays):
+        packed[i, :lengths[i]] = np.asarray(arr, dtype=np.float64)
+    return packed, lengths
+
+
+def get_batch_signal_event(arr, start, stop, threshold=0.001, search_direction='forward', max_threshold=None,
+                           n_points=1):
+    """
+    Batch version of get_signal_event. Each row of a 2D array is searched between its own
+    start and stop with the same rules for the threshold and n points in a row.
+
+    Args:
+        arr: 2D numpy array of signals, one per row
+        start: Integer or array of the first index searched in each row
+        stop: Integer or array of the index after the last searched in each row
+        threshold: Float value of a min threshold of values to return as the event
+        search_direction: string indicating which direction in the data to begin searching for event, options are
+                        forward/backward
+        max_threshold: Float value of a max threshold that events have to be under to be an event
+        n_points: Integer or array of number of points in a row meeting threshold criteria to be an event.
+
+    Returns:
+        event_idx: Integer array of the event index relative to start, -1 where there was no event
+    """
+    if search_direction not in ['forward', 'backward']:
+        raise ValueError(f'search_direction = {search_direction} is an invalid direction, use either forward or '
+                         f'backward.')
+    n_rows, n_samples = arr.shape
+    start = np.broadcast_to(start, (n_rows,)).astype(np.int64)
+    stop = np.broadcast_to(stop, (n_rows,)).astype(np.int64)
+    # n points can't be 0
+    n_points = np.broadcast_to(n_points, (n_rows,)).astype(np.int64)
+    n_points = np.where(n_points == 0, 1, n_points)[:, np.newaxis]
+
+    # Invert the rows and their search window if backwards looking
+    lo, hi = start, stop
+    if search_direction == 'backward':
+        arr = arr[:, ::-1]
+        lo, hi = n_samples - stop, n_samples - start
+
+    pos = np.arange(n_samples)
+    with np.errstate(invalid='ignore'):
+        idx = arr >= threshold
+        if max_threshold is not None:
+            idx = idx & (arr < max_threshold)
+    idx = idx & (pos >= lo[:, np.newaxis]) & (pos < hi[:, np.newaxis])
+
+    # Number of points in a row meeting the criteria ending at each point
+    run = pos - np.maximum.accumulate(np.where(idx, -1, pos), axis=1)
+    first = np.where(idx.any(axis=1), idx.argmax(axis=1), -1)[:, np.newaxis]
+
+    # Matches get_signal_event, which needs one point more than n points in a row before
+    # the last n points unless the run began at the very first match
+    match = idx & ((n_points == 1) | (run >= n_points + 1) | ((run >= n_points) & (pos - n_points + 1 == first)))
+
+    # The last match in the search direction is the event
+    found = match.any(axis=1)
+    event_idx = n_samples - 1 - match[:, ::-1].argmax(axis=1) - lo
+    if search_direction == 'backward':
+        event_idx = (stop - start) - 1 - event_idx
+    return np.where(found, event_idx, -1)
+
+
+def get_batch_acceleration_start(acceleration, lengths, threshold=-0.01, max_threshold=0.02):
+    """
+    Batch version of get_acceleration_start
+
+    Args:
+        acceleration: 2D numpy array of acceleration without gravity padded with nans, one profile per row
+        lengths: Integer array of the length of each profile
+        threshold: relative minimum change to indicate start
+        max_threshold: Maximum allowed threshold to be considered a start
+    Return:
+        acceleration_start: Integer array of the first index in each profile meeting the criteria
+    """
+    # Move the nans to the end of each row keeping the order of the data
+    order = np.argsort(np.isnan(acceleration), axis=1, kind='stable')
+    accel_neutral = np.take_along_axis(acceleration, order, axis=1)
+    n_valid = (~np.isnan(acceleration)).sum(axis=1)
+
+    # First peak between the start and the max, defaults to 1 like first_peak
+    magnitude = np.abs(accel_neutral)
+    center = magnitude[:, 1:-1]
+    with np.errstate(invalid='ignore'):
+        peaks = (center > magnitude[:, :-2]) & (center > magnitude[:, 2:]) & ~(center < 0.3)
+    max_ind = np.where(peaks.any(axis=1), peaks.argmax(axis=1) + 1, 1)
+
+    n_points = [get_points_from_fraction(n, 0.005) for n in lengths]
+    acceleration_start = get_batch_signal_event(accel_neutral, 0, np.minimum(max_ind + 1, n_valid),
+                                                threshold=threshold, max_threshold=max_threshold,
+                                                n_points=n_points, search_direction='forward')
+    return np.where(acceleration_start == -1, 0, acceleration_start)
+
+
+def get_batch_acceleration_stop(acceleration, lengths, threshold=-0.2, max_threshold=0.1):
+    """
+    Batch version of get_acceleration_stop
+
+    Args:
+        acceleration: 2D numpy array of acceleration without gravity padded with nans, one profile per row
+        lengths: Integer array of the length of each profile
+        threshold: Float in g's for minimum to consider
+        max_threshold: Max threshold to consider
+    Return:
+        acceleration_stop: Integer array of the last index in each profile meeting the criteria
     """
-    The probe hits ground somtimes before we detect stop.
+    pos = np.arange(acceleration.shape[1])
+    valid = pos < lengths[:, np.newaxis]
+    min_idx = np.where(valid, acceleration, np.inf).argmin(axis=1)
+    max_idx = np.where(valid, acceleration, -np.inf).argmax(axis=1)
+
+    # Large impact early in during the accelerating down, find the deceleration later than the maximum
+    after_max = valid & (pos >= max_idx[:, np.newaxis])
+    later_min_idx = np.where(after_max, acceleration, np.inf).argmin(axis=1)
+    search_start = np.where(min_idx < max_idx, later_min_idx, min_idx)
+
+    n_points = [get_points_from_fraction(n, 0.05, maximum=1000) for n in lengths - search_start]
+    acceleration_stop = get_batch_signal_event(acceleration, search_start, lengths, threshold=threshold,
+                                               max_threshold=max_threshold, n_points=n_points,
+                                               search_direction='backward')
+    return np.where(acceleration_stop <= 0, lengths - 1, acceleration_stop + search_start)
+
+
+def get_batch_nir_surface(clean_active, lengths, threshold=30, max_threshold=None):
     """
-    buffer = get_points_from_fraction(len(signal), 0.12)
-    start = stop_idx - buffer
-    start = start if start > 0 else 0
-    end = stop_idx + buffer
-    end = end if end < len(signal) else len(signal)-1
+    Batch version of get_nir_surface
+
+    Args:
+        clean_active: 2D numpy array of the clean NIR signal padded with nans, one profile per row
+        lengths: Integer array of the length of each profile
+        threshold: Float minimum relative percent change threshold value for a snow surface event
+        max_threshold: Float maximum relative percent change threshold value for a snow surface event
+
+    Return:
+        surface: Integer array of the estimated snow surface in each profile
+    """
+    bias = [BorderBias(row[:n]).forward for row, n in zip(clean_active, lengths)]
+    neutral = clean_active - np.array(bias)[:, np.newaxis]
+
+    window = [get_points_from_fraction(n, 0.01) for n in lengths]
+    diff = rolling_std(neutral, window)
+    surface = get_batch_signal_event(diff, 0, lengths, search_direction='backward', threshold=threshold,
+                                     max_threshold=max_threshold, n_points=1)
+    return np.where((surface == lengths - 1) | (surface == -1), 0, surface)
+
+
+def get_batch_ground_strike(signal, lengths, stop_idx, diagnostics=False):
+    """
+    Batch version of get_ground_strike. The window around each stop is gathered once and both
+    the impact and long press criteria are evaluated from it without any python loops over samples.
+
+    Args:
+        signal: 2D numpy array of the force signal padded with nans, one profile per row
+        lengths: Integer array of the length of each profile
+        stop_idx: Integer array of the stop in each profile
+        diagnostics: Bool to also return the intermediate signals
+
+    Return:
+        ground: Integer array of the ground strike in each profile, -1 where none was detected
+        diagnostics: Only when requested, SimpleNamespace of arrays with one row per profile:
+            **start**: Index in the signal where each window starts
+            **length**: Number of samples in each window
+            **diff**: 2D array of the bias adjusted rolling std in each window
+            **norm1**: 2D array of the window adjusted by its bias at the stop
+            **impact**: Index of the large change in signal, -1 if not found
+            **long_press**: Index of the unchanging data, -1 if not found
+    """
+    buffer = np.array([get_points_from_fraction(n, 0.12) for n in lengths], dtype=np.int64)
+    start = np.maximum(stop_idx - buffer, 0)
+    end = np.minimum(stop_idx + buffer, lengths - 1)
+    n_segment = end - start
     rel_stop = stop_idx - start
 
-    sig_arr = signal[start:end]
-    window = get_points_from_fraction(len(sig_arr), 0.01)
-    diff = sig_arr.rolling(window=window).std().values
-    diff = get_neutral_bias_at_border(diff, direction='backward')
+    # Gather the data around the stop
+    pos = np.arange(n_segment.max(initial=0))
+    gather = np.minimum(start[:, np.newaxis] + pos, signal.shape[1] - 1)
+    sig_arr = np.where(pos < n_segment[:, np.newaxis], np.take_along_axis(signal, gather, axis=1), np.nan)
+
+    window = [get_points_from_fraction(n, 0.01) for n in n_segment]
+    diff = rolling_std(sig_arr, window)
+    bias = [BorderBias(row[:n]).backward for row, n in zip(diff, n_segment)]
+    diff = diff - np.array(bias)[:, np.newaxis]
 
     # Large change in signal
-    impact = get_signal_event(diff, threshold=150, max_threshold=1000, n_points=1, search_direction='forward')
+    impact = get_batch_signal_event(diff, 0, n_segment, threshold=150, max_threshold=1000, n_points=1,
+                                    search_direction='forward')
 
     # Large chunk of data that's the same near the stop
-    norm1 = get_neutral_bias_at_index(sig_arr, rel_stop+buffer).values
-    n_points = get_points_from_fraction(len(norm1), 0.1)
-    long_press = get_signal_event(norm1, threshold=-10000, max_threshold=150, n_points=n_points, search_direction='backward')
-    tol = get_points_from_fraction(len(norm1), 0.1)
-
-    ground = None
-    if impact is not None:
-        impact += start
-    if long_press is not None:
-        long_press += start
-
-    if long_press is not None and impact is not None:
-        if (long_press-tol) <= impact <= (long_press+tol):
-            ground = impact
+    bias = [get_bias_at_index(row[:n], index) for row, n, index in zip(sig_arr, n_segment, rel_stop + buffer)]
+    norm1 = sig_arr - np.array(bias)[:, np.newaxis]
+    n_points = np.array([get_points_from_fraction(n, 0.1) for n in n_segment], dtype=np.int64)
+    long_press = get_batch_signal_event(norm1, 0, n_segment, threshold=-10000, max_threshold=150,
+                                        n_points=n_points, search_direction='backward')
+
+    coincident = (impact != -1) & (long_press != -1) & (np.abs(impact - long_press) <= n_points)
+    ground = np.where(coincident, impact + start, -1)
+    if diagnostics:
+        info = SimpleNamespace(start=start, length=n_segment, diff=diff, norm1=norm1,
+                               impact=np.where(impact == -1, -1, impact + start),
+                               long_press=np.where(long_press == -1, -1, long_press + start))
+        return ground, info
+    return ground
+
+
+def get_batch_events(accelerations, nirs, forces):
+    """
+    Detect the start, stop, snow surface and ground strike of many profiles at once. The
+    ragged inputs are packed into padded 2D arrays and the detection runs along the batch.
+    Results are identical to calling the individual detectors on each profile with
+    float64 data.
 
-    # from .plotting import  plot_ground_strike, plot_ts
-    # plot_ground_strike(signal, diff, norm1, start, stop_idx, impact, long_press,ground)
+    Args:
+        accelerations: List of arrays of the motion column e.g. Y-Axis with gravity, one per profile
+        nirs: List of arrays of the clean NIR signal with the ambient removed, one per profile
+        forces: List of arrays of the raw force signal (Sensor1), one per profile
 
-    return ground
\ No newline at end of file
+    Returns:
+        events: SimpleNamespace of integer arrays with one entry per profile:
+            **start**: Index of the start of motion
+            **stop**: Index of the stop of motion
+            **surface**: Index of the snow surface according to the NIR
+            **ground**: Index of the ground strike, -1 where none was detected
+    """
+    acceleration, lengths = pack_arrays(accelerations)
+    nir, nir_lengths = pack_arrays(nirs)
+    force, force_lengths = pack_arrays(forces)
+
+    # Remove gravity using the bias at either end of each profile
+    biases = [BorderBias(row[:n]) for row, n in zip(acceleration, lengths)]
+    forward = acceleration - np.array([b.forward for b in biases])[:, np.newaxis]
+    backward = acceleration - np.array([b.backward for b in biases])[:, np.newaxis]
+
+    start = get_batch_acceleration_start(forward, lengths)
+    stop = get_batch_acceleration_stop(backward, lengths)
+    surface = get_batch_nir_surface(nir, nir_lengths)
+    ground = get_batch_ground_strike(force, force_lengths, stop)
+    return SimpleNamespace(start=start, stop=stop, surface=surface, ground=ground)
@@ -1,6 +1,79 @@
-import matplotlib.pyplot as plt
+# Matplotlib is imported inside each function so importing this module stays cheap
+import numpy as np
+
 from .styles import EventStyle
 
+
+def _minmax_indices(y, n_buckets):
+    """Index of the min and max of each bucket of samples, nans are skipped unless a bucket is all nan"""
+    n = len(y)
+    size = -(-n // n_buckets)
+    n_buckets = -(-n // size)
+    missing = np.isnan(y)
+    offsets = np.arange(n_buckets) * size
+    # Buckets as rows of equal size, the last one padded out
+    padded = np.empty(n_buckets * size)
+    padded[:n] = np.where(missing, np.inf, y)
+    padded[n:] = np.inf
+    lows = padded.reshape(n_buckets, size).argmin(axis=1) + offsets
+    padded[:n][missing] = -np.inf
+    padded[n:] = -np.inf
+    highs = padded.reshape(n_buckets, size).argmax(axis=1) + offsets
+    return np.unique(np.concatenate([[0, n - 1], np.minimum(lows, n - 1), np.minimum(highs, n - 1)]))
+
+
+def _lttb_indices(x, y, n_out):
+    """Largest triangle three buckets, keeps the point forming the largest triangle with its neighbors"""
+    n = len(y)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    selected = np.empty(n_out, dtype=int)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Average of the next bucket, the last point closes the series
+        nxt = slice(hi, edges[i + 2]) if i + 2 < len(edges) else slice(n - 1, n)
+        cx = x[nxt].mean()
+        cy = np.nanmean(y[nxt]) if np.isfinite(y[nxt]).any() else y[a]
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + (np.nanargmax(area) if np.isfinite(area).any() else 0)
+        selected[i + 1] = a
+    return selected
+
+
+def decimate(x, y, n_buckets, method='minmax'):
+    """
+    Choose the samples to draw so a long series looks the same at a given resolution
+
+    Args:
+        x: Array of increasing x values
+        y: Array of values, 2D arrays keep the samples chosen for any of their columns
+        n_buckets: Number of buckets e.g. the pixel width of the axes
+        method: minmax keeps the min and max of each bucket (up to 2 * n_buckets points) so spikes
+            are never lost, lttb keeps one point per bucket by largest-triangle-three-buckets
+    Returns:
+        indices: Increasing indices of the samples to draw
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n_buckets = int(n_buckets)
+    if y.ndim > 1:
+        return np.unique(np.concatenate([decimate(x, column, n_buckets, method=method) for column in y.T]))
+
+    if method == 'minmax':
+        if len(y) <= 2 * n_buckets or n_buckets < 1:
+            return np.arange(len(y))
+        return _minmax_indices(y, n_buckets)
+
+    elif method == 'lttb':
+        if len(y) <= n_buckets or n_buckets < 3:
+            return np.arange(len(y))
+        return _lttb_indices(np.asarray(x, dtype=np.float64), y, n_buckets)
+
+    else:
+        raise ValueError(f'Unrecognized decimation method {method}, options are minmax or lttb!')
+
+
 def plot_events(ax, profile_events, plot_type='normal', event_alpha=0.6):
     """
     Plots the hline or vline for each event on a plot
@@ -30,7 +103,17 @@ def plot_events(ax, profile_events, plot_type='normal', event_alpha=0.6):
                     label=style.label, alpha=event_alpha,  linewidth=style.linewidth)
 
 
-def plot_ts(data, data_label=None, time_data=None, events=None, thresholds=None, features=None, show=True, ax=None, alpha=1.0, color=None):
+def plot_ts(data, data_label=None, time_data=None, events=None, thresholds=None, features=None, show=True, ax=None,
+            alpha=1.0, color=None, exact=False, method='minmax'):
+    """
+    Plot a time series with optional events, thresholds and features. Long series are
+    decimated to the pixel width of the axes unless exact is requested.
+
+    Args:
+        exact: Draw every sample
+        method: Decimation method minmax or lttb, see decimate
+    """
+    import matplotlib.pyplot as plt
     if ax is None:
         fig, ax = plt.subplots(1)
         ax.grid(True)
@@ -41,9 +124,19 @@ def plot_ts(data, data_label=None, time_data=None, events=None, thresholds=None,
         mark = '-'
 
     if time_data is not None:
-        ax.plot(time_data, data, mark, alpha=alpha, label=data_label, color=color)
+        x = time_data
     else:
-        ax.plot(data, mark, alpha=alpha, label=data_label, color=color)
+        # Matches matplotlib plotting a series against its index
+        x = data.index if hasattr(data, 'index') else np.arange(n_samples)
+
+    y = data
+    if not exact:
+        idx = decimate(x, data, ax.get_window_extent().width, method=method)
+        if len(idx) < n_samples:
+            x = np.asarray(x)[idx]
+            y = np.asarray(data)[idx]
+
+    ax.plot(x, y, mark, alpha=alpha, label=data_label, color=color)
 
     if data_label is not None:
         ax.legend()
@@ -98,6 +191,7 @@ def plot_fused_depth(acc_depth, baro_depth, avg, scaled_baro=None, error=None):
     """
     Diagnostic plot to show the inner workings of the fusing technique
     """
+    import matplotlib.pyplot as plt
     events = None
     if error is not None:
         events=[('error',error)]
@@ -112,6 +206,7 @@ def plot_fused_depth(acc_depth, baro_depth, avg, scaled_baro=None, error=None):
 
 
 def plot_ground_strike(signal, impact_series, long_press_series, search_start, stop_idx, impact, long_press, ground):
+    import matplotlib.pyplot as plt
     events = [('stop', stop_idx)]
     impact_events = [('stop', stop_idx - search_start)]
 
@@ -142,6 +237,7 @@ def plot_ground_strike(signal, impact_series, long_press_series, search_start, s
     plt.show()
 
 def plot_nir_cleaning(active, ambient, norm_active, norm_ambient, diff, clean):
+    import matplotlib.pyplot as plt
 
     fig,axes = plt.subplots(2,1)
     # Plot normalized
@@ -156,6 +252,7 @@ def plot_nir_cleaning(active, ambient, norm_active, norm_ambient, diff, clean):
     plt.show()
 
 def plot_nir_surface(clean_active, diff, surface):
+    import matplotlib.pyplot as plt
     events = []
     if surface is not None:
         events.append(('surface', surface))
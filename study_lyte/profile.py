@@ -6,16 +6,13 @@ from types import SimpleNamespace
 import numpy as np
 from functools import cached_property
 from . io import read_data, find_metadata
-from .adjustments import get_neutral_bias_at_border, remove_ambient, apply_calibration, get_points_from_fraction, zfilter
-from .detect import get_acceleration_start, get_acceleration_stop, get_nir_surface, get_nir_stop, get_sensor_start, get_ground_strike
+from .adjustments import BorderBias, remove_ambient, apply_calibration, zfilter, compact_dtypes
+from .detect import (get_acceleration_start, get_acceleration_stop, get_nir_surface, get_nir_stop, get_sensor_start,
+                     get_ground_strike, get_upward_motion)
 from .depth import AccelerometerDepth, BarometerDepth
-from .logging import setup_log
 from .calibrations import Calibrations
 import logging
 
-
-setup_log()
-
 LOG = logging.getLogger('study_lyte.profile')
 
 @dataclass
@@ -37,19 +34,87 @@ class Sensor(Enum):
     UNINTERPRETABLE = -2
 
 
+class CroppedData:
+    """
+    Columns of full length arrays cropped to a window without copying. Columns are
+    returned as read only views, depth is rebased to zero at the start of the window
+    the first time it is requested.
+    """
+    def __init__(self, columns: dict, start: int, stop: int, rebase: str = 'depth'):
+        """
+        Args:
+            columns: Dictionary of column names to full length numpy arrays
+            start: Index of the first sample in the window
+            stop: Index after the last sample in the window
+            rebase: Column name to zero at the start of the window
+        """
+        self._columns = columns
+        self.start = start
+        self.stop = stop
+        self.rebase = rebase
+        self._cache = {}
+
+    @property
+    def columns(self):
+        return list(self._columns.keys())
+
+    @property
+    def empty(self):
+        return len(self) == 0
+
+    def __len__(self):
+        return max(self.stop - self.start, 0)
+
+    def __contains__(self, column):
+        return column in self._columns
+
+    def __getitem__(self, column):
+        if column not in self._cache:
+            arr = self._columns[column][self.start:self.stop]
+            if column == self.rebase and len(arr) > 0:
+                arr = arr - arr[0]
+            else:
+                arr = arr.view()
+            arr.flags.writeable = False
+            self._cache[column] = arr
+        return self._cache[column]
+
+    def to_frame(self, copy=False):
+        """
+        Materialize the window as a dataframe
+
+        Args:
+            copy: Copy the columns so the frame owns writable data, otherwise only the rebased
+                column is allocated and the frame is read only
+        """
+        return pd.DataFrame({c: self[c] for c in self.columns}, copy=copy)
+
+
 class GenericProfileV6:
+    precisions = ['full', 'compact']
+    # Attributes kept in the result cache
+    cached_results = []
+    # Header entries the processing depends on, other header edits keep the cached results
+    cache_metadata = ['RECORDED', 'SAMPLE RATE', 'ZPFO', 'ACC. Range']
+
     def __init__(self, filename, surface_detection_offset=4.5, calibration=None,
-             tip_diameter_mm=5):
+             tip_diameter_mm=5, precision='full'):
         """
         Args:
             filename: path to valid lyte probe csv.
             surface_detection_offset: Geometric offset between nir sensors and tip in cm.
             calibration: Dictionary of keys and polynomial coefficients to calibration sensors
             tip_diameter_mm: diameter of the force tip in mm
+            precision: full to hold everything as float64, compact to store ADC channels as int16
+                and derived data as float32. Computations are done in float64 regardless.
         """
+        if precision not in self.precisions:
+            raise ValueError(f'Invalid precision {precision}, options are {", ".join(self.precisions)}.')
+
         self.filename = Path(filename)
         self.surface_detection_offset = surface_detection_offset
         self.tip_diameter_mm = tip_diameter_mm
+        self.precision = precision
 
         # Properties
         self._raw = None
@@ -57,7 +122,11 @@ class GenericProfileV6:
         self._point = None
         self._serial_number = None
         self._calibration = calibration or None
+        self.calibration_version = None  # Version of the external calibrations assigned
         self.header_position = None
+        self.cache = None  # ResultCache to hydrate results from
+        self._cache_key = None
+        self._hydrated = []  # Results retrieved from the cache
 
         # Dataframes
         self._depth = None  # Final depth series used for analysis
@@ -65,6 +134,9 @@ class GenericProfileV6:
         self._cropped = None  # Full dataframe cropped to surface and stop
         self._force = None
         self._nir = None
+        self._pressure = None
+        self._force_view = None  # Uncopied force cropped to the snow
+        self._nir_view = None  # Uncopied nir cropped to the snow
 
         # Useful stats/info properties
         self._distance_traveled = None  # distance travelled while moving
@@ -72,21 +144,97 @@ class GenericProfileV6:
         self._avg_velocity = None  # avg velocity of the probe while in the snow
         self._resolution = None  # Vertical resolution of the profile in the snow
         self._datetime = None
-        self._has_upward_motion = None  # Flag for datasets containing upward motion
+        self._n_points = None  # Number of samples recorded
+        self._upward_motion = None  # Location and size of any upward motion
 
         # Time series events
         self._start = None
         self._stop = None
         self._surface = None
+        self._nir_surface = None
         self._error = None
         self._ground = None
 
     def assign_event_depths(self, depth:pd.Series):
         """" Enable depth assignment post depth realization """
-        self.events
-        for event in [self._start, self._stop]:
+        for event in [self.start, self.stop]:
             event.depth = depth.iloc[event.index]
-        self._surface = self.assign_surface_depths(depth)
+
+    def resolve_start(self):
+        """ Resolve any events that move the start, called before reporting the start """
+        return self.start
+
+    def process(self):
+        """
+        Compute all the analysis stages (depth, events, force, nir) and the metrics cached
+        with them so they are kept with the profile e.g. when it is pickled or shared with
+        another process
+        """
+        self.depth
+        self.events
+        self.force
+        self.nir
+        self.upward_motion
+        self.n_points
+        self.store_results()
+        return self
+
+    @property
+    def cache_parameters(self):
+        """Everything other than the file the cached results depend on"""
+        return {'profile': type(self).__name__,
+                'surface_detection_offset': self.surface_detection_offset,
+                'tip_diameter_mm': self.tip_diameter_mm,
+                'precision': self.precision,
+                'calibration': self.calibration,
+                'metadata': {k: self.metadata.get(k) for k in self.cache_metadata}}
+
+    @property
+    def cache_key(self):
+        if self._cache_key is None:
+            self._cache_key = self.cache.get_key(self.filename, self.cache_parameters)
+        return self._cache_key
+
+    def hydrate(self):
+        """
+        Assign any results not yet computed from the cache
+
+        Returns:
+            hydrated: List of attributes retrieved from the cache
+        """
+        if self.cache is None or self.filename is None:
+            return []
+
+        results = self.cache.load(self.cache_key) or {}
+        hydrated = []
+        for name, value in results.items():
+            if name in self.cached_results and getattr(self, name) is None:
+                setattr(self, name, value)
+                hydrated.append(name)
+        if hydrated:
+            LOG.info(f'Retrieved {", ".join([n.lstrip("_") for n in hydrated])} from the cache')
+        self._hydrated += hydrated
+        return hydrated
+
+    def store_results(self):
+        """
+        Write the results computed so far to the cache, nothing is written if
+        everything came from the cache already
+        """
+        if self.cache is None or self.filename is None:
+            return
+        results = {name: getattr(self, name) for name in self.cached_results if getattr(self, name) is not None}
+        if results and sorted(results.keys()) != sorted(self._hydrated):
+            self.cache.store(self.cache_key, results)
+            self._hydrated = list(results.keys())
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # Views are cheap to rebuild and would duplicate arrays held elsewhere
+        for name in ['_force_view', '_nir_view', '_motion_bias']:
+            if name in state:
+                state[name] = None
+        return state
 
     @property
     def serial_number(self):
@@ -104,6 +252,15 @@ class GenericProfileV6:
         """
         cal = ext_calibrations.from_serial(self.serial_number, date=self.datetime)
         self._calibration = cal.calibration
+        self.calibration_version = cal.version
+        self._force_view = None
+        self._force = None
+        self._pressure = None
+        if self.cache is not None:
+            # Results under the new calibration may already be cached
+            self._cache_key = None
+            self._hydrated = [n for n in self._hydrated if n != '_force']
+            self.hydrate()
 
     @property
     def calibration(self):
@@ -126,9 +283,67 @@ class GenericProfileV6:
             metadata = self.metadata
             self._raw, self._meta = read_data(str(self.filename), metadata, self.header_position)
             self._raw = self.process_df(self.raw)
+            if self.precision == 'compact':
+                self._raw = compact_dtypes(self._raw)
 
         return self._raw
 
+    @property
+    def derived_dtype(self):
+        """Numpy dtype used to store data derived from the raw data"""
+        return np.float32 if self.precision == 'compact' else np.float64
+
+    def memory_usage(self):
+        """
+        Report the memory held by the profile without computing anything new. Arrays
+        shared between components e.g. the time index are only counted once.
+
+        Returns:
+            usage: pandas Series of bytes held by each component and the total
+        """
+        seen = set()
+
+        def nbytes(arrays):
+            total = 0
+            for arr in arrays:
+                arr = np.asarray(arr)
+                # Views are counted against the array they were taken from
+                while isinstance(arr.base, np.ndarray):
+                    arr = arr.base
+                key = (arr.__array_interface__['data'][0], arr.nbytes)
+                if key not in seen:
+                    seen.add(key)
+                    total += arr.nbytes
+            return total
+
+        def arrays_of(data):
+            if isinstance(data, pd.DataFrame):
+                return [data[c].values for c in data.columns]
+            elif isinstance(data, pd.Series):
+                return [data.values]
+            return []
+
+        usage = {}
+        if self._raw is not None:
+            usage['raw'] = nbytes(arrays_of(self._raw))
+
+        time_index = getattr(self, '_time_index', None)
+        if time_index is not None:
+            usage['time_index'] = nbytes([time_index.values])
+
+        for name in ['depth', 'acceleration', 'force', 'pressure', 'nir']:
+            usage[name] = nbytes(arrays_of(getattr(self, f'_{name}')))
+
+        for name in ['accelerometer', 'barometer']:
+            timeseries = getattr(self, f'_{name}', None)
+            if timeseries is not None and timeseries != Sensor.UNAVAILABLE:
+                series = [timeseries.raw, timeseries._depth, timeseries._velocity]
+                usage[name] = nbytes([a for s in series for a in arrays_of(s)])
+
+        usage = pd.Series(usage, dtype=int)
+        usage['total'] = usage.sum()
+        return usage
+
     @property
     def metadata(self):
         """
@@ -158,50 +373,80 @@ class GenericProfileV6:
         return self.stop.index if self.ground.index is None else self.ground.index
 
     @property
-    def nir(self):
+    def clean_nir(self):
         """
-        Retrieve the Active NIR sensor with ambient NIR removed
+        Active NIR with the ambient removed. Computed the first time it is needed and
+        kept as the nir column in raw.
         """
-        if self._nir is None:
-            self._nir = self.raw[["Sensor2", "Sensor3", "nir"]]
-            self._nir['depth'] = self.depth.values
+        if 'nir' not in self.raw.columns:
+            nir = remove_ambient(self.raw['Sensor3'], self.raw['Sensor2'])
+            self.raw['nir'] = np.asarray(nir, dtype=self.derived_dtype)
+        return self.raw['nir']
+
+    @property
+    def nir_view(self):
+        """
+        Active NIR with ambient removed cropped to the snow surface and the end without copying
+        """
+        if self._nir_view is None:
             if self.surface.nir.index < self.end:
-                self._nir = self._nir.iloc[self.surface.nir.index:self.end].reset_index()
-                self._nir = self._nir.drop(columns='index')
-                self._nir['depth'] = self._nir['depth'] - self._nir['depth'].iloc[0]
+                self.clean_nir
+                columns = {c: self.raw[c].values for c in ["Sensor2", "Sensor3", "nir"]}
+                columns['depth'] = self.depth.values
+                self._nir_view = CroppedData(columns, self.surface.nir.index, self.end)
             else:
-                self._nir = Sensor.UNINTERPRETABLE
+                self._nir_view = Sensor.UNINTERPRETABLE
+        return self._nir_view
+
+    @property
+    def nir(self):
+        """
+        Retrieve the Active NIR sensor with ambient NIR removed as a dataframe owning its data,
+        use nir_view to read it without copying
+        """
+        if self._nir is None:
+            view = self.nir_view
+            self._nir = view if view == Sensor.UNINTERPRETABLE else view.to_frame(copy=True)
         return self._nir
 
     @property
-    def force(self):
+    def force_view(self):
         """
-        calibrated force and depth as a pandas dataframe cropped to the snow surface and the stop of motion
+        Calibrated force and depth cropped to the snow surface and the end without copying
         """
-        if self._force is None:
+        if self._force_view is None:
             # Default to raw data
             force = self.raw['Sensor1'].values
             if self.calibration is not None:
                 if 'Sensor1' in self.calibration.keys():
-                    force = apply_calibration(self.raw['Sensor1'].values, self.calibration['Sensor1'], minimum=None, maximum=15000, tare=True)
+                    force = apply_calibration(force.astype(np.float64), self.calibration['Sensor1'], minimum=None, maximum=15000, tare=True)
+                    force = force.astype(self.derived_dtype, copy=False)
+
+            self._force_view = CroppedData({'force': force, 'depth': self.depth.values}, self.surface.force.index, self.end)
+        return self._force_view
 
-            self._force = pd.DataFrame({'force': force, 'depth': self.depth.values})
-            self._force = self._force.iloc[self.surface.force.index:self.end].reset_index()
-            self._force = self._force.drop(columns='index')
-            if not self._force.empty:
-                self._force['depth'] = self._force['depth'] - self._force['depth'].iloc[0]
+    @property
+    def force(self):
+        """
+        calibrated force and depth as a pandas dataframe cropped to the snow surface and the stop of motion,
+        use force_view to read it without copying
+        """
+        if self._force is None:
+            self._force = self.force_view.to_frame(copy=True)
 
         return self._force
 
     @property
     def pressure(self):
         """ Force converted into pressure in kpa"""
-        if 'pressure' not in self.force.columns:
+        if self._pressure is None:
+            view = self.force_view
             # Add pressure in kpa
             area = np.pi * (self.tip_diameter_mm / 1000)**2/4
             # Convert mN to kPa
-            self.force['pressure'] = ((self.force['force']/1000) / area) / 1000
-        return self.force[['depth', 'pressure']]
+            pressure = ((view['force']/1000) / area) / 1000
+            self._pressure = pd.DataFrame({'depth': view['depth'].copy(), 'pressure': pressure}, copy=False)
+        return self._pressure
 
     @property
     def depth(self):
@@ -248,7 +493,7 @@ class GenericProfileV6:
         if self._distance_traveled is None:
             # Call depth to ensure its populated
             self.depth
-            self._distance_traveled = abs(self.start.depth - self.stop.depth)
+            self._distance_traveled = abs(self.resolve_start().depth - self.stop.depth)
         return self._distance_traveled
 
     @property
@@ -257,6 +502,13 @@ class GenericProfileV6:
             self._distance_through_snow = abs(self.surface.nir.depth - self.stop.depth)
         return self._distance_through_snow
 
+    @property
+    def n_points(self):
+        """Number of samples recorded, kept in the cache so cached profiles don't read the data for it"""
+        if self._n_points is None:
+            self._n_points = len(self.raw.index)
+        return self._n_points
+
     @property
     def datetime(self):
         """Retrieves the datetime object the measurement was taken"""
@@ -280,8 +532,9 @@ class GenericProfileV6:
         """
         Return all the common events recorded
         """
-        return [self.start, self.stop, self.surface.nir, self.surface.force,
-                self.ground, self.error]
+        # The surface may move the start
+        surface = self.surface
+        return [self.start, self.stop, surface.nir, surface.force, self.ground, self.error]
 
     @property
     def point(self):
@@ -294,24 +547,22 @@ class GenericProfileV6:
 
         return self._point
 
+    @property
+    def upward_motion(self):
+        """
+        Location and size of any upward motion between the start and stop
+        """
+        if self._upward_motion is None:
+            start = self.resolve_start()
+            self._upward_motion = get_upward_motion(self.depth.iloc[start.index:self.stop.index].values)
+        return self._upward_motion
+
     @property
     def has_upward_motion(self):
         """
         Bool indicating if upward motion was detected
         """
-        if self._has_upward_motion is None:
-            self._has_upward_motion = False
-            # crop the depth data and down sample for speedy check
-            n = get_points_from_fraction(len(self.depth), 0.005)
-            coarse = self.depth.iloc[self.start.index:self.stop.index:n]
-            # loop and find any values greater than the current value
-            for i,v in coarse.items():
-                upward = np.any(coarse.loc[i:] > v + 5)
-                if upward:
-                    self._has_upward_motion = True
-                    break
-
-        return self._has_upward_motion
+        return self.upward_motion.detected
 
 
 class LyteProfileV6(GenericProfileV6):
@@ -319,7 +570,17 @@ class LyteProfileV6(GenericProfileV6):
     Class for managing raw profiles pulled from the probe over USB. This class computes the
     depth profile from the raw data
     """
-    def __init__(self, filename, depth_method='fused', **kwargs):
+    cached_results = ['_depth', '_start', '_stop', '_surface', '_ground', '_error', '_force', '_nir',
+                      '_upward_motion', '_moving_time', '_angle', '_n_points']
+
+    def __init__(self, filename, depth_method='fused', cache=None, **kwargs):
+        """
+        Args:
+            filename: path to valid lyte probe csv.
+            depth_method: Method used to compute depth, fused, accelerometer or barometer
+            cache: Optional ResultCache to retrieve and store results so unchanged files
+                are not processed again
+        """
         super().__init__(filename, **kwargs)
         self.depth_method = depth_method
         # properties
@@ -329,15 +590,17 @@ class LyteProfileV6(GenericProfileV6):
         self._acceleration_names = None  # All columns containing accel data
         self._moving_time = None  # time the probe was moving
         self._angle = None
+        self._time_index = None  # Shared index for all derived timeseries
+        self._motion_bias = None  # Gravity bias of the motion column at both borders
+        self.cache = cache
+        self.hydrate()
 
     @staticmethod
     def process_df(df):
         """
-        Migrate all baro depths to filtereddepth and remove ambient
-        to add NIR column
+        Migrate all baro depths to filtereddepth. The NIR column is added on demand by clean_nir
         """
         df = df.rename(columns={'depth': 'filtereddepth'})
-        df['nir'] = remove_ambient(df['Sensor3'], df['Sensor2'])
         return df
 
     @classmethod
@@ -360,6 +623,18 @@ class LyteProfileV6(GenericProfileV6):
             self._acceleration_names = self.get_acceleration_columns(self.raw.columns)
         return self._acceleration_names
 
+    @property
+    def motion_bias(self):
+        """
+        Gravity bias of the motion detection column at the start and end of the data
+        """
+        if self._motion_bias is None:
+            if self.motion_detect_name != Sensor.UNAVAILABLE:
+                self._motion_bias = BorderBias(self.raw[self.motion_detect_name])
+            else:
+                self._motion_bias = Sensor.UNAVAILABLE
+        return self._motion_bias
+
     @property
     def acceleration(self):
         """
@@ -369,7 +644,8 @@ class LyteProfileV6(GenericProfileV6):
         if self._acceleration is None:
             if self.motion_detect_name != Sensor.UNAVAILABLE:
                 # Remove gravity
-                self._acceleration = get_neutral_bias_at_border(self.raw[self.motion_detect_name])
+                self._acceleration = self.motion_bias.neutral('forward')
+                self._acceleration = self._acceleration.astype(self.derived_dtype, copy=False)
                 # from study_lyte.plotting import plot_ts
                 # ax = plot_ts(self._acceleration, show=False)
                 # ax = plot_ts(self.raw[self.motion_detect_name], ax=ax, show=True)
@@ -384,23 +660,22 @@ class LyteProfileV6(GenericProfileV6):
             if self.motion_detect_name == Sensor.UNAVAILABLE:
                 self._accelerometer = Sensor.UNAVAILABLE
             else:
-                data = pd.DataFrame.from_dict({'time':self.raw['time'], self.acceleration.name:self.acceleration.values})
-                data = data.set_index('time')[self.acceleration.name]
-                self._accelerometer = AccelerometerDepth(data, self.start.index, self.stop.index)
+                data = pd.Series(self.acceleration.values, index=self.time_index, name=self.acceleration.name)
+                self._accelerometer = AccelerometerDepth(data, self.start.index, self.stop.index,
+                                                         dtype=self.derived_dtype)
         return self._accelerometer
 
     @property
     def barometer(self):
         """Returns a class holding timeseries of barometer based depth"""
         if self._barometer is None:
-            baro = self.raw[['time', 'filtereddepth']].set_index('time')['filtereddepth']
+            baro = pd.Series(self.raw['filtereddepth'].values, index=self.time_index, name='filtereddepth')
             if 'ZPFO' in self.metadata.keys():
                 if self.metadata['ZPFO'] < 50:
                     LOG.info('Filtering barometer data...')
                     # TODO: make this more intelligent
-                    baro = zfilter(self.raw['filtereddepth'].values, 0.4)
-                    baro = pd.DataFrame.from_dict({'baro':baro, 'time': self.raw['time']})
-                    baro = baro.set_index('time')['baro']
+                    baro = zfilter(self.raw['filtereddepth'].values.astype(np.float64), 0.4)
+                    baro = pd.Series(baro, index=self.time_index, name='baro')
 
             if self.accelerometer != Sensor.UNAVAILABLE:
                 # TODO: WHATS GOING ON HERE?
@@ -409,7 +684,7 @@ class LyteProfileV6(GenericProfileV6):
                 idx = self.start.index
 
             angle = None if self.angle == Sensor.UNAVAILABLE else self.angle
-            self._barometer = BarometerDepth(baro, idx, self.stop.index, angle=angle)
+            self._barometer = BarometerDepth(baro, idx, self.stop.index, angle=angle, dtype=self.derived_dtype)
 
         return self._barometer
 
@@ -420,9 +695,9 @@ class LyteProfileV6(GenericProfileV6):
                 # User requested fused
                 if self.depth_method == 'fused':
                     LOG.info("Using fused sensors to compute depth.")
-                    depth = self.fuse_depths(self.accelerometer.depth.values.copy(),
-                                                   self.barometer.depth.values.copy(),
-                                                   error=self.error.index)
+                    depth = self.fuse_depths(self.accelerometer.depth.values.astype(np.float64),
+                                             self.barometer.depth.values.astype(np.float64),
+                                             error=self.error.index)
 
                     # Failed fusion
                     unrealistic_depth = 230
@@ -443,9 +718,9 @@ class LyteProfileV6(GenericProfileV6):
                             self._depth = self.barometer.depth
                         else:
                             LOG.error(warn_msg + ' Alternate sensors also unrealistic, using data as is.')
-                            self._depth = pd.Series(data=depth, index=self.raw['time'])
+                            self._depth = pd.Series(data=depth, index=self.time_index)
                     else:
-                        self._depth = pd.Series(data=depth, index=self.raw['time'])
+                        self._depth = pd.Series(data=depth, index=self.time_index)
 
                 # User requested accelerometer
                 elif self.depth_method == 'accelerometer':
@@ -455,6 +730,8 @@ class LyteProfileV6(GenericProfileV6):
                 LOG.info("Using barometer alone to compute depth.")
                 self._depth = self.barometer.depth
 
+            self._depth = self._depth.astype(self.derived_dtype, copy=False)
+
             # Assign positions of each event detected
             self.assign_event_depths(self._depth)
 
@@ -465,9 +742,16 @@ class LyteProfileV6(GenericProfileV6):
         """Return the sample time data"""
         return self.raw['time']
 
+    @property
+    def time_index(self):
+        """Time index shared by all the derived timeseries"""
+        if self._time_index is None:
+            self._time_index = pd.Index(self.raw['time'].values, name='time')
+        return self._time_index
+
     @property
     def start(self):
-        """ Return start event """
+        """ Return start event, the motion start until resolve_start moves it to the snow surface """
         if self._start is None:
             if self.motion_detect_name != Sensor.UNAVAILABLE:
                 idx = get_acceleration_start(self.acceleration)
@@ -482,8 +766,7 @@ class LyteProfileV6(GenericProfileV6):
         """ Return stop event """
         if self._stop is None:
             if self.motion_detect_name != Sensor.UNAVAILABLE:
-                backward_accel = get_neutral_bias_at_border(self.raw[self.motion_detect_name], direction='backward')
-                idx = get_acceleration_stop(backward_accel)
+                idx = get_acceleration_stop(self.motion_bias.neutral('backward'))
             else:
                 idx = get_nir_stop(self.raw['Sensor3'])
             if idx is not None:
@@ -493,37 +776,40 @@ class LyteProfileV6(GenericProfileV6):
 
         return self._stop
 
-    def assign_surface_depths(self, depth:pd.Series):
-        # Event according the NIR sensors
-        idx = self.surface.nir.index
-        self._surface.nir.depth = depth.iloc[idx]
-
-        # Event according to the force sensor
-        force_surface_depth = self._surface.nir.depth  + self.surface_detection_offset
-        f_idx = abs(depth - force_surface_depth).argmin()
-        # Retrieve force estimated start
-        f_start = get_sensor_start(self.raw['Sensor1'], max_threshold=0.02, threshold=-0.02)
-        f_start = f_start or f_idx
+    def resolve_start(self):
+        """
+        Resolve the NIR snow surface which moves the start to the surface when it was
+        detected first. The start is the motion start until then so depth alone never
+        cleans the NIR, anything reporting the start calls this first to be independent
+        of the order attributes were accessed in.
+        """
+        # Resolved surfaces (including cached ones) already adjusted the start
+        if self._surface is None and self._nir_surface is None and self.has_nir:
+            self.nir_surface
+        return self.start
 
-        # If the force start is before the NIR start then adjust
-        if f_start < self.start.index:
-            LOG.info(f'Choosing motion start ({self.start.index}) over force start ({f_start})...')
-            f_idx = self.start.index
-            force_surface_depth = depth.iloc[f_idx]
+    @property
+    def has_nir(self):
+        """Whether the profile recorded the active and ambient NIR"""
+        return all([c in self.raw.columns for c in ['Sensor2', 'Sensor3']])
 
-        elif f_start < f_idx:
-            LOG.info(f'Choosing force start ({f_start}) over nir derived ({f_idx})...')
-            f_idx = f_start
-            force_surface_depth = depth.iloc[f_idx]
+    @property
+    def nir_surface(self):
+        """
+        Snow surface event according to the NIR sensors
+        """
+        if self._nir_surface is None:
+            idx = get_nir_surface(self.clean_nir)
+            if idx == 0:
+                LOG.warning("Unable to find snow surface, defaulting to first data point")
+            depth = self.depth.iloc[idx]
+            self._nir_surface = Event(name='surface', index=idx, depth=depth, time=self.raw['time'].iloc[idx])
 
-        self._surface.force.index = f_idx
-        self._surface.force.depth = depth.iloc[f_idx]
-        self._surface.force.time = self.raw['time'].iloc[f_idx]
+            # Adjust the start if the snow surface was detected before it
+            if self._nir_surface.time < self.start.time:
+                self._start = Event(name='start', index=idx, depth=depth, time=self._nir_surface.time)
 
-        # Adjust surface detection to modify the start if there is conflict.
-        if self._surface.nir.time < self.start.time:
-            self._start = self._surface.nir
-            self._start.name = 'start'
+        return self._nir_surface
 
     @property
     def surface(self):
@@ -531,16 +817,10 @@ class LyteProfileV6(GenericProfileV6):
         Return surface events for the nir and force which are physically separated by a distance
         """
         if self._surface is None:
-            # Call to populate nir in raw
-            idx = get_nir_surface(self.raw['nir'])
-            if idx == 0:
-                LOG.warning("Unable to find snow surface, defaulting to first data point")
-            # Event according the NIR sensors
-            depth = self.depth.iloc[idx]
-            nir = Event(name='surface', index=idx, depth=depth, time=self.raw['time'].iloc[idx])
+            nir = self.nir_surface
 
             # Event according to the force sensor
-            force_surface_depth = depth + self.surface_detection_offset
+            force_surface_depth = nir.depth + self.surface_detection_offset
             f_idx = abs(self.depth - force_surface_depth).argmin()
 
             # Retrieve force estimated start
@@ -563,18 +843,6 @@ class LyteProfileV6(GenericProfileV6):
 
         return self._surface
 
-    @property
-    def ground(self):
-        """Event for ground detection"""
-        if self._ground is None:
-            ground = get_ground_strike(self.raw['Sensor1'], self.stop.index)
-            if ground is not None:
-                self._ground = Event(name='ground', index=ground, depth=self.depth.iloc[ground], time=self.raw['time'].iloc[ground])
-            else:
-                self._ground = Event(name='ground', index=None, depth=None, time=None)
-
-        return self._ground
-
     @property
     def error(self):
         """ Return error event """
@@ -595,11 +863,20 @@ class LyteProfileV6(GenericProfileV6):
 
         return self._error
 
+    @property
+    def cache_parameters(self):
+        return dict(super().cache_parameters, depth_method=self.depth_method)
+
+    def process(self):
+        self.moving_time
+        self.angle
+        return super().process()
+
     @property
     def moving_time(self):
         """Amount of time the probe was in motion"""
         if self._moving_time is None:
-            self._moving_time = self.stop.time - self.start.time
+            self._moving_time = self.stop.time - self.resolve_start().time
         return self._moving_time
 
     @property
@@ -642,7 +919,7 @@ class LyteProfileV6(GenericProfileV6):
         header = f'\n{s} {self.filename.name} {s}\n'
         profile_string = header
         profile_string += msg.format('Recorded', f'{self.datetime.isoformat()}')
-        profile_string += msg.format('Points', f'{len(self.raw.index):,}')
+        profile_string += msg.format('Points', f'{self.n_points:,}')
         profile_string += msg.format('Moving Time', f'{self.moving_time:0.1f} s')
         profile_string += msg.format('Avg. Speed', f'{self.avg_velocity:0.0f} cm/s')
         profile_string += msg.format('Resolution', f'{self.resolution:0.1f} pts/cm')
@@ -657,6 +934,34 @@ class LyteProfileV6(GenericProfileV6):
         profile_string += '-' * (len(header)-2) + '\n'
         return profile_string
 
+    def summary(self):
+        """
+        Return a dictionary of the metrics and events of the profile, e.g. a row
+        of a summary table across many profiles
+        """
+        self.resolve_start()
+        summary = {'filename': self.filename.name,
+                   'serial': self.serial_number,
+                   'recorded': self.datetime.isoformat() if 'RECORDED' in self.metadata else None,
+                   'points': self.n_points,
+                   'moving_time': self.moving_time,
+                   'avg_velocity': self.avg_velocity,
+                   'resolution': self.resolution,
+                   'distance_traveled': self.distance_traveled,
+                   'distance_through_snow': self.distance_through_snow,
+                   'ground_strike': self.ground.index is not None,
+                   'upward_motion': bool(self.has_upward_motion),
+                   'angle': None if self.angle == Sensor.UNAVAILABLE else float(self.angle),
+                   'error_time': self.error.time,
+                   'calibration_version': self.calibration_version}
+
+        events = {'start': self.start, 'stop': self.stop, 'nir_surface': self.surface.nir,
+                  'force_surface': self.surface.force, 'ground': self.ground}
+        for name, event in events.items():
+            summary[f'{name}_index'] = event.index
+            summary[f'{name}_depth'] = event.depth
+        return summary
+
     @classmethod
     def fuse_depths(cls, acc_depth, baro_depth, error=None):
         """
@@ -699,8 +1004,8 @@ class LyteProfileV6(GenericProfileV6):
         """
         float indicating the angle at the start of a measurement
         """
-        if self._angle is None and self.acceleration_names != Sensor.UNAVAILABLE:
-            if 'Y-Axis' in self.acceleration_names:
+        if self._angle is None:
+            if self.acceleration_names != Sensor.UNAVAILABLE and 'Y-Axis' in self.acceleration_names:
                 data = self.raw[self.acceleration_names].iloc[0:self.start.index + 1].mean(axis=0)
                 magn = data.pow(2).sum()**0.5
                 self._angle = np.arccos(abs(data['Y-Axis']) / magn) * 180 / np.pi
@@ -719,7 +1024,10 @@ class LyteProfileV6(GenericProfileV6):
         return error
 
     def __repr__(self):
-        profile_str = f"LyteProfile (Recorded {len(self.raw):,} points, {self.datetime.isoformat()})"
+        # Don't read the data just to print the profile
+        if self._raw is None:
+            return f"LyteProfile ({self.filename.name}, not loaded)"
+        profile_str = f"LyteProfile (Recorded {self.n_points:,} points, {self.datetime.isoformat()})"
         return profile_str
 
 
@@ -731,10 +1039,8 @@ class ProcessedProfileV6(GenericProfileV6):
     @staticmethod
     def process_df(df):
         """
-        Migrate all baro depths to filtereddepth and remove ambient
-        to add NIR column
+        Data is already depth processed, the NIR column is added on demand by clean_nir
         """
-        df['nir'] = remove_ambient(df['Sensor3'], df['Sensor2'])
         return df
 
     @property
@@ -1,6 +1,9 @@
 import numpy as np
+import pandas as pd
 from string import ascii_uppercase
 
+from .stats import bootstrap_regression, percentile_interval
+
 class LinearRegression:
     """
     Class for managing simple linear regressions
@@ -20,6 +23,10 @@ class LinearRegression:
         self._equation = None
         self._rendered_equation = None
         self._n_points = None
+        # Data kept from the regression for bootstrapping
+        self._x = None
+        self._y = None
+        self._bootstrap_coefficients = None
 
     @property
     def n_points(self):
@@ -87,64 +94,180 @@ class LinearRegression:
         self._rendered_equation = None
         self._n_points = len(input_df.index)
         a_matrix = np.vstack([input_df[c] for c in columns] + [np.ones(len(input_df.index))]).T
+        output = np.asarray(output_series, dtype=np.float64)
         # Filter out rows with Nans
-        final = []
-        final_output = []
-        for i in range(a_matrix.shape[0]):
-            if not np.any(np.isnan(a_matrix[i])) and not np.isnan(output_series[i]):
-                final.append(a_matrix[i])
-                final_output.append(output_series[i])
-        a_matrix = np.array(final)
-        output_series = np.array(final_output)
+        valid = ~np.isnan(a_matrix).any(axis=1) & ~np.isnan(output)
+
+        self._x = a_matrix[valid]
+        self._y = output[valid]
+        self._bootstrap_coefficients = None
+        self._coefficients = list(np.linalg.lstsq(self._x, self._y, rcond=None)[0])
+
+    @property
+    def bootstrap_coefficients(self):
+        """Coefficients from each bootstrap resample of the regression, see bootstrap"""
+        if self._bootstrap_coefficients is None:
+            self.bootstrap()
+        return self._bootstrap_coefficients
+
+    def bootstrap(self, n_resamples=1000, seed=None, workers=None):
+        """
+        Resample the regressed data with replacement and solve the regression for every
+        resample in batches.
+        Args:
+            n_resamples: Number of bootstrap resamples
+            seed: Seed for reproducible resamples
+            workers: Number of processes to shard the resamples over, None for in process
+        Returns:
+            coefficients: array shaped (n_resamples, number of coefficients)
+        """
+        if self._x is None:
+            raise ValueError('Bootstrapping requires the data, use regress first')
+        self._bootstrap_coefficients = bootstrap_regression(self._x, self._y, n_resamples=n_resamples,
+                                                            seed=seed, workers=workers)
+        return self._bootstrap_coefficients
+
+    def coefficient_intervals(self, confidence=0.95):
+        """
+        Bootstrap percentile confidence intervals of the coefficients
+        Args:
+            confidence: Fraction of the bootstrap distribution in the interval
+        Returns:
+            intervals: Dataframe indexed by coefficient name with coefficient, lower and upper columns
+        """
+        lower, upper = percentile_interval(self.bootstrap_coefficients, confidence=confidence)
+        names = [n or 'intercept' for n in self.coefficient_names]
+        return pd.DataFrame({'coefficient': self.coefficients, 'lower': lower, 'upper': upper},
+                            index=names)
 
-        self._coefficients = list(np.linalg.lstsq(a_matrix, output_series, rcond=None)[0])
+    def prediction_interval(self, input_df, confidence=0.95, seed=None):
+        """
+        Bootstrap prediction intervals. Each resampled regression predicts the inputs and
+        a randomly drawn residual from the fit is added to account for the scatter of new data.
+        Args:
+            input_df: Pandas Dataframe or 2D numpy array of inputs like predict
+            confidence: Fraction of the predictions in the interval
+            seed: Seed for drawing the residuals
+        Returns:
+            intervals: Dataframe with predicted, lower and upper columns
+        """
+        coefficients = self.bootstrap_coefficients
+        x, index = self._design(input_df)
+        residuals = self._y - self._x @ np.asarray(self.coefficients, dtype=np.float64)
+        rng = np.random.default_rng(seed)
+
+        lower = np.empty(len(x))
+        upper = np.empty(len(x))
+        # Keep the (rows x resamples) predictions to a few million values at a time
+        step = max(1, 2 ** 22 // len(coefficients))
+        for i in range(0, len(x), step):
+            predictions = x[i:i + step] @ coefficients[:, :-1].T
+            predictions += coefficients[:, -1]
+            predictions += residuals[rng.integers(0, len(residuals), size=predictions.shape)]
+            lower[i:i + step], upper[i:i + step] = percentile_interval(predictions, confidence=confidence, axis=1)
+
+        predicted = self.predict(x)
+        return pd.DataFrame({'predicted': predicted, 'lower': lower, 'upper': upper}, index=index)
+
+    def _design(self, input_df):
+        """Inputs as a float matrix with one column per coefficient and the index to use for them"""
+        n_inputs = len(self.coefficients) - 1
+        if isinstance(input_df, pd.DataFrame):
+            n_columns = input_df.shape[1]
+            index = input_df.index
+        else:
+            input_df = np.asarray(input_df)
+            if input_df.ndim == 1:
+                input_df = input_df[:, np.newaxis]
+            n_columns = input_df.shape[1]
+            index = None
+
+        if n_columns < n_inputs:
+            raise ValueError(f'Regression has {n_inputs} inputs but only {n_columns} columns were provided')
+
+        # Only the regression inputs are converted, extra columns may be anything
+        if index is not None:
+            # A view when the columns are already one float block
+            x = input_df.iloc[:, :n_inputs].to_numpy(dtype=np.float64)
+        else:
+            x = input_df[:, :n_inputs].astype(np.float64, copy=False)
+        return x, index
 
     def predict(self, input_df):
         """
-        Use the regression to predict data
+        Use the regression to predict data as a single matrix product
         Args:
-            input_df: Pandas Dataframe containing inputs for the regression. Columns are assumed in same order
-                as regression coefficients
+            input_df: Pandas Dataframe or 2D numpy array containing inputs for the regression. Columns are assumed
+                in same order as regression coefficients
         Returns:
-            result: Resulting data predicted by the regression
+            result: Resulting data predicted by the regression, a pandas Series sharing the index of a
+                dataframe or a numpy array
         """
-        result = 0
-        for coefficient, column in zip(self.coefficients[0:-1], input_df.columns):
-            result += coefficient * input_df[column]
-        result += self.coefficients[-1] * np.ones_like(input_df.index)
+        x, index = self._design(input_df)
+        result = x @ np.asarray(self.coefficients[0:-1], dtype=np.float64)
+        result += self.coefficients[-1]
+
+        if index is not None:
+            result = pd.Series(result, index=index, copy=False)
         return result
 
     @staticmethod
     def quality(predicted, measured):
         """
-        Perform some quality metrics against some predicted and measured data
+        Perform some quality metrics against some predicted and measured data. Nans are
+        ignored, the point by point errors are computed once and reduced together.
         Args:
-            predicted: Series of predicted data
-            measured: Series of measured data (same length as predicted)
+            predicted: Series or array of predicted data
+            measured: Series or array of measured data (same length as predicted)
         Returns:
             dictionary of varius performance metrics
         """
+        # Series are compared by index
+        if isinstance(predicted, pd.Series) and isinstance(measured, pd.Series):
+            if not predicted.index.equals(measured.index):
+                predicted, measured = predicted.align(measured)
+        predicted = np.asarray(predicted, dtype=np.float64)
+        measured = np.asarray(measured, dtype=np.float64)
+
         m_mean = measured.mean()
+        if np.isnan(m_mean):
+            m_mean = np.nanmean(measured)
         p_mean = predicted.mean()
+        if np.isnan(p_mean):
+            p_mean = np.nanmean(predicted)
         diff = p_mean - m_mean
 
-        # Perform point by point metrics
-        series_difference = predicted - measured
-        p_difference = series_difference / measured
+        # Point by point differences and their absolute values, as values and fractions of measured.
+        # Rows missing either value are dropped once up front.
+        difference = predicted - measured
+        valid = ~np.isnan(difference)
+        if not valid.all():
+            difference = difference[valid]
+            measured = measured[valid]
+
+        errors = np.empty((4, len(difference)), dtype=np.float64)
+        errors[0] = difference
+        np.abs(difference, out=errors[1])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            np.divide(errors[:2], measured, out=errors[2:])
 
-        # Comparisons against absolute values
-        abs_diff = abs(series_difference)
-        p_abs_diff = abs_diff / measured
+        means, maxes, mins = np.full((3, 4), np.nan)
+        for i, row in enumerate(errors):
+            # Only 0/0 leaves a nan here
+            if np.isnan(row).any():
+                row = row[~np.isnan(row)]
+            if len(row):
+                means[i], maxes[i], mins[i] = row.mean(), row.max(), row.min()
 
         return {"mean difference":{'value':diff, "percent": diff / m_mean},
                 # point by point differences
-                'mean point error': {'value':series_difference.mean(), 'percent':p_difference.mean()},
-                'max point error': {'value':series_difference.max(),'percent': p_difference.max()},
-                'min point error': {'value':series_difference.min(),'percent':p_difference.min()},
+                'mean point error': {'value': means[0], 'percent': means[2]},
+                'max point error': {'value': maxes[0], 'percent': maxes[2]},
+                'min point error': {'value': mins[0], 'percent': mins[2]},
                 # Absolute value
-                'mean absolute point error': {'value': abs_diff.mean(), 'percent': p_abs_diff.mean()},
-                'max absolute point error': {'value': abs_diff.max(), 'percent': p_abs_diff.max()},
-                'min absolute point error': {'value': abs_diff.min(), 'percent': p_abs_diff.min()},
+                'mean absolute point error': {'value': means[1], 'percent': means[3]},
+                'max absolute point error': {'value': maxes[1], 'percent': maxes[3]},
+                'min absolute point error': {'value': mins[1], 'percent': mins[3]},
                 }
 
     @staticmethod
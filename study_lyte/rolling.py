@@ -0,0 +1,189 @@
+"""
+Rolling window statistics over numpy arrays using prefix sums. Every window is
+evaluated in O(1) after a single O(N) pass regardless of the window size. Windows
+follow the same conventions as pandas.rolling for center, closed and min_periods.
+Nans are ignored and do not count towards min_periods.
+
+Data is shifted by its median before summing so a few outliers can't leave the
+rest of the data far from zero, protecting the variance from catastrophic
+cancellation. The prefix sums are compensated, the exact error of every addition
+is recovered with TwoSum and summed separately, so their rounding doesn't grow with
+the length of the data.
+
+Arrays may be 2D in which case statistics are computed along the last axis and
+the window may be given per row.
+"""
+import numpy as np
+
+
+def as_column(values):
+    """Make per row values broadcast against the last axis"""
+    values = np.asarray(values)
+    return values[:, np.newaxis] if values.ndim == 1 else values
+
+
+def get_window_bounds(n_samples, window, center=False, closed='right'):
+    """
+    Compute the start (inclusive) and stop (exclusive) of every window
+
+    Args:
+        n_samples: Number of samples in the data
+        window: Integer window size or array of window sizes, one per row
+        center: Bool to center the window on each sample, otherwise it trails the sample
+        closed: Which ends of the window are included, right, left, both or neither
+    Returns:
+        tuple:
+            **start**: Integer array of the first index in each window
+            **stop**: Integer array of the index after the last in each window
+    """
+    if closed not in ['right', 'left', 'both', 'neither']:
+        raise ValueError(f'Invalid closed = {closed}, use either right, left, both or neither.')
+
+    window = as_column(np.asarray(window, dtype=np.int64))
+    idx = np.arange(n_samples, dtype=np.int64)
+    offset = (window - 1) // 2 if center else 0
+    stop = idx + 1 + offset
+    start = stop - window
+
+    if closed in ['left', 'both']:
+        start = start - 1
+    if closed in ['left', 'neither']:
+        stop = stop - 1
+
+    start, stop = np.broadcast_arrays(np.clip(start, 0, n_samples), np.clip(stop, 0, n_samples))
+    return start, stop
+
+
+def compensated_cumsum(arr):
+    """
+    Cumulative sum along the last axis with the rounding error of every addition
+    recovered (TwoSum) and accumulated separately
+
+    Args:
+        arr: Float numpy array
+    Returns:
+        tuple:
+            **total**: Plain cumulative sum with a leading zero
+            **compensation**: Cumulative rounding error to add to total, with a leading zero
+    """
+    pad = [(0, 0)] * (arr.ndim - 1) + [(1, 0)]
+    total = np.pad(np.cumsum(arr, axis=-1), pad)
+    previous = total[..., :-1]
+    current = total[..., 1:]
+    # Error of each addition previous + arr, exact in floating point
+    part = current - previous
+    error = (previous - (current - part)) + (arr - part)
+    return total, np.pad(np.cumsum(error, axis=-1), pad)
+
+
+def get_prefix_sums(arr, power=2):
+    """
+    Build shifted prefix sums of the data and its powers along the last axis
+
+    Args:
+        arr: 1D or 2D array like of data
+        power: Highest power of the data to sum
+    Returns:
+        tuple:
+            **shift**: Value subtracted from each row
+            **sums**: List of prefix sums for the count and each power, each with a leading zero. The
+                power sums are (total, compensation) pairs from compensated_cumsum
+    """
+    arr = np.asarray(arr, dtype=np.float64)
+    valid = ~np.isnan(arr)
+
+    # Shift each row by its median, rows without data aren't shifted
+    shift = np.zeros(arr.shape[:-1] + (1,))
+    has_data = valid.any(axis=-1)
+    if has_data.all():
+        shift[...] = np.nanmedian(arr, axis=-1, keepdims=True)
+    elif has_data.any():
+        shift[has_data] = np.nanmedian(arr[has_data], axis=-1, keepdims=True)
+    shifted = np.where(valid, arr - shift, 0)
+
+    pad = [(0, 0)] * (arr.ndim - 1) + [(1, 0)]
+    sums = [np.pad(np.cumsum(valid, axis=-1, dtype=np.int64), pad)]
+    term = np.ones_like(shifted)
+    for p in range(power):
+        term = term * shifted
+        sums.append(compensated_cumsum(term))
+    return shift, sums
+
+
+def get_window_sums(sums, start, stop):
+    """Retrieve the sum in every window from the prefix sums"""
+    def difference(s):
+        if start.ndim == 1:
+            return s[..., stop] - s[..., start]
+        return np.take_along_axis(s, stop, axis=-1) - np.take_along_axis(s, start, axis=-1)
+
+    # Compensated sums add the difference of their rounding errors
+    return [difference(s) if not isinstance(s, tuple) else difference(s[0]) + difference(s[1]) for s in sums]
+
+
+def rolling_mean(arr, window, center=False, closed='right', min_periods=None):
+    """
+    Rolling mean of the data, equivalent to pandas.rolling(...).mean()
+
+    Args:
+        arr: 1D or 2D array like of data, 2D is computed along the last axis
+        window: Integer window size or array of window sizes, one per row
+        center: Bool to center the window on each sample, otherwise it trails the sample
+        closed: Which ends of the window are included, right, left, both or neither
+        min_periods: Minimum number of valid values for a result, defaults to the window
+    Returns:
+        result: numpy array of the rolling mean, nan where there were too few values
+    """
+    min_periods = window if min_periods is None else min_periods
+    arr = np.asarray(arr, dtype=np.float64)
+    shift, sums = get_prefix_sums(arr, power=1)
+    start, stop = get_window_bounds(arr.shape[-1], window, center=center, closed=closed)
+    count, total = get_window_sums(sums, start, stop)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        result = total / count + shift
+    return np.where((count >= as_column(min_periods)) & (count > 0), result, np.nan)
+
+
+def rolling_var(arr, window, center=False, closed='right', min_periods=None, ddof=1):
+    """
+    Rolling variance of the data, equivalent to pandas.rolling(...).var()
+
+    Args:
+        arr: 1D or 2D array like of data, 2D is computed along the last axis
+        window: Integer window size or array of window sizes, one per row
+        center: Bool to center the window on each sample, otherwise it trails the sample
+        closed: Which ends of the window are included, right, left, both or neither
+        min_periods: Minimum number of valid values for a result, defaults to the window
+        ddof: Delta degrees of freedom
+    Returns:
+        result: numpy array of the rolling variance, nan where there were too few values
+    """
+    min_periods = window if min_periods is None else min_periods
+    arr = np.asarray(arr, dtype=np.float64)
+    shift, sums = get_prefix_sums(arr, power=2)
+    start, stop = get_window_bounds(arr.shape[-1], window, center=center, closed=closed)
+    count, total, total_sq = get_window_sums(sums, start, stop)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        result = (total_sq - total * total / count) / (count - ddof)
+    # Rounding can leave flat windows slightly negative
+    result = np.maximum(result, 0)
+    return np.where((count >= as_column(min_periods)) & (count > ddof), result, np.nan)
+
+
+def rolling_std(arr, window, center=False, closed='right', min_periods=None, ddof=1):
+    """
+    Rolling standard deviation of the data, equivalent to pandas.rolling(...).std()
+
+    Args:
+        arr: 1D or 2D array like of data, 2D is computed along the last axis
+        window: Integer window size or array of window sizes, one per row
+        center: Bool to center the window on each sample, otherwise it trails the sample
+        closed: Which ends of the window are included, right, left, both or neither
+        min_periods: Minimum number of valid values for a result, defaults to the window
+        ddof: Delta degrees of freedom
+    Returns:
+        result: numpy array of the rolling standard deviation, nan where there were too few values
+    """
+    return np.sqrt(rolling_var(arr, window, center=center, closed=closed, min_periods=min_periods, ddof=ddof))
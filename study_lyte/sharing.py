@@ -0,0 +1,112 @@
+"""
+Transport profiles between processes without copying their arrays through pickle.
+"""
+import mmap
+import os
+import pickle
+import tempfile
+import uuid
+from pathlib import Path
+
+
+def get_shared_directory():
+    """
+    Directory to hold shared buffers, prefer RAM backed storage when available
+    """
+    shm = Path('/dev/shm')
+    if shm.is_dir() and os.access(shm, os.W_OK):
+        return shm
+    return Path(tempfile.gettempdir())
+
+
+class SharedProfile:
+    """
+    Small picklable handle to a profile whose arrays live in a memory mapped buffer.
+    Only the handle travels between processes, arrays are mapped without copying on load.
+
+    Usage:
+        # In the worker
+        handle = SharedProfile.from_profile(LyteProfileV6(filename))
+
+        # In the parent
+        profile = handle.load()
+        ...
+        handle.unlink()
+    """
+    alignment = 64
+
+    def __init__(self, path, payload, buffers):
+        """
+        Args:
+            path: Path to the memory mapped file holding the arrays
+            payload: Pickled profile without its array data
+            buffers: List of (offset, size) of each array in the file
+        """
+        self.path = Path(path)
+        self.payload = payload
+        self.buffers = buffers
+
+    @classmethod
+    def from_profile(cls, profile, process=True, directory=None):
+        """
+        Move a profile and everything it has computed into a shared buffer
+
+        Args:
+            profile: Any profile object e.g. LyteProfileV6
+            process: Compute all the analysis stages before sharing
+            directory: Directory to write the buffer to, defaults to shared memory when available
+        Returns:
+            handle: SharedProfile to pass to other processes
+        """
+        if process:
+            profile.process()
+
+        pickle_buffers = []
+        payload = pickle.dumps(profile, protocol=5, buffer_callback=pickle_buffers.append)
+        raws = [b.raw() for b in pickle_buffers]
+
+        # Layout the arrays with aligned offsets
+        buffers = []
+        offset = 0
+        for raw in raws:
+            buffers.append((offset, raw.nbytes))
+            offset += raw.nbytes
+            offset += -offset % cls.alignment
+
+        directory = Path(directory) if directory is not None else get_shared_directory()
+        path = directory / f'study_lyte_{uuid.uuid4().hex}.buf'
+        with open(path, 'wb') as fp:
+            for (start, size), raw in zip(buffers, raws):
+                fp.seek(start)
+                fp.write(raw)
+            # Make sure the file spans the last buffer
+            fp.truncate(max(offset, 1))
+
+        return cls(path, payload, buffers)
+
+    def load(self):
+        """
+        Rebuild the profile with its arrays mapped from the shared buffer. The mapping
+        is copy on write so changes to the arrays stay in this process.
+        """
+        with open(self.path, 'rb') as fp:
+            mapped = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_COPY)
+        view = memoryview(mapped)
+        buffers = [view[start:start + size] for start, size in self.buffers]
+        return pickle.loads(self.payload, buffers=buffers)
+
+    @property
+    def nbytes(self):
+        """Number of bytes held in the shared buffer"""
+        return sum([size for _, size in self.buffers])
+
+    def unlink(self):
+        """
+        Remove the shared buffer. Profiles already loaded remain valid until they are
+        garbage collected.
+        """
+        if self.path.exists():
+            self.path.unlink()
+
+    def __repr__(self):
+        return f"SharedProfile ({len(self.buffers)} arrays, {self.nbytes:,} bytes)"
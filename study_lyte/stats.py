@@ -1,26 +1,199 @@
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
 import numpy as np
+import pandas as pd
 from statistics import NormalDist
 
 
-def z_score(confidence):
+@lru_cache(maxsize=None)
+def _z_score(confidence):
     center_prob = (1 + confidence) / 2.
-    z = NormalDist().inv_cdf(center_prob)
-    return z
+    return NormalDist().inv_cdf(center_prob)
+
+
+def z_score(confidence):
+    """
+    Two sided z score of a confidence, scalars or arrays. Each distinct confidence
+    is only inverted once and kept in a table.
+    """
+    if np.ndim(confidence) == 0:
+        return _z_score(float(confidence))
+    unique, inverse = np.unique(np.asarray(confidence, dtype=np.float64), return_inverse=True)
+    table = np.array([_z_score(c) for c in unique.tolist()])
+    return table[inverse].reshape(np.shape(confidence))
 
 
 def margin_of_error(n, std, confidence=0.95):
     """
-    Calculate the margin of error without scipy.
+    Calculate the margin of error without scipy. Broadcasts over arrays of n, std and confidence.
     """
     z = z_score(confidence)
-    moe = z * np.sqrt(std**2 / n)
+    moe = z * np.sqrt(np.asarray(std)**2 / n)
     return moe
 
 
 def required_sample_for_margin(desired_margin_of_error, std, confidence=0.95):
     """
-    Calculate the required sample size for desired margin of error without scipy.
+    Calculate the required sample size for desired margin of error without scipy. Broadcasts
+    over arrays like margin_of_error.
     """
     z = z_score(confidence)
-    n = (std ** 2) / ((desired_margin_of_error / z) ** 2)
-    return n
\ No newline at end of file
+    n = (np.asarray(std) ** 2) / ((desired_margin_of_error / z) ** 2)
+    return n
+
+
+def group_statistics(df, by, column, desired_margin_of_error=None, confidence=0.95):
+    """
+    Summarize a long dataframe per group in one grouped pass
+
+    Args:
+        df: Long pandas dataframe, one row per measurement
+        by: Column name(s) to group by e.g. ['site', 'layer']
+        column: Column of the measurements
+        desired_margin_of_error: Optional margin to compute the required sample size for
+        confidence: Confidence of the margin of error, scalar or a series indexed by group
+    Returns:
+        summary: Dataframe indexed by group with mean, std, n, margin_of_error and
+            required_sample (when a desired margin is given) columns
+    """
+    summary = df.groupby(by, sort=True)[column].agg(['mean', 'std', 'count'])
+    summary = summary.rename(columns={'count': 'n'})
+    if isinstance(confidence, pd.Series):
+        confidence = confidence.reindex(summary.index).values
+    summary['margin_of_error'] = margin_of_error(summary['n'].values, summary['std'].values,
+                                                 confidence=confidence)
+    if desired_margin_of_error is not None:
+        summary['required_sample'] = required_sample_for_margin(desired_margin_of_error, summary['std'].values,
+                                                                confidence=confidence)
+    return summary
+
+
+def _resample_seeds(n_resamples, batch_size, seed):
+    """
+    Split the resamples into batches each with its own independent seed. The split
+    does not depend on the number of workers so results are reproducible for a seed.
+    """
+    sizes = [batch_size] * (n_resamples // batch_size)
+    if n_resamples % batch_size:
+        sizes.append(n_resamples % batch_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    return list(zip(sizes, seeds))
+
+
+def _run_shard(func, data, batches):
+    return np.concatenate([func(*data, size, seed) for size, seed in batches])
+
+
+def _run_batches(func, data, n_resamples, batch_size, seed, workers):
+    """
+    Run func(*data, size, seed) for each batch of resamples. With workers the batches are
+    split into contiguous shards over a process pool so the data is sent once per worker.
+    """
+    if batch_size is None:
+        # Keep the (resamples x samples) matrices of a batch to a few million values
+        batch_size = int(np.clip(2 ** 22 // max(len(data[0]), 1), 1, 256))
+    batches = _resample_seeds(n_resamples, batch_size, seed)
+    if workers is not None and workers > 1 and len(batches) > 1:
+        workers = min(workers, len(batches))
+        bounds = np.linspace(0, len(batches), workers + 1).astype(int)
+        shards = [batches[a:b] for a, b in zip(bounds[:-1], bounds[1:])]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return np.concatenate(list(pool.map(_run_shard, [func] * workers, [data] * workers, shards)))
+    return _run_shard(func, data, batches)
+
+
+def bootstrap_indices(n, n_resamples, rng=None):
+    """
+    Matrix of resampled indices, each row is one bootstrap resample
+
+    Args:
+        n: Number of samples in the data
+        n_resamples: Number of resamples (rows)
+        rng: numpy Generator or seed
+    Returns:
+        indices: integer array shaped (n_resamples, n)
+    """
+    rng = np.random.default_rng(rng)
+    return rng.integers(0, n, size=(n_resamples, n))
+
+
+def _statistic_batch(values, statistic, size, seed):
+    idx = bootstrap_indices(len(values), size, seed)
+    return np.asarray(statistic(values[idx], axis=-1))
+
+
+def _regression_batch(x, y, size, seed):
+    idx = bootstrap_indices(len(y), size, seed)
+    # How many times each row is drawn in each resample
+    counts = np.bincount((idx + len(y) * np.arange(size)[:, np.newaxis]).ravel(), minlength=size * len(y))
+    counts = counts.reshape(size, len(y)).astype(np.float64)
+
+    # Normal equations for every resample at once as weighted sums over the rows
+    k = x.shape[1]
+    xtx = (counts @ (x[:, :, np.newaxis] * x[:, np.newaxis, :]).reshape(len(y), k * k)).reshape(size, k, k)
+    xty = counts @ (x * y[:, np.newaxis])
+    try:
+        return np.linalg.solve(xtx, xty[..., np.newaxis])[..., 0]
+    except np.linalg.LinAlgError:
+        # A degenerate resample (e.g. a single repeated point), use least squares
+        return (np.linalg.pinv(xtx) @ xty[..., np.newaxis])[..., 0]
+
+
+def bootstrap(values, statistic=np.mean, n_resamples=1000, seed=None, workers=None, batch_size=None):
+    """
+    Bootstrap a statistic of some data. Resamples are drawn as index matrices and
+    the statistic is evaluated a batch at a time.
+
+    Args:
+        values: 1D array of data, nans are ignored
+        statistic: Function reducing along the axis keyword e.g. np.mean, np.median
+        n_resamples: Number of bootstrap resamples
+        seed: Seed for reproducible resamples
+        workers: Number of processes to shard the batches over, None for in process
+        batch_size: Number of resamples evaluated together, defaults to what fits a few million values
+    Returns:
+        distribution: Statistic for every resample
+    """
+    values = np.asarray(values, dtype=np.float64)
+    values = values[~np.isnan(values)]
+    return _run_batches(_statistic_batch, (values, statistic), n_resamples, batch_size, seed, workers)
+
+
+def bootstrap_regression(x, y, n_resamples=1000, seed=None, workers=None, batch_size=None):
+    """
+    Bootstrap the coefficients of a least squares regression by resampling rows.
+
+    Args:
+        x: 2D design matrix (include a column of ones for an intercept)
+        y: 1D array of the data to regress against
+        n_resamples: Number of bootstrap resamples
+        seed: Seed for reproducible resamples
+        workers: Number of processes to shard the batches over, None for in process
+        batch_size: Number of resamples solved together, defaults to what fits a few million values
+    Returns:
+        coefficients: array shaped (n_resamples, number of columns in x)
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    valid = ~np.isnan(x).any(axis=1) & ~np.isnan(y)
+    return _run_batches(_regression_batch, (x[valid], y[valid]), n_resamples, batch_size, seed, workers)
+
+
+def percentile_interval(distribution, confidence=0.95, axis=0):
+    """
+    Percentile confidence interval from a bootstrap distribution
+
+    Returns:
+        lower, upper: bounds of the interval
+    """
+    tail = 100 * (1 - confidence) / 2
+    lower, upper = np.percentile(distribution, [tail, 100 - tail], axis=axis)
+    return lower, upper
+
+
+def bootstrap_confidence_interval(values, statistic=np.mean, confidence=0.95, **kwargs):
+    """
+    Percentile bootstrap confidence interval of a statistic, see bootstrap for the kwargs
+    """
+    return percentile_interval(bootstrap(values, statistic=statistic, **kwargs), confidence=confidence)
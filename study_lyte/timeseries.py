@@ -0,0 +1,121 @@
+import numpy as np
+import pandas as pd
+
+from .adjustments import get_time_base, resample
+
+
+class MultiRateTimeseries:
+    """
+    Sensor channels each kept at their own sample rate. Channels recorded together
+    share one time array and nothing is resampled until it is requested with align,
+    so sparse sensors are never stored at the rate of the densest one.
+
+    Usage:
+        data = MultiRateTimeseries.from_frames([accelerometer_df, barometer_df])
+        window = data.align(['Y-Axis', 'filtereddepth'], start=1.0, stop=2.5)
+        depth = BarometerDepth(data, start, stop, channel='filtereddepth')
+    """
+    def __init__(self):
+        self._channels = {}  # name -> (time, values)
+
+    @classmethod
+    def from_frames(cls, df_list):
+        """
+        Build from dataframes each with a time index or column at its own rate
+        """
+        data = cls()
+        for df in df_list:
+            data.add_frame(df)
+        return data
+
+    def add_frame(self, df):
+        """Add every column of a dataframe sharing its time base"""
+        time, columns = get_time_base(df)
+        time = np.asarray(time, dtype=np.float64)
+        for c in columns:
+            self.add(c, time, df[c].values)
+
+    def add(self, name, time, values):
+        """
+        Add a channel
+
+        Args:
+            name: Name of the channel
+            time: Increasing sample times in seconds
+            values: Samples of the channel
+        """
+        if name in self._channels:
+            raise ValueError(f'Channel {name} already exists')
+        if len(time) != len(values):
+            raise ValueError(f'Channel {name} has {len(values)} values for {len(time)} times')
+        self._channels[name] = (np.asarray(time, dtype=np.float64), np.asarray(values))
+
+    @property
+    def channels(self):
+        return list(self._channels.keys())
+
+    def __contains__(self, name):
+        return name in self._channels
+
+    def __len__(self):
+        return len(self._channels)
+
+    def time(self, name):
+        """Native sample times of a channel"""
+        return self._channels[name][0]
+
+    def values(self, name):
+        """Native samples of a channel"""
+        return self._channels[name][1]
+
+    def rate(self, name):
+        """Median sample rate of a channel in Hz"""
+        return 1 / np.median(np.diff(self.time(name)))
+
+    def index(self, name, time):
+        """Index of the sample of a channel nearest in time"""
+        t = self.time(name)
+        if len(t) < 2:
+            if not len(t):
+                raise ValueError(f'Channel {name} has no samples')
+            return 0
+        idx = np.clip(np.searchsorted(t, time), 1, len(t) - 1)
+        return int(idx - ((time - t[idx - 1]) <= (t[idx] - time)))
+
+    def series(self, name):
+        """Channel at its native rate as a pandas series indexed by time"""
+        time, values = self._channels[name]
+        return pd.Series(values, index=pd.Index(time, name='time'), name=name, copy=False)
+
+    def align(self, channels=None, time=None, start=None, stop=None, method='linear'):
+        """
+        Resample channels onto the same times, only the requested window is interpolated
+
+        Args:
+            channels: Names of the channels to align, defaults to all of them
+            time: Times to align to, defaults to the times of the fastest channel requested
+            start: Optional first time of the window
+            stop: Optional last time of the window
+            method: linear, nearest or previous sample, see adjustments.resample
+        Returns:
+            aligned: pandas Dataframe of the channels indexed by time
+        """
+        channels = channels or self.channels
+        if time is None:
+            time = max([self.time(c) for c in channels], key=len)
+        time = np.asarray(time, dtype=np.float64)
+
+        # Crop the target times to the window
+        lo = 0 if start is None else np.searchsorted(time, start, side='left')
+        hi = len(time) if stop is None else np.searchsorted(time, stop, side='right')
+        time = time[lo:hi]
+
+        buffer = np.empty((len(time), len(channels)), dtype=np.float64)
+        for i, c in enumerate(channels):
+            t, v = self._channels[c]
+            # Only the source samples surrounding the window are used
+            a = max(np.searchsorted(t, time[0], side='right') - 1, 0) if len(time) else 0
+            b = min(np.searchsorted(t, time[-1], side='left') + 1, len(t)) if len(time) else 0
+            resample(t[a:b], v[a:b], time, method=method, out=buffer[:, i])
+
+        return pd.DataFrame(buffer, index=pd.Index(time, name='time'), columns=channels, copy=False)
@@ -1,7 +1,9 @@
-from study_lyte.adjustments import (get_directional_mean, get_neutral_bias_at_border, get_normalized_at_border, \
+from study_lyte.adjustments import (BorderBias, get_bias_at_index, get_directional_mean, get_neutral_bias_at_border, \
+                                    get_neutral_bias_at_index, get_normalized_at_border,
                                     merge_time_series, remove_ambient, apply_calibration,
                                     aggregate_by_depth, get_points_from_fraction, assume_no_upward_motion,
-                                    convert_force_to_pressure, merge_on_to_time, zfilter)
+                                    convert_force_to_pressure, merge_on_to_time, zfilter, compact_dtypes,
+                                    fill_interior_gaps, resample, resample_frames)
 import pytest
 import pandas as pd
 import numpy as np
@@ -48,6 +50,22 @@ def test_directional_mean(data, fractional_basis, direction, expected):
         assert value == expected
 
 
+@pytest.mark.parametrize('index, expected', [
+    # Centered on the index
+    (4, 3.5),
+    # Clipped at the borders
+    (0, 0.5),
+    (9, 7.5),
+    # Past the data
+    (12, np.nan),
+])
+def test_get_bias_at_index(index, expected):
+    data = np.arange(10, dtype=float)
+    np.testing.assert_equal(get_bias_at_index(data, index, fractional_basis=0.2), expected)
+    np.testing.assert_equal(get_neutral_bias_at_index(pd.Series(data), index, fractional_basis=0.2).values,
+                            data - expected)
+
+
 @pytest.mark.parametrize('data, fractional_basis, direction, zero_bias_idx', [
     # Test the directionality
     ([1, 1, 2, 2], 0.5, 'forward', 0),
@@ -63,6 +81,30 @@ def test_get_neutral_bias_at_border(data, fractional_basis, direction, zero_bias
     assert result.iloc[zero_bias_idx] == 0
 
 
+class TestBorderBias:
+    @pytest.fixture()
+    def bias(self):
+        return BorderBias(pd.Series([1.0, 1.0, 2.0, 2.0]), fractional_basis=0.5)
+
+    def test_biases(self, bias):
+        assert bias.forward == 1
+        assert bias.backward == 2
+
+    @pytest.mark.parametrize('direction', ['forward', 'backward'])
+    def test_neutral_matches_function(self, bias, direction):
+        expected = get_neutral_bias_at_border(bias.series, fractional_basis=0.5, direction=direction)
+        pd.testing.assert_series_equal(bias.neutral(direction), expected)
+
+    def test_bias_computed_once(self, bias):
+        bias.forward
+        bias.series.iloc[0] = 100
+        assert bias.neutral('forward').iloc[1] == 0
+
+    def test_invalid_direction(self, bias):
+        with pytest.raises(ValueError):
+            bias.neutral('sideways')
+
+
 @pytest.mark.parametrize('data, fractional_basis, direction, ideal_norm_index', [
     # Test the directionality
     ([1, 1, 2, 2], 0.5, 'forward', 0),
@@ -153,11 +195,77 @@ def test_merge_time_series(data_list, expected):
     pd.testing.assert_frame_equal(result[exp_cols], expected_df, check_index_type=False)
 
 
+def test_merge_time_series_gaps():
+    """
+    Test gaps are filled by position on the merged times, leaving leading gaps and
+    holding the last value
+    """
+    df1 = pd.DataFrame({'time': [0, 0.1, 0.2, 0.3], 'a': [1, np.nan, 3, 4]}).set_index('time')
+    df2 = pd.DataFrame({'time': [0.05, 0.25, 0.5], 'b': [1, 2, 3]})
+    result = merge_time_series([df1, df2])
+    np.testing.assert_equal(result['time'].values, [0, 0.05, 0.1, 0.2, 0.25, 0.3, 0.5])
+    np.testing.assert_allclose(result['a'].values, [1, 5 / 3, 7 / 3, 3, 3.5, 4, 4])
+    np.testing.assert_allclose(result['b'].values, [np.nan, 1, 4 / 3, 5 / 3, 2, 2.5, 3])
+
+
+@pytest.mark.parametrize('method, expected', [
+    ('linear', [10, 10, 15, 20, 25, 30, 30]),
+    ('previous', [10, 10, 10, 20, 20, 30, 30]),
+    ('nearest', [10, 10, 20, 20, 30, 30, 30]),
+])
+def test_resample(method, expected):
+    """
+    Test each method resamples every column, holding the border values outside the data
+    """
+    time = np.array([0, 1, 2])
+    values = np.array([[10, -10], [20, -20], [30, -30]])
+    target = np.array([-1, 0, 0.5, 1, 1.5, 2, 3])
+    result = resample(time, values, target, method=method)
+    np.testing.assert_equal(result[:, 0], expected)
+    np.testing.assert_equal(result[:, 1], -1 * np.array(expected))
+
+
+@pytest.mark.parametrize('left, right', [(None, None), (np.nan, -1)])
+def test_resample_matches_interp(left, right):
+    rng = np.random.default_rng(0)
+    time = np.sort(rng.uniform(0, 1, 100))
+    values = rng.normal(size=100)
+    values[10] = np.nan
+    target = np.linspace(-0.1, 1.1, 1000)
+    np.testing.assert_array_equal(resample(time, values, target, left=left, right=right),
+                                  np.interp(target, time, values, left=left, right=right))
+
+
+def test_resample_skipna():
+    time = np.arange(4)
+    values = np.array([[0, 0], [np.nan, 1], [2, 2], [3, np.nan]])
+    result = resample(time, values, time, skipna=True)
+    np.testing.assert_equal(result, [[0, 0], [1, 1], [2, 2], [3, 2]])
+
+
+def test_resample_out():
+    """
+    Test results are written into the preallocated buffer
+    """
+    out = np.zeros((5, 2))
+    result = resample(np.arange(3), np.ones((3, 1)), np.arange(5), out=out[:, 1:])
+    np.testing.assert_equal(out, [[0, 1]] * 5)
+    assert np.shares_memory(result, out)
+
+
+def test_resample_frames_overlap():
+    df = pd.DataFrame({'time': [0, 1], 'a': [0, 1]})
+    with pytest.raises(ValueError):
+        resample_frames([df, df], [0, 0.5])
+
+
 @pytest.mark.parametrize('active, ambient, min_ambient_range, expected', [
     # Test normal situation with ambient present
     ([200, 200, 400, 1000], [200, 200, 50, 50], 100, [1.0, 1.0, 275, 1000]),
     # Test no cleaning required
-    ([200, 200, 400, 400], [210, 210, 200, 200], 90, [200, 200, 400, 400])
+    ([200, 200, 400, 400], [210, 210, 200, 200], 90, [200, 200, 400, 400]),
+    # Test an ambient sensor that never recorded is left alone
+    ([200, 200, 400, 1000], [np.nan, np.nan, np.nan, np.nan], 100, [200, 200, 400, 1000]),
 ])
 def test_remove_ambient(active, ambient, min_ambient_range, expected):
     """
@@ -169,6 +277,38 @@ def test_remove_ambient(active, ambient, min_ambient_range, expected):
     result = remove_ambient(active, ambient, min_ambient_range=100)
     np.testing.assert_equal(result.values, expected)
 
+def test_remove_ambient_out():
+    """
+    Test arrays are cleaned into a preallocated output
+    """
+    out = np.zeros(4)
+    result = remove_ambient(np.array([200, 200, 400, 1000]), np.array([200, 200, 50, 50]), out=out)
+    assert result is out
+    np.testing.assert_equal(out, [1.0, 1.0, 275, 1000])
+
+
+def test_remove_ambient_gaps():
+    """
+    Test interior nans are filled and the ends are left alone
+    """
+    active = pd.Series(np.linspace(200, 1000, 20))
+    active[[10, 11, 19]] = np.nan
+    ambient = pd.Series(np.linspace(200, 50, 20))
+    result = remove_ambient(active, ambient)
+    assert np.isnan(result.iloc[-1])
+    assert not result.iloc[:-1].isna().any()
+
+
+@pytest.mark.parametrize('data, expected', [
+    ([np.nan, 1, np.nan, 3, np.nan], [np.nan, 1, 2, 3, np.nan]),
+    ([0, np.nan, np.nan, 3], [0, 1, 2, 3]),
+    ([np.nan, np.nan], [np.nan, np.nan]),
+])
+def test_fill_interior_gaps(data, expected):
+    result = fill_interior_gaps(np.array(data, dtype=float))
+    np.testing.assert_equal(result, expected)
+
+
 @pytest.mark.parametrize('data, coefficients, expected', [
     ([1, 2, 3, 4], [2, 0], [2, 4, 6, 8])
 ])
@@ -253,4 +393,12 @@ def test_convert_force_to_pressure(force, tip_diameter, adj, expected):
 ])
 def test_zfilter(data, fraction, expected):
     result = zfilter(pd.Series(data), fraction)
-    np.testing.assert_equal(result, expected)
\ No newline at end of file
+    np.testing.assert_equal(result, expected)
+
+def test_compact_dtypes():
+    df = pd.DataFrame({'time': np.linspace(0, 1, 4), 'Sensor1': [1.0, 2.0, 3.0, 4095.0],
+                       'Sensor2': [1.0, np.nan, 3.0, 4.0], 'depth': [0.0, -1.5, -2.5, -3.0]})
+    result = compact_dtypes(df)
+    assert result.dtypes.to_dict() == {'time': np.float64, 'Sensor1': np.int16,
+                                       'Sensor2': np.float32, 'depth': np.float32}
+    np.testing.assert_equal(result.values, df.values)
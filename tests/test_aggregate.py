@@ -0,0 +1,72 @@
+from os.path import join
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from study_lyte.adjustments import aggregate_by_depth
+from study_lyte.aggregate import DepthGridAggregator
+from study_lyte.profile import LyteProfileV6
+
+
+@pytest.fixture()
+def agg():
+    agg = DepthGridAggregator(grid=[-10, -20, -30])
+    agg.add_arrays([[0, -5, -15, -25], [-2, -12, -14], [-1, -8]],
+                   [[1, 3, 10, 20], [4, 8, 12], [np.nan, 5]], names=['a', 'b', 'c'])
+    return agg
+
+
+def test_layer_means(agg):
+    expected = [[2, 10, 20], [4, 10, np.nan], [5, np.nan, np.nan]]
+    np.testing.assert_equal(agg.values.values, expected)
+    assert list(agg.values.index) == ['a', 'b', 'c']
+
+
+@pytest.mark.parametrize('depth, column, expected', [
+    (-10, 'count', 3),
+    (-10, 'mean', 11 / 3),
+    (-10, 'std', np.std([2, 4, 5], ddof=1)),
+    (-10, 'median', 4),
+    (-10, 'p25', 3),
+    (-20, 'count', 2),
+    (-20, 'p75', 10),
+    (-30, 'mean', 20),
+    (-30, 'std', np.nan),
+])
+def test_result(agg, depth, column, expected):
+    result = agg.result()
+    np.testing.assert_almost_equal(result.loc[depth, column], expected)
+
+
+def test_streaming_matches_batch():
+    """ Adding profiles one at a time gives the same statistics as all at once """
+    rng = np.random.default_rng(0)
+    depths = [-np.sort(rng.uniform(0, 50, 100)) for i in range(10)]
+    values = [rng.normal(size=100) for i in range(10)]
+
+    batch = DepthGridAggregator(resolution=5, max_depth=50)
+    batch.add_arrays(depths, values)
+    streamed = DepthGridAggregator(resolution=5, max_depth=50, keep_values=False)
+    for d, v in zip(depths, values):
+        streamed.add(pd.DataFrame({'depth': d, 'force': v}), 'force')
+
+    expected = batch.result()
+    result = streamed.result()
+    assert 'median' not in result.columns
+    pd.testing.assert_frame_equal(result, expected[['count', 'mean', 'std']])
+
+
+def test_matches_aggregate_by_depth(data_dir):
+    profile = LyteProfileV6(join(data_dir, 'kaslo.csv'))
+    grid = -1 * np.arange(10, 120, 10.0)
+    agg = DepthGridAggregator(grid=grid)
+    assert agg.add_profiles([profile], 'pressure') == []
+    expected = aggregate_by_depth(profile.pressure, new_depth=grid)
+    np.testing.assert_allclose(agg.values.values[0], expected['pressure'].values)
+
+
+@pytest.mark.parametrize('kwargs', [{}, {'resolution': 1}, {'grid': [-10, -5]}])
+def test_invalid_grid(kwargs):
+    with pytest.raises(ValueError):
+        DepthGridAggregator(**kwargs)
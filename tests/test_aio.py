@@ -0,0 +1,99 @@
+import asyncio
+from os.path import join
+
+import numpy as np
+import pytest
+
+from study_lyte.aio import ProfileLoader, is_processed, load_profile, process_many
+from study_lyte.cache import ResultCache
+from study_lyte.profile import LyteProfileV6
+
+
+@pytest.fixture(scope='module')
+def loader():
+    loader = ProfileLoader(max_workers=2, max_pending=2)
+    yield loader
+    loader.close()
+
+
+@pytest.fixture()
+def filenames(data_dir):
+    return [join(data_dir, f) for f in ['hard_surface_hard_stop.csv', 'egrip.csv', 'kaslo.csv']]
+
+
+def test_load_profile(loader, filenames):
+    profile = asyncio.run(load_profile(filenames[0], loader=loader))
+    assert is_processed(profile)
+    expected = LyteProfileV6(filenames[0])
+    np.testing.assert_equal(profile.depth.values, expected.depth.values)
+    assert [e.index for e in profile.events] == [e.index for e in expected.events]
+
+
+def test_load_profile_unprocessed(loader, filenames):
+    profile = asyncio.run(load_profile(filenames[0], process=False, loader=loader))
+    assert not is_processed(profile)
+    assert profile._raw is None
+    assert profile.metadata
+
+
+def test_load_profile_from_cache(loader, filenames, tmp_path):
+    """ Profiles fully in the cache never go to the process pool """
+    cache = ResultCache(tmp_path)
+    LyteProfileV6(filenames[0], cache=cache).process()
+    loader.close()
+    profile = asyncio.run(load_profile(filenames[0], loader=loader, cache=cache))
+    assert is_processed(profile)
+    assert loader._processes is None
+
+
+def test_event_loop_not_blocked(loader, filenames):
+    """ The loop keeps running while profiles are processed """
+    async def run():
+        ticks = 0
+        task = asyncio.ensure_future(load_profile(filenames[0], loader=loader))
+        while not task.done():
+            ticks += 1
+            await asyncio.sleep(0.001)
+        await task
+        return ticks
+
+    assert asyncio.run(run()) > 1
+
+
+def test_process_many(loader, filenames):
+    async def run():
+        return [s async for s in process_many(filenames, loader=loader)]
+
+    summaries = asyncio.run(run())
+    assert sorted(s['file'] for s in summaries) == sorted(filenames)
+    for s in summaries:
+        assert s['start_index'] < s['stop_index']
+
+
+@pytest.mark.parametrize('return_exceptions', [True, False])
+def test_process_many_errors(loader, filenames, tmp_path, return_exceptions):
+    broken = tmp_path.joinpath('broken.csv')
+    broken.write_text('not a profile\n')
+
+    async def run():
+        return [s async for s in process_many([broken] + filenames[:1], return_exceptions=return_exceptions,
+                                              loader=loader)]
+
+    if return_exceptions:
+        results = asyncio.run(run())
+        assert sum([isinstance(r, Exception) for r in results]) == 1
+    else:
+        with pytest.raises(Exception):
+            asyncio.run(run())
+
+
+def test_process_many_cancels(loader, filenames):
+    """ Leaving the loop early cancels the profiles not started """
+    async def run():
+        summaries = loader.process_many(filenames * 3)
+        async for s in summaries:
+            break
+        await summaries.aclose()
+        return [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+
+    assert asyncio.run(run()) == []
@@ -0,0 +1,128 @@
+from os.path import join
+import shutil
+
+import numpy as np
+import pytest
+
+from study_lyte.cache import ResultCache
+from study_lyte.calibrations import Calibrations
+from study_lyte.profile import LyteProfileV6
+
+
+@pytest.fixture()
+def cache(tmp_path):
+    return ResultCache(tmp_path.joinpath('cache'))
+
+
+class TestResultCache:
+    def test_key_is_content_addressed(self, cache, data_dir, tmp_path):
+        """ Copies of a file share a key """
+        copy = tmp_path.joinpath('copy.csv')
+        shutil.copy(join(data_dir, 'kaslo.csv'), copy)
+        assert cache.get_key(copy, {'a': 1}) == cache.get_key(join(data_dir, 'kaslo.csv'), {'a': 1})
+
+    @pytest.mark.parametrize('params, other, equal', [
+        ({'a': 1, 'b': 2}, {'b': 2, 'a': 1}, True),
+        ({'a': 1}, {'a': 2}, False),
+        ({'a': None}, {}, False),
+    ])
+    def test_hash_parameters(self, params, other, equal):
+        assert (ResultCache.hash_parameters(params) == ResultCache.hash_parameters(other)) == equal
+
+    def test_store_load(self, cache):
+        cache.store('key', {'x': np.arange(3)})
+        assert 'key' in cache
+        np.testing.assert_equal(cache.load('key')['x'], np.arange(3))
+        assert cache.load('missing') is None
+
+    def test_corrupt_entry(self, cache):
+        cache.get_path('key').write_bytes(b'not a pickle')
+        assert cache.load('key') is None
+        assert 'key' not in cache
+
+    def test_evict_entries(self, cache):
+        cache.max_entries = 2
+        for i, key in enumerate(['a', 'b']):
+            cache.store(key, {'x': i})
+        # Reading a marks it as recently used so b is evicted
+        cache.load('a')
+        cache.store('c', {'x': 2})
+        assert len(cache) == 2
+        assert 'b' not in cache
+
+    def test_evict_bytes(self, cache):
+        for key in ['a', 'b', 'c']:
+            cache.store(key, {'x': np.zeros(1000)})
+        size = cache.size
+        cache.max_bytes = size * 2 // 3
+        assert cache.evict() == 1
+        assert cache.size <= cache.max_bytes
+
+
+class TestProfileCache:
+    @pytest.fixture()
+    def filename(self, data_dir):
+        return join(data_dir, 'hard_surface_hard_stop.csv')
+
+    def test_hydrate(self, cache, filename):
+        profile = LyteProfileV6(filename, cache=cache)
+        profile.process()
+        assert len(cache) == 1
+
+        cached = LyteProfileV6(filename, cache=cache)
+        assert '_depth' in cached._hydrated
+        # Nothing is read to produce the results
+        assert cached._raw is None
+        np.testing.assert_equal(cached.depth.values, profile.depth.values)
+        np.testing.assert_equal(cached.force.values, profile.force.values)
+        assert [e.index for e in cached.events] == [e.index for e in profile.events]
+        assert cached._raw is None
+
+    def test_hydrate_summary(self, cache, filename):
+        """ Every cached result is written and the summary of a cached profile reads no data """
+        profile = LyteProfileV6(filename, cache=cache)
+        profile.process()
+        cached = LyteProfileV6(filename, cache=cache)
+        assert sorted(cached._hydrated) == sorted(LyteProfileV6.cached_results)
+        assert cached.summary() == profile.summary()
+        cached.report_card()
+        assert cached._raw is None
+
+    @pytest.mark.parametrize('kwargs', [{'depth_method': 'accelerometer'}, {'surface_detection_offset': 3},
+                                        {'calibration': {'Sensor1': [2, 0]}}])
+    def test_parameters_change_key(self, cache, filename, kwargs):
+        LyteProfileV6(filename, cache=cache).process()
+        profile = LyteProfileV6(filename, cache=cache, **kwargs)
+        assert profile._hydrated == []
+
+    @pytest.mark.parametrize('line, hit', [
+        # Header edits the results don't depend on
+        ('Latitude = 49.1\nLongitude = -117.0\n', True),
+        ('radicl VERSION = 0.6.0\n', True),
+        # Header edits changing the processing
+        ('ZPFO = 20\n', False),
+        ('ACCRANGE = 16\n', False),
+    ])
+    def test_header_edit(self, cache, data_dir, tmp_path, line, hit):
+        """ Only edits to the data or metadata used in processing miss the cache """
+        LyteProfileV6(join(data_dir, 'kaslo.csv'), cache=cache).process()
+        lines = open(join(data_dir, 'kaslo.csv')).readlines()
+        key = line.split('=')[0]
+        lines = [l for l in lines if l.split('=')[0] != key]
+        edited = tmp_path.joinpath('edited.csv')
+        edited.write_text(line + ''.join(lines))
+        profile = LyteProfileV6(edited, cache=cache)
+        assert ('_depth' in profile._hydrated) == hit
+
+    def test_set_calibration(self, cache, filename, data_dir):
+        profile = LyteProfileV6(filename, cache=cache)
+        profile.process()
+        profile.set_calibration(Calibrations(join(data_dir, 'calibrations.json')))
+        force = profile.force['force'].values
+        profile.store_results()
+        assert len(cache) == 2
+
+        cached = LyteProfileV6(filename, cache=cache)
+        cached.set_calibration(Calibrations(join(data_dir, 'calibrations.json')))
+        assert '_force' in cached._hydrated
+        np.testing.assert_equal(cached.force['force'].values, force)
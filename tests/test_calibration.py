@@ -1,7 +1,10 @@
+import json
+import os
 import pytest
+from concurrent.futures import ThreadPoolExecutor
 from os.path import join
 from pathlib import Path
-from study_lyte.calibrations import Calibrations, MissingMeasurementDateException
+from study_lyte.calibrations import Calibrations, CalibrationRegistry, MissingMeasurementDateException
 import pandas as pd
 
 
@@ -44,3 +47,144 @@ class TestCalibrations:
         """ Confirm this raises an exception when no date is provided """
         with pytest.raises(MissingMeasurementDateException):
             calibrations.from_serial("252813070A020005", date=None)
+
+
+class TestCalibrationRegistry:
+    @pytest.fixture()
+    def calibration_json(self, tmp_path):
+        path = tmp_path.joinpath('calibrations.json')
+        path.write_text(json.dumps({"SN1": {"Sensor1": [1, 0]},
+                                    "SN2": [{"date": "2025-05-01", "Sensor1": [3, 0]},
+                                            {"date": "2024-01-01", "Sensor1": [2, 0]}],
+                                    "SN3": [{"date": "2024-01-01", "Sensor1": [4, 0]}],
+                                    "default": {"Sensor1": [0, 0]}}))
+        return path
+
+    @pytest.fixture()
+    def registry(self):
+        return CalibrationRegistry()
+
+    def test_loaded_once(self, registry, calibration_json):
+        assert registry.load(calibration_json) is registry.load(calibration_json)
+
+    def test_shared_between_instances(self, calibration_json):
+        assert Calibrations(calibration_json)._compiled is Calibrations(calibration_json)._compiled
+
+    def test_reloaded_on_change(self, registry, calibration_json):
+        compiled = registry.load(calibration_json)
+        calibration_json.write_text(json.dumps({"default": {"Sensor1": [5, 0]}}))
+        stat = calibration_json.stat()
+        os.utime(calibration_json, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        reloaded = registry.load(calibration_json)
+        assert reloaded is not compiled
+        assert reloaded.lookup('SN1') == ('UNKNOWN', {"Sensor1": [5, 0]})
+
+    def test_persisted_cache(self, calibration_json, tmp_path):
+        cache_dir = tmp_path.joinpath('cache')
+        CalibrationRegistry().load(calibration_json, cache_dir=cache_dir)
+        assert len(list(cache_dir.glob('*.calcache'))) == 1
+
+        # A new process would read the cache instead of the json
+        registry = CalibrationRegistry()
+        key = registry.get_key(calibration_json)
+        compiled = registry.read_cache(key, cache_dir)
+        assert compiled is not None
+        assert compiled.lookup('SN1') == ('SN1', {"Sensor1": [1, 0]})
+
+    @pytest.mark.parametrize('serial, date, expected', [
+        # Listed out of order
+        ('SN2', '2024-06-01', [2, 0]),
+        ('SN2', '2025-06-01', [3, 0]),
+        # Single dated calibration without a date
+        ('SN3', None, [4, 0]),
+        # Too early uses the default
+        ('SN2', '2020-01-01', [0, 0]),
+    ])
+    def test_lookup(self, registry, calibration_json, serial, date, expected):
+        date = None if date is None else pd.to_datetime(date)
+        assert registry.load(calibration_json).lookup(serial, date=date)[1]['Sensor1'] == expected
+
+    def test_invalid(self, registry, tmp_path):
+        """ A malformed entry only fails lookups of its serial """
+        path = tmp_path.joinpath('bad.json')
+        path.write_text(json.dumps({"SN1": [{"Sensor1": [1, 0]}], "SN2": {"Sensor1": [2, 0]},
+                                    "default": {"Sensor1": [0, 0]}}))
+        compiled = registry.load(path)
+        with pytest.raises(ValueError):
+            compiled.lookup('SN1')
+        assert compiled.lookup('SN2') == ('SN2', {"Sensor1": [2, 0]})
+
+    @pytest.mark.parametrize('serial', ['SN1', 'SN2', 'UNKNOWN'])
+    def test_lookup_copy(self, registry, calibration_json, serial):
+        """ Changing a calibration doesn't change the shared one """
+        compiled = registry.load(calibration_json)
+        _, cal = compiled.lookup(serial, date=pd.to_datetime('2025-06-01'))
+        expected = cal['Sensor1'].copy()
+        cal['Sensor1'][0] = 100
+        assert compiled.lookup(serial, date=pd.to_datetime('2025-06-01'))[1]['Sensor1'] == expected
+
+    def test_threads(self, registry, calibration_json):
+        with ThreadPoolExecutor(8) as pool:
+            results = list(pool.map(lambda _: registry.load(calibration_json), range(32)))
+        assert all([r is results[0] for r in results])
+
+
+class TestWatchedCalibrations:
+    @pytest.fixture()
+    def calibration_json(self, tmp_path):
+        path = tmp_path.joinpath('calibrations.json')
+        path.write_text(json.dumps({"SN1": {"Sensor1": [1, 0]}, "default": {"Sensor1": [0, 0]}}))
+        return path
+
+    @pytest.fixture()
+    def calibrations(self, calibration_json):
+        return Calibrations(calibration_json, watch=True, poll_interval=0)
+
+    @staticmethod
+    def update(path, content):
+        """Write new content and make sure the mtime moves on coarse filesystems"""
+        stat = path.stat()
+        path.write_text(json.dumps(content))
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    def test_version_recorded(self, calibrations):
+        result = calibrations.from_serial('SN1')
+        assert result.version == calibrations.version
+        assert result.version is not None
+
+    def test_reload(self, calibrations, calibration_json):
+        version = calibrations.version
+        self.update(calibration_json, {"SN1": {"Sensor1": [2, 0]}, "default": {"Sensor1": [0, 0]}})
+        result = calibrations.from_serial('SN1')
+        assert result.calibration['Sensor1'] == [2, 0]
+        assert result.version != version
+
+    def test_not_watched(self, calibration_json):
+        calibrations = Calibrations(calibration_json)
+        self.update(calibration_json, {"SN1": {"Sensor1": [2, 0]}, "default": {"Sensor1": [0, 0]}})
+        assert calibrations.from_serial('SN1').calibration['Sensor1'] == [1, 0]
+
+    def test_poll_interval(self, calibration_json):
+        calibrations = Calibrations(calibration_json, watch=True, poll_interval=3600)
+        self.update(calibration_json, {"SN1": {"Sensor1": [2, 0]}, "default": {"Sensor1": [0, 0]}})
+        assert calibrations.from_serial('SN1').calibration['Sensor1'] == [1, 0]
+        assert calibrations.refresh(force=True)
+        assert calibrations.from_serial('SN1').calibration['Sensor1'] == [2, 0]
+
+    def test_invalid_update_kept(self, calibrations, calibration_json):
+        version = calibrations.version
+        stat = calibration_json.stat()
+        calibration_json.write_text('{"SN1": {"Sens')
+        os.utime(calibration_json, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        assert calibrations.from_serial('SN1').calibration['Sensor1'] == [1, 0]
+        assert calibrations.version == version
+
+    def test_lookups_during_reload(self, calibrations, calibration_json):
+        """ Lookups keep working on the current calibrations while another thread reloads """
+        calibrations._reload_lock.acquire()
+        try:
+            self.update(calibration_json, {"SN1": {"Sensor1": [2, 0]}, "default": {"Sensor1": [0, 0]}})
+            assert calibrations.from_serial('SN1').calibration['Sensor1'] == [1, 0]
+        finally:
+            calibrations._reload_lock.release()
+        assert calibrations.from_serial('SN1').calibration['Sensor1'] == [2, 0]
@@ -0,0 +1,150 @@
+import json
+from os.path import join
+from pathlib import Path
+import shutil
+
+import pandas as pd
+import pytest
+
+from study_lyte.cli import find_files, find_root, in_shard, main, parse_shard, process, read_manifests
+
+
+@pytest.fixture()
+def profiles(data_dir, tmp_path):
+    """ Small directory of profiles including one that can't be processed """
+    directory = tmp_path.joinpath('data')
+    directory.mkdir()
+    for f in ['hard_surface_hard_stop.csv', 'egrip.csv', 'kaslo.csv']:
+        shutil.copy(join(data_dir, f), directory)
+    directory.joinpath('broken.csv').write_text('not a profile\n')
+    return directory
+
+
+@pytest.mark.parametrize('value, expected', [('0/1', (0, 1)), ('2/4', (2, 4))])
+def test_parse_shard(value, expected):
+    assert parse_shard(value) == expected
+
+
+@pytest.mark.parametrize('value', ['4/4', '-1/2', '1', 'a/b', '0/0'])
+def test_parse_shard_invalid(value):
+    with pytest.raises(Exception):
+        parse_shard(value)
+
+
+def test_find_files(profiles):
+    files = find_files([str(profiles), str(profiles.joinpath('egrip.csv'))])
+    assert [f.name for f in files] == ['broken.csv', 'egrip.csv', 'hard_surface_hard_stop.csv', 'kaslo.csv']
+
+
+@pytest.mark.parametrize('count', [1, 2, 3, 7])
+def test_shards_partition_files(data_dir, count):
+    """ Every file belongs to exactly one shard """
+    files = find_files([data_dir])
+    shards = [[f for f in files if in_shard(f, (i, count))] for i in range(count)]
+    assert sorted(sum(shards, [])) == files
+
+
+@pytest.fixture()
+def nested(data_dir, tmp_path):
+    """ Profiles with the same name in different directories """
+    directory = tmp_path.joinpath('nested')
+    for site in ['site_a', 'site_b', 'site_c']:
+        directory.joinpath(site).mkdir(parents=True)
+        shutil.copy(join(data_dir, 'kaslo.csv'), directory.joinpath(site, 'profile.csv'))
+    return directory
+
+
+@pytest.mark.parametrize('inputs, expected', [
+    (['nested'], 'nested'),
+    (['nested/site_a', 'nested/site_b/profile.csv'], 'nested'),
+    (['nested/**/*.csv'], 'nested'),
+    (['nested/site_a/*.csv'], 'nested/site_a'),
+])
+def test_find_root(nested, monkeypatch, inputs, expected):
+    monkeypatch.chdir(nested.parent)
+    assert find_root(inputs) == nested.parent.joinpath(expected).resolve()
+
+
+def test_shards_use_relative_paths(nested, tmp_path):
+    """ Shards depend on the path within the inputs, not the name or where the inputs are """
+    copy = tmp_path.joinpath('elsewhere', 'nested')
+    shutil.copytree(nested, copy)
+    for count in [2, 3]:
+        for directory in [nested, copy]:
+            files = find_files([str(directory)])
+            shards = [[f.parent.name for f in files if in_shard(f, (i, count), root=directory)] for i in range(count)]
+            if directory == nested:
+                expected = shards
+        assert shards == expected
+        # Same names are spread over the shards
+        assert len([s for s in expected if s]) > 1
+
+
+def test_process_same_names(nested, tmp_path):
+    """ Files sharing a name in different directories keep their own outputs """
+    output = tmp_path.joinpath('results')
+    assert main(['process', str(nested.joinpath('**', '*.csv')), '--output', str(output)]) == 0
+    for site in ['site_a', 'site_b', 'site_c']:
+        assert output.joinpath('profiles', site, 'profile_force.csv').exists()
+
+
+def test_process(profiles, tmp_path):
+    output = tmp_path.joinpath('results')
+    result = main(['process', str(profiles), '--output', str(output)])
+    # The broken file fails without stopping the others
+    assert result == 1
+
+    summary = pd.read_csv(output.joinpath('summary.csv'))
+    assert len(summary) == 4
+    assert summary['status'].tolist().count('error') == 1
+    ok = summary[summary['status'] == 'ok']
+    assert (ok['start_index'] < ok['stop_index']).all()
+    assert ok['serial'].notna().all()
+    assert output.joinpath('profiles', 'kaslo_force.csv').exists()
+
+
+def test_process_resume(profiles, tmp_path):
+    output = tmp_path.joinpath('results')
+    files = find_files([str(profiles)])
+    first = process(files[:2], output, profiles=False)
+    assert len(first) == 2
+
+    # The broken file is retried, the processed one is skipped
+    second = process(files, output, resume=True, profiles=False)
+    assert sorted(e['file'] for e in second) == sorted(str(f) for f in files if f.name != 'egrip.csv')
+    assert len(read_manifests(output)) == 4
+
+
+def test_process_cache(profiles, tmp_path):
+    """ Profiles written as csvs are cached with their force and nir """
+    from study_lyte.cache import ResultCache
+    from study_lyte.profile import LyteProfileV6
+
+    filename = profiles.joinpath('kaslo.csv')
+    cache_dir = tmp_path.joinpath('cache')
+    process([filename], tmp_path.joinpath('results'), cache_dir=cache_dir)
+    cache = ResultCache(cache_dir)
+    results = cache.load(LyteProfileV6(filename, cache=cache).cache_key)
+    assert '_force' in results and '_nir' in results
+
+
+def test_merge_shards(profiles, tmp_path):
+    """ Shards write their own manifest and merge combines them """
+    output = tmp_path.joinpath('results')
+    for i in range(2):
+        main(['process', str(profiles), '--output', str(output), '--shard', f'{i}/2', '--no-profiles'])
+    assert len(list(output.glob('manifest-*-of-2.jsonl'))) == 2
+
+    assert main(['merge', str(output)]) == 0
+    summary = pd.read_csv(output.joinpath('summary.csv'))
+    assert sorted(Path(f).name for f in summary['file']) == ['broken.csv', 'egrip.csv',
+                                                             'hard_surface_hard_stop.csv', 'kaslo.csv']
+
+
+def test_manifest_is_json(profiles, tmp_path):
+    output = tmp_path.joinpath('results')
+    process([profiles.joinpath('kaslo.csv')], output, profiles=False)
+    with open(output.joinpath('manifest.jsonl')) as fp:
+        entry = json.loads(fp.readline())
+    assert entry['status'] == 'ok'
+    assert entry['summary']['filename'] == 'kaslo.csv'
@@ -113,6 +113,24 @@ def test_get_constrained_baro_real(raw_df, fname, column, acc_axis, method, expe
     assert pytest.approx(delta_d, abs=3) == expected_depth
 
 
+@pytest.mark.parametrize('fname, column, decimate', [
+    ('hard_surface_hard_stop.csv', 'depth', 8),
+    ('pilots.csv', 'depth', 16),
+    ('mores_pit_1.csv', 'depth', 4),
+])
+def test_get_constrained_baro_decimated(raw_df, fname, column, decimate):
+    """
+    Test searching an oversampled barometer on every nth sample finds the same result
+    """
+    neutral = get_neutral_bias_at_border(raw_df['Y-Axis'])
+    start = get_acceleration_start(neutral)
+    stop = get_acceleration_stop(neutral)
+    baro = raw_df.set_index('time')[column]
+    expected = get_constrained_baro_depth(baro, start, stop, method='nanmedian')
+    result = get_constrained_baro_depth(baro, start, stop, method='nanmedian', decimate=decimate)
+    pd.testing.assert_frame_equal(result, expected)
+
+
 class TestDepthTimeSeries:
     """Quick tests for all base depth timeseries class"""
     @pytest.fixture(scope='class')
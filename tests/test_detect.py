@@ -1,6 +1,9 @@
 from study_lyte.detect import (get_signal_event, get_acceleration_start, get_acceleration_stop, get_nir_surface,
-                               get_nir_stop, get_sensor_start, find_nearest_value_index, get_ground_strike)
+                               get_nir_stop, get_sensor_start, find_nearest_value_index, get_ground_strike,
+                               get_upward_motion, get_batch_signal_event, get_batch_events, pack_arrays, find_peaks,
+                               find_valleys, nearest_peak)
 from study_lyte.io import read_csv
+from study_lyte.profile import LyteProfileV6
 from study_lyte.adjustments import remove_ambient, get_neutral_bias_at_border
 import pytest
 import numpy as np
@@ -202,3 +205,109 @@ def test_get_ground_strike(raw_df, expected_ground_strike):
     stop = get_acceleration_stop(backward_accel)
     idx = get_ground_strike(raw_df['Sensor1'], stop)
     assert pytest.approx(idx, abs=int(0.02 * len(raw_df.index))) == expected_ground_strike
+
+
+@pytest.mark.parametrize('fname', ['pilots_error.csv'])
+def test_get_ground_strike_diagnostics(raw_df):
+    stop = get_acceleration_stop(get_neutral_bias_at_border(raw_df['Y-Axis'], direction='backward'))
+    ground, info = get_ground_strike(raw_df['Sensor1'], stop, diagnostics=True)
+    assert ground == get_ground_strike(raw_df['Sensor1'], stop)
+    assert ground == info.impact
+    assert abs(info.impact - info.long_press) <= int(0.1 * len(info.norm1))
+    assert len(info.diff) == len(info.norm1)
+    assert info.start < stop < info.start + len(info.diff)
+
+@pytest.mark.parametrize('depth, threshold, expected', [
+    # Steady descent, no upward motion
+    ([0, -1, -10, -20, -30], 5, (False, None, None, 0)),
+    # Small bounce under the threshold
+    ([0, -10, -20, -17, -30], 5, (False, None, None, 3)),
+    # Rise of 6cm starting at -70 peaking at -64
+    ([0, -10, -40, -70, -64, -81, -82], 5, (True, 3, 4, 6)),
+    # Largest excursion is chosen when there are multiple
+    ([0, -10, -4, -30, -20, -40], 5, (True, 3, 4, 10)),
+    # Nans are ignored
+    ([0, -10, np.nan, -20, -12, -30], 5, (True, 3, 4, 8)),
+    # No data
+    ([], 5, (False, None, None, 0)),
+])
+def test_get_upward_motion(depth, threshold, expected):
+    result = get_upward_motion(np.array(depth, dtype=float), threshold=threshold)
+    assert (result.detected, result.index, result.peak, result.magnitude) == expected
+
+
+@pytest.mark.parametrize("data, threshold, direction, max_threshold, n_points", [
+    (np.array([0, 1, 0]), 0.5, 'forward', None, 1),
+    (np.array([0, 0, 0.1]), 0.01, 'backward', None, 1),
+    (np.array([20, 100, 100, 40]), 30, 'forward', 90, 1),
+    (np.array([2, 2, 1, 2]), 2, 'forward', None, 2),
+    (np.array([11, 10, 1, 2, 2, 3, 11]), 2, 'forward', 10, 3),
+    (np.array([2, 2, 2, 1, 2, 2, 2, 2]), 2, 'backward', None, 3),
+    # No event
+    (np.array([0, 0, 0]), 2, 'forward', None, 1),
+])
+def test_get_batch_signal_event(data, threshold, direction, max_threshold, n_points):
+    """
+    Test every row of the batch matches the scalar event when padded among other rows
+    """
+    expected = get_signal_event(data, threshold=threshold, search_direction=direction,
+                                max_threshold=max_threshold, n_points=n_points)
+    packed, lengths = pack_arrays([np.ones(10) * threshold, data])
+    idx = get_batch_signal_event(packed, 0, lengths, threshold=threshold, search_direction=direction,
+                                 max_threshold=max_threshold, n_points=n_points)
+    assert idx[1] == (-1 if expected is None else expected)
+
+
+def test_get_batch_events(data_dir):
+    """
+    Test batch detection is identical to running each detector on each profile
+    """
+    fnames = ['kaslo.csv', 'pilots_error.csv', 'ground_touch_and_go.csv', 'egrip.csv', 'hi_res.csv']
+    accelerations, nirs, forces, expected = [], [], [], []
+    for f in fnames:
+        df, meta = read_csv(join(data_dir, f))
+        acceleration = df[LyteProfileV6.get_motion_name(df.columns)].astype(float)
+        nir = remove_ambient(df['Sensor3'], df['Sensor2']).astype(float)
+        force = df['Sensor1'].astype(float)
+
+        stop = get_acceleration_stop(get_neutral_bias_at_border(acceleration, direction='backward'))
+        ground = get_ground_strike(force, stop)
+        expected.append([get_acceleration_start(get_neutral_bias_at_border(acceleration)), stop,
+                         get_nir_surface(nir), -1 if ground is None else ground])
+        accelerations.append(acceleration)
+        nirs.append(nir)
+        forces.append(force)
+
+    events = get_batch_events(accelerations, nirs, forces)
+    result = np.array([events.start, events.stop, events.surface, events.ground]).T
+    np.testing.assert_equal(result, expected)
+
+
+@pytest.mark.parametrize('arr, height, distance, expected', [
+    ([0, 1, 0, 2, 0, 3, 0], None, 1, [1, 3, 5]),
+    # Height filters before the distance is checked
+    ([0, 1, 0, 2, 0, 3, 0], 1.5, 1, [3, 5]),
+    ([0, 1, 0, 2, 0, 3, 0], None, 3, [1, 5]),
+    ([0, 1, 0, 2, 0, 3, 0], 1.5, 3, [3]),
+    # Plateaus and values next to nans are not peaks
+    ([0, 1, 1, 0, np.nan, 2, 0], None, 1, []),
+    ([], None, 1, []),
+])
+def test_find_peaks(arr, height, distance, expected):
+    peaks, heights = find_peaks(np.array(arr, dtype=float), height=height, distance=distance)
+    np.testing.assert_equal(peaks, expected)
+    np.testing.assert_equal(heights, np.array(arr, dtype=float)[expected])
+
+
+def test_find_valleys():
+    np.testing.assert_equal(find_valleys([1, 0, 1, 1, -1, 2]), [1, 4])
+
+
+@pytest.mark.parametrize('decimate', [1, 4, 10])
+def test_nearest_peak_decimated(decimate):
+    """ Peaks found on a decimated signal are refined to the full resolution """
+    t = np.linspace(0, 4 * np.pi, 1000)
+    arr = np.sin(t)
+    assert nearest_peak(arr, 700, distance=100, decimate=decimate) == 624
+    assert nearest_peak(-np.ones(10), 5, default_index=3, decimate=decimate) == 3
+
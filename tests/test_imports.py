@@ -0,0 +1,29 @@
+import subprocess
+import sys
+
+import pytest
+
+
+def run_import(module, statement):
+    code = f"import {module}; import logging, sys; print({statement})"
+    return subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout.strip()
+
+
+@pytest.mark.parametrize('module', ['study_lyte', 'study_lyte.calibrations', 'study_lyte.profile'])
+def test_import_leaves_logging_alone(module):
+    """ Importing the library should never configure logging """
+    assert run_import(module, 'len(logging.getLogger().handlers)') == '0'
+
+
+@pytest.mark.parametrize('module, dependency', [
+    ('study_lyte', 'pandas'),
+    ('study_lyte.calibrations', 'pandas'),
+    ('study_lyte.profile', 'matplotlib'),
+    ('study_lyte.plotting', 'matplotlib'),
+])
+def test_import_is_lazy(module, dependency):
+    assert run_import(module, f"'{dependency}' in sys.modules") == 'False'
+
+
+def test_lazy_submodule():
+    assert run_import('study_lyte', "study_lyte.profile.__name__") == 'study_lyte.profile'
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+from matplotlib.figure import Figure
+
+from study_lyte.plotting import decimate, plot_ts
+
+
+@pytest.fixture()
+def signal():
+    """ Noise with a single sample spike """
+    y = np.random.default_rng(0).normal(size=100_000)
+    y[54321] = 100
+    return np.arange(len(y)) / 16000, y
+
+
+@pytest.mark.parametrize('method, n_buckets, expected', [('minmax', 500, 1002), ('lttb', 500, 500)])
+def test_decimate_size(signal, method, n_buckets, expected):
+    idx = decimate(*signal, n_buckets, method=method)
+    assert len(idx) <= expected
+    assert idx[0] == 0 and idx[-1] == len(signal[1]) - 1
+    assert np.all(np.diff(idx) > 0)
+
+
+@pytest.mark.parametrize('method', ['minmax', 'lttb'])
+def test_decimate_keeps_spike(signal, method):
+    assert 54321 in decimate(*signal, 500, method=method)
+
+
+def test_decimate_minmax_envelope(signal):
+    """ The min and max of every bucket are kept """
+    x, y = signal
+    idx = decimate(x, y, 100)
+    for bucket in np.array_split(np.arange(len(y)), 100):
+        assert bucket[np.argmin(y[bucket])] in idx
+        assert bucket[np.argmax(y[bucket])] in idx
+
+
+@pytest.mark.parametrize('y, n_buckets, expected', [
+    # Short series are left alone
+    ([1.0, 2.0, 3.0], 2, [0, 1, 2]),
+    # Nans are skipped
+    ([1.0, np.nan, 5.0, 0.0, 2.0, 3.0, 1.0, np.nan], 2, [0, 2, 3, 5, 6, 7]),
+    # All nan buckets keep a nan to break the line
+    ([np.nan, np.nan, np.nan, 1.0, 2.0, 3.0], 2, [0, 3, 5]),
+])
+def test_decimate_minmax(y, n_buckets, expected):
+    np.testing.assert_equal(decimate(np.arange(len(y)), np.array(y), n_buckets), expected)
+
+
+@pytest.mark.parametrize('method', ['minmax', 'lttb'])
+def test_decimate_columns(signal, method):
+    """ Samples chosen for any column are kept """
+    x, y = signal
+    other = y[::-1].copy()
+    idx = decimate(x, np.column_stack([y, other]), 500, method=method)
+    for column in [y, other]:
+        assert np.isin(decimate(x, column, 500, method=method), idx).all()
+
+
+@pytest.mark.parametrize('exact, expected', [(False, 5000), (True, 100_000)])
+def test_plot_ts_dataframe(signal, exact, expected):
+    """ Multi column dataframes plot a line per column """
+    x, y = signal
+    df = pd.DataFrame({'a': y, 'b': y[::-1]})
+    fig = Figure(figsize=(5, 4), dpi=100)
+    ax = plot_ts(df, ax=fig.add_subplot(), show=False, exact=exact)
+    assert len(ax.lines) == 2
+    assert len(ax.lines[0].get_xdata()) <= expected
+    np.testing.assert_equal(ax.lines[1].get_ydata()[[0, -1]], df['b'].values[[0, -1]])
+
+
+def test_decimate_invalid(signal):
+    with pytest.raises(ValueError):
+        decimate(*signal, 100, method='mean')
@@ -1,8 +1,10 @@
 import pytest
+import numpy as np
 from os.path import join
 from pathlib import Path
+from study_lyte.adjustments import remove_ambient
 from study_lyte.calibrations import Calibrations
-from study_lyte.profile import ProcessedProfileV6, LyteProfileV6, Sensor, GISPoint
+from study_lyte.profile import ProcessedProfileV6, LyteProfileV6, Sensor, GISPoint, CroppedData
 from operator import attrgetter
 
 
@@ -213,12 +215,21 @@ class TestLyteProfile:
     @pytest.mark.parametrize('filename, depth_method, expected', [
         # Test report card doesn't error out when missing key features
         ("open_air.csv", 'fused', 0),
+        # No accelerometer
+        ("banner_legacy.csv", 'fused', 0),
     ])
     def test_report_card(self, profile, filename, depth_method, expected):
         """Test we are parsing the point info"""
         result = profile.report_card()
         assert True
 
+    @pytest.mark.parametrize('filename, depth_method, expected', [
+        ('kaslo.csv', 'fused', False),
+    ])
+    def test_has_upward_motion(self, profile, filename, depth_method, expected):
+        assert profile.has_upward_motion == expected
+        assert profile.upward_motion.index is None
+
     @pytest.mark.parametrize('filename, depth_method, expected', [
         # Test assignment of the serial number from file
         ("open_air.csv", 'fused', "252813070A020004"),
@@ -242,6 +253,148 @@ class TestLyteProfile:
         calibrations = Calibrations(p)
         profile.set_calibration(calibrations)
         assert profile.calibration['Sensor1'][2] == expected
+        assert profile.calibration_version == calibrations.version
+
+
+class TestCroppedData:
+    @pytest.fixture()
+    def cropped(self):
+        columns = {'force': np.array([1.0, 2.0, 3.0, 4.0, 5.0]), 'depth': np.array([0.0, -1.0, -2.0, -3.0, -4.0])}
+        return CroppedData(columns, 1, 4)
+
+    def test_length(self, cropped):
+        assert len(cropped) == 3
+        assert not cropped.empty
+
+    def test_view_is_not_copied(self, cropped):
+        assert np.shares_memory(cropped['force'], cropped._columns['force'])
+        np.testing.assert_equal(cropped['force'], [2, 3, 4])
+
+    def test_rebase(self, cropped):
+        np.testing.assert_equal(cropped['depth'], [0, -1, -2])
+
+    def test_read_only(self, cropped):
+        with pytest.raises(ValueError):
+            cropped['force'][0] = 10
+
+    def test_to_frame(self, cropped):
+        df = cropped.to_frame()
+        assert list(df.columns) == ['force', 'depth']
+        assert len(df) == 3
+
+    def test_empty(self):
+        cropped = CroppedData({'depth': np.array([0.0, -1.0])}, 2, 2)
+        assert cropped.empty
+        assert cropped.to_frame().empty
+
+
+class TestProfileViews:
+    @pytest.fixture()
+    def profile(self, data_dir):
+        return LyteProfileV6(join(data_dir, 'kaslo.csv'), calibration={'Sensor1': [-1, 4096]})
+
+    def test_nir_view_shares_raw(self, profile):
+        assert np.shares_memory(profile.nir_view['nir'], profile.raw['nir'].values)
+        assert not np.shares_memory(profile.nir['nir'].values, profile.raw['nir'].values)
+
+    @pytest.mark.parametrize('name, column', [('force', 'force'), ('nir', 'nir'), ('pressure', 'pressure')])
+    def test_frames_are_writable(self, profile, name, column):
+        """ Public frames own their data, editing them leaves the profile alone """
+        df = getattr(profile, name)
+        expected = df[column].iloc[1]
+        df.loc[0, column] = 1
+        df[column] *= 2
+        df.loc[0, 'depth'] = 100
+        assert getattr(profile, f'{name}_view' if name != 'pressure' else 'force_view')['depth'][0] == 0
+        assert df[column].iloc[1] == expected * 2
+
+    def test_pressure_leaves_force(self, profile):
+        profile.pressure
+        assert 'pressure' not in profile.force.columns
+        np.testing.assert_equal(profile.pressure['depth'].values, profile.force['depth'].values)
+
+    @pytest.mark.parametrize('filename', ['kaslo.csv', 'hi_res.csv'])
+    @pytest.mark.parametrize('depth_method', ['fused', 'accelerometer', 'barometer'])
+    def test_depth_skips_nir(self, data_dir, filename, depth_method, monkeypatch):
+        """ Depth and the motion events never clean the NIR """
+        def remove_ambient(*args, **kwargs):
+            raise AssertionError('NIR cleaned')
+
+        monkeypatch.setattr('study_lyte.profile.remove_ambient', remove_ambient)
+        profile = LyteProfileV6(join(data_dir, filename), depth_method=depth_method)
+        profile.depth
+        profile.start
+        profile.stop
+        assert 'nir' not in profile.raw.columns
+
+    def test_nir_is_lazy(self, profile):
+        profile.depth
+        profile.stop
+        assert 'nir' not in profile.raw.columns
+        profile.surface
+        assert 'nir' in profile.raw.columns
+        np.testing.assert_equal(profile.clean_nir.values,
+                                remove_ambient(profile.raw['Sensor3'], profile.raw['Sensor2']).values)
+
+
+class TestEventOrder:
+    @pytest.mark.parametrize('first', ['depth', 'start', 'surface', 'events', 'moving_time', 'distance_traveled',
+                                       'upward_motion'])
+    def test_start_independent_of_access(self, data_dir, first):
+        """ Everything reporting the start moves it to the snow surface whichever attribute is read first """
+        profile = LyteProfileV6(join(data_dir, 'hi_res.csv'))
+        getattr(profile, first)
+        summary = profile.summary()
+        assert profile.events[0].index == 0
+        assert summary['start_index'] == 0
+        assert summary['moving_time'] == pytest.approx(profile.stop.time - profile.start.time)
+        assert summary['distance_traveled'] == pytest.approx(abs(profile.start.depth - profile.stop.depth), nan_ok=True)
+
+
+class TestCompactProfile:
+    @pytest.fixture()
+    def profiles(self, data_dir):
+        f = join(data_dir, 'kaslo.csv')
+        return [LyteProfileV6(f, calibration={'Sensor1': [-1, 4096]}, precision=p) for p in ['full', 'compact']]
+
+    @pytest.mark.parametrize('filename, expected', [
+        # Whole ADC counts
+        ('angled_measurement.csv', np.int16),
+        # Half counts are stored as floats
+        ('kaslo.csv', np.float32),
+    ])
+    def test_adc_dtypes(self, data_dir, filename, expected):
+        profile = LyteProfileV6(join(data_dir, filename), precision='compact')
+        assert profile.raw['Sensor2'].dtype == expected
+        assert profile.raw['time'].dtype == np.float64
+
+    def test_derived_dtypes(self, profiles):
+        full, compact = profiles
+        assert compact.depth.dtype == np.float32
+        assert compact.force['force'].dtype == np.float32
+
+    @pytest.mark.parametrize('attribute', ['start.index', 'stop.index', 'surface.nir.index'])
+    def test_events_match_full_precision(self, profiles, attribute):
+        full, compact = profiles
+        assert attrgetter(attribute)(compact) == attrgetter(attribute)(full)
+
+    def test_distance_matches_full_precision(self, profiles):
+        full, compact = profiles
+        assert pytest.approx(compact.distance_traveled, abs=1e-2) == full.distance_traveled
+
+    def test_shared_time_index(self, profiles):
+        full, compact = profiles
+        assert compact.depth.index is compact.accelerometer.raw.index
+
+    def test_memory_usage(self, profiles):
+        full, compact = profiles
+        for p in profiles:
+            p.force
+        assert compact.memory_usage()['total'] < 0.6 * full.memory_usage()['total']
+
+    def test_invalid_precision(self, data_dir):
+        with pytest.raises(ValueError):
+            LyteProfileV6(join(data_dir, 'kaslo.csv'), precision='half')
 
 
 class TestLegacyProfile:
@@ -42,6 +42,50 @@ class TestLinearRegression:
         result = relationship.predict(pd.DataFrame({'Force':[4, 5, 6]}))
         np.testing.assert_almost_equal(result, [81, 101, 121], decimal=5)
 
+    def test_prediction_index(self, relationship_predefined):
+        """
+        Test a dataframe prediction keeps its index and an array gives the same values
+        """
+        df = pd.DataFrame({'a': [1.0, 2.0], 'b': [3.0, 4.0]}, index=[10, 20])
+        result = relationship_predefined.predict(df)
+        assert list(result.index) == [10, 20]
+        np.testing.assert_almost_equal(result, [44, 65])
+        np.testing.assert_almost_equal(relationship_predefined.predict(df.values), [44, 65])
+
+    def test_prediction_extra_columns(self, relationship):
+        """
+        Test columns past the regression inputs are ignored whatever their type
+        """
+        df = pd.DataFrame({'x': [4, 5], 'site': ['a', 'b']})
+        np.testing.assert_almost_equal(relationship.predict(df).values, [81, 101], decimal=5)
+        np.testing.assert_almost_equal(relationship.predict(df.values), [81, 101], decimal=5)
+
+    def test_prediction_missing_columns(self, relationship_predefined):
+        with pytest.raises(ValueError):
+            relationship_predefined.predict(pd.DataFrame({'a': [1.0]}))
+
+    def test_regress_nans(self):
+        """
+        Rows with a nan in the inputs or output are ignored
+        """
+        rel = LinearRegression()
+        rel.regress(pd.DataFrame({'x': [1, 2, np.nan, 3, 4]}), pd.Series([3, 5, 100, 7, np.nan]))
+        np.testing.assert_almost_equal(rel.coefficients, [2, 1], decimal=5)
+
+    @pytest.mark.parametrize('key, second_key, expected', [
+        ('mean point error', 'value', 5),
+        ('max point error', 'percent', 1.0),
+        ('min absolute point error', 'value', 0),
+    ])
+    def test_quality_nans(self, key, second_key, expected):
+        """
+        Test nans are skipped in the quality metrics
+        """
+        predicted = pd.Series([20, np.nan, 30])
+        measured = pd.Series([10, 10, 30])
+        result = LinearRegression.quality(predicted, measured)
+        np.testing.assert_almost_equal(result[key][second_key], expected, decimal=5)
+
     @pytest.mark.parametrize('key, second_key, expected', [
         # Confirm a few stats are in here
         ('mean difference', 'value', -3.33333),
@@ -84,3 +128,38 @@ class TestLinearRegression:
         """
         string_eq = relationship_predefined.equation
         assert string_eq == 'data = 10.000*Z + 11.000*Y + 1.000'
+
+
+class TestLinearRegressionBootstrap:
+    @pytest.fixture(scope='class')
+    def data(self):
+        rng = np.random.default_rng(0)
+        df = pd.DataFrame({'a': rng.normal(size=200)})
+        measured = 3 * df['a'] + 1 + rng.normal(0, 0.5, 200)
+        return df, measured
+
+    @pytest.fixture(scope='class')
+    def relationship(self, data):
+        rel = LinearRegression()
+        rel.regress(*data)
+        rel.bootstrap(n_resamples=500, seed=1)
+        return rel
+
+    def test_coefficient_intervals(self, relationship):
+        intervals = relationship.coefficient_intervals()
+        assert list(intervals.index) == ['a', 'intercept']
+        assert (intervals['lower'] < intervals['coefficient']).all()
+        assert (intervals['coefficient'] < intervals['upper']).all()
+        assert intervals.loc['a', 'lower'] < 3 < intervals.loc['a', 'upper']
+
+    def test_prediction_interval(self, relationship, data):
+        """ Most of the data falls in the 95% prediction interval """
+        df, measured = data
+        intervals = relationship.prediction_interval(df, seed=0)
+        np.testing.assert_almost_equal(intervals['predicted'].values, relationship.predict(df).values)
+        inside = (measured >= intervals['lower']) & (measured <= intervals['upper'])
+        assert inside.mean() == pytest.approx(0.95, abs=0.04)
+
+    def test_bootstrap_predefined(self):
+        with pytest.raises(ValueError):
+            LinearRegression(coefficients=[1, 2]).bootstrap()
@@ -0,0 +1,85 @@
+from study_lyte.rolling import get_window_bounds, rolling_mean, rolling_std
+import pytest
+import pandas as pd
+import numpy as np
+
+
+@pytest.fixture(scope='session')
+def noisy():
+    rng = np.random.default_rng(0)
+    data = 3000 + np.cumsum(rng.normal(0, 5, 500))
+    data[[10, 11, 200, 499]] = np.nan
+    return data
+
+
+@pytest.mark.parametrize('n_samples, window, center, closed, expected_start, expected_stop', [
+    # Trailing windows
+    (4, 2, False, 'right', [0, 0, 1, 2], [1, 2, 3, 4]),
+    # Centered windows
+    (4, 3, True, 'right', [0, 0, 1, 2], [2, 3, 4, 4]),
+    # Both ends included
+    (4, 2, True, 'both', [0, 0, 0, 1], [1, 2, 3, 4]),
+    (4, 2, False, 'neither', [0, 0, 1, 2], [0, 1, 2, 3]),
+])
+def test_get_window_bounds(n_samples, window, center, closed, expected_start, expected_stop):
+    start, stop = get_window_bounds(n_samples, window, center=center, closed=closed)
+    np.testing.assert_equal(start, expected_start)
+    np.testing.assert_equal(stop, expected_stop)
+
+
+def test_get_window_bounds_invalid_closed():
+    with pytest.raises(ValueError):
+        get_window_bounds(4, 2, closed='bogus')
+
+
+@pytest.mark.parametrize('window', [1, 2, 5, 50])
+@pytest.mark.parametrize('center', [True, False])
+@pytest.mark.parametrize('closed', ['right', 'left', 'both', 'neither'])
+@pytest.mark.parametrize('min_periods', [None, 1])
+def test_rolling_matches_pandas(noisy, window, center, closed, min_periods):
+    """
+    Ensure the rolling statistics are interchangeable with pandas
+    """
+    expected = pd.Series(noisy).rolling(window=window, center=center, closed=closed, min_periods=min_periods)
+    kwargs = dict(center=center, closed=closed, min_periods=min_periods)
+    np.testing.assert_allclose(rolling_mean(noisy, window, **kwargs), expected.mean(), rtol=1e-9)
+    np.testing.assert_allclose(rolling_std(noisy, window, **kwargs), expected.std(), rtol=1e-6, atol=1e-6)
+
+
+def test_rolling_std_flat():
+    """
+    Flat data with a large offset should not produce negative variance
+    """
+    data = np.full(100, 1e8) + np.arange(100) % 2 * 1e-3
+    result = rolling_std(data, 10)
+    assert np.all(result[9:] >= 0)
+    np.testing.assert_allclose(result[9:], pd.Series(data).rolling(10).std().values[9:], atol=1e-6)
+
+
+@pytest.mark.parametrize('n_samples, level, std, n_outliers', [
+    (5000, 1e4, 1e-3, 1),
+    (1_000_000, 4000, 0.05, 10),
+])
+def test_rolling_std_leading_outlier(n_samples, level, std, n_outliers):
+    """
+    Leading outliers far from the rest of the data should not cost precision, compared
+    against an exact std of every window
+    """
+    data = level + np.random.default_rng(0).normal(0, std, n_samples)
+    data[:n_outliers] = 0
+    window = 50
+    windows = np.lib.stride_tricks.sliding_window_view(data, window)
+    result = rolling_std(data, window)[window - 1:]
+    np.testing.assert_allclose(result, windows.std(axis=1, ddof=1), rtol=1e-9)
+    np.testing.assert_allclose(rolling_mean(data, window)[window - 1:], windows.mean(axis=1), rtol=1e-12)
+
+
+def test_rolling_2d_rows_match_1d(noisy):
+    """
+    Rows of a 2D array with their own windows should match computing each row alone
+    """
+    rows = np.vstack([noisy, noisy[::-1] * 2])
+    windows = [5, 20]
+    result = rolling_std(rows, windows, min_periods=[5, 1])
+    np.testing.assert_array_equal(result[0], rolling_std(noisy, 5, min_periods=5))
+    np.testing.assert_array_equal(result[1], rolling_std(noisy[::-1] * 2, 20, min_periods=1))
@@ -0,0 +1,61 @@
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from os.path import join
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from study_lyte.profile import LyteProfileV6
+from study_lyte.sharing import SharedProfile
+
+
+def share_in_worker(filename):
+    """Process a profile in another process and return the handle"""
+    return SharedProfile.from_profile(LyteProfileV6(filename, calibration={'Sensor1': [-1, 4096]}))
+
+
+class TestSharedProfile:
+    @pytest.fixture()
+    def filename(self, data_dir):
+        return join(data_dir, 'kaslo.csv')
+
+    @pytest.fixture()
+    def profile(self, filename):
+        return LyteProfileV6(filename, calibration={'Sensor1': [-1, 4096]})
+
+    @pytest.fixture()
+    def handle(self, profile, tmp_path):
+        handle = SharedProfile.from_profile(profile, directory=tmp_path)
+        yield handle
+        handle.unlink()
+
+    def test_payload_is_small(self, handle):
+        """Arrays should travel in the buffer, not the pickle"""
+        assert len(pickle.dumps(handle)) < 0.05 * handle.nbytes
+
+    def test_computed_stages_kept(self, handle):
+        loaded = handle.load()
+        for attribute in ['_depth', '_start', '_stop', '_surface', '_force', '_nir']:
+            assert getattr(loaded, attribute) is not None
+
+    def test_round_trip(self, profile, handle):
+        loaded = handle.load()
+        pd.testing.assert_series_equal(loaded.depth, profile.depth)
+        pd.testing.assert_frame_equal(loaded.force, profile.force)
+        pd.testing.assert_frame_equal(loaded.nir, profile.nir)
+        assert loaded.surface.nir.index == profile.surface.nir.index
+
+    def test_unlink_keeps_loaded(self, handle):
+        loaded = handle.load()
+        handle.unlink()
+        assert not handle.path.exists()
+        assert np.isfinite(loaded.depth.min())
+
+    def test_from_worker(self, filename, profile):
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            handle = pool.submit(share_in_worker, filename).result()
+        loaded = handle.load()
+        handle.unlink()
+        assert loaded.stop.index == profile.stop.index
+        pd.testing.assert_frame_equal(loaded.force, profile.force)
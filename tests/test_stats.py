@@ -1,4 +1,7 @@
-from study_lyte.stats import required_sample_for_margin, margin_of_error
+from study_lyte.stats import required_sample_for_margin, margin_of_error, bootstrap, bootstrap_regression, \
+    bootstrap_confidence_interval, bootstrap_indices, group_statistics, z_score
+import numpy as np
+import pandas as pd
 import pytest
 
 
@@ -15,4 +18,98 @@ def test_margin_of_error(n, std, confidence, expected):
 ])
 def test_required_sample_for_margin(desired_margin, std, confidence, expected):
     n = required_sample_for_margin(desired_margin, std, confidence=confidence)
-    assert pytest.approx(n, abs=1e-2) == expected
\ No newline at end of file
+    assert pytest.approx(n, abs=1e-2) == expected
+
+
+@pytest.mark.parametrize('confidence, expected', [
+    (0.95, 1.96),
+    ([0.9, 0.95, 0.9], [1.645, 1.96, 1.645]),
+])
+def test_z_score(confidence, expected):
+    np.testing.assert_almost_equal(z_score(confidence), expected, decimal=3)
+
+
+def test_margin_of_error_arrays():
+    """ Arrays broadcast and match the scalar results """
+    n = np.array([5, 10, 20])
+    confidence = np.array([0.95, 0.9, 0.95])
+    result = margin_of_error(n, 8.9, confidence=confidence)
+    expected = [margin_of_error(i, 8.9, confidence=c) for i, c in zip(n, confidence)]
+    np.testing.assert_almost_equal(result, expected)
+    required = required_sample_for_margin(result, 8.9, confidence=confidence)
+    np.testing.assert_almost_equal(required, n)
+
+
+@pytest.fixture()
+def long_df():
+    return pd.DataFrame({'site': ['a', 'a', 'a', 'b', 'b', 'b', 'b'],
+                         'layer': [1, 1, 1, 1, 1, 2, 2],
+                         'hardness': [1.0, 2.0, 3.0, 10.0, 14.0, 5.0, np.nan]})
+
+
+@pytest.mark.parametrize('by, group, column, expected', [
+    ('site', 'a', 'mean', 2),
+    ('site', 'a', 'std', 1),
+    ('site', 'b', 'n', 3),
+    (['site', 'layer'], ('b', 1), 'mean', 12),
+    (['site', 'layer'], ('b', 1), 'margin_of_error', margin_of_error(2, 2 ** 1.5)),
+    (['site', 'layer'], ('a', 1), 'required_sample', required_sample_for_margin(0.5, 1)),
+])
+def test_group_statistics(long_df, by, group, column, expected):
+    result = group_statistics(long_df, by, 'hardness', desired_margin_of_error=0.5)
+    assert result.loc[group, column] == pytest.approx(expected)
+
+
+def test_group_statistics_confidence(long_df):
+    """ A confidence per group is matched by its index """
+    confidence = pd.Series([0.9, 0.95], index=['b', 'a'])
+    result = group_statistics(long_df, 'site', 'hardness', confidence=confidence)
+    assert 'required_sample' not in result.columns
+    assert result.loc['a', 'margin_of_error'] == pytest.approx(margin_of_error(3, 1, confidence=0.95))
+
+
+def test_bootstrap_indices():
+    idx = bootstrap_indices(10, 5, rng=0)
+    assert idx.shape == (5, 10)
+    assert idx.min() >= 0 and idx.max() < 10
+
+
+@pytest.mark.parametrize('batch_size', [None, 7])
+def test_bootstrap_reproducible(batch_size):
+    values = np.arange(20.0)
+    first = bootstrap(values, n_resamples=50, seed=1, batch_size=batch_size)
+    second = bootstrap(values, n_resamples=50, seed=1, batch_size=batch_size)
+    assert len(first) == 50
+    np.testing.assert_equal(first, second)
+
+
+def test_bootstrap_workers():
+    """ Sharding over processes gives the same resamples """
+    values = np.arange(20.0)
+    expected = bootstrap(values, np.median, n_resamples=30, seed=2, batch_size=10)
+    result = bootstrap(values, np.median, n_resamples=30, seed=2, batch_size=10, workers=2)
+    np.testing.assert_equal(result, expected)
+
+
+def test_bootstrap_confidence_interval():
+    values = np.random.default_rng(0).normal(5, 1, 200)
+    lower, upper = bootstrap_confidence_interval(np.append(values, np.nan), n_resamples=500, seed=0)
+    assert lower < 5 < upper
+    assert upper - lower == pytest.approx(2 * margin_of_error(200, 1), rel=0.2)
+
+
+def test_bootstrap_regression():
+    """ Each resample matches solving the resampled rows directly """
+    rng = np.random.default_rng(0)
+    x = np.column_stack([rng.normal(size=30), np.ones(30)])
+    y = 2 * x[:, 0] + 1 + rng.normal(0, 0.1, 30)
+    result = bootstrap_regression(x, y, n_resamples=5, seed=3)
+    idx = bootstrap_indices(30, 5, np.random.SeedSequence(3).spawn(1)[0])
+    expected = [np.linalg.lstsq(x[i], y[i], rcond=None)[0] for i in idx]
+    np.testing.assert_almost_equal(result, expected)
+
+
+def test_bootstrap_regression_degenerate():
+    """ Resamples of a repeated point still solve """
+    result = bootstrap_regression(np.column_stack([[1.0, 2.0], np.ones(2)]), [1.0, 2.0], n_resamples=20, seed=0)
+    assert np.isfinite(result).all()
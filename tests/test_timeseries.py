@@ -0,0 +1,90 @@
+from os.path import join
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from study_lyte.adjustments import get_neutral_bias_at_border
+from study_lyte.depth import AccelerometerDepth, BarometerDepth
+from study_lyte.detect import get_acceleration_start, get_acceleration_stop
+from study_lyte.io import read_csv
+from study_lyte.timeseries import MultiRateTimeseries
+
+
+@pytest.fixture(scope='module')
+def df(data_dir):
+    df, meta = read_csv(join(data_dir, 'hard_surface_hard_stop.csv'))
+    return df
+
+
+@pytest.fixture()
+def data():
+    """ Fast and slow sensors over the same second """
+    fast = pd.DataFrame({'time': np.linspace(0, 1, 101), 'fast': np.linspace(0, 100, 101)})
+    slow = pd.DataFrame({'time': np.linspace(0, 1, 11), 'slow': np.linspace(0, 10, 11)}).set_index('time')
+    return MultiRateTimeseries.from_frames([fast, slow])
+
+
+class TestMultiRateTimeseries:
+    def test_native_rates(self, data):
+        assert data.channels == ['fast', 'slow']
+        assert len(data.values('slow')) == 11
+        assert data.rate('fast') == pytest.approx(100)
+        assert data.rate('slow') == pytest.approx(10)
+
+    def test_align(self, data):
+        """ Defaults to the fastest channel """
+        aligned = data.align()
+        assert len(aligned) == 101
+        np.testing.assert_allclose(aligned['slow'].values, aligned.index.values * 10)
+
+    @pytest.mark.parametrize('start, stop, expected', [(0.25, 0.5, 26), (None, 0.1, 11), (0.95, None, 6)])
+    def test_align_window(self, data, start, stop, expected):
+        aligned = data.align(['fast', 'slow'], start=start, stop=stop)
+        assert len(aligned) == expected
+        np.testing.assert_allclose(aligned['slow'].values, aligned.index.values * 10)
+
+    @pytest.mark.parametrize('time, expected', [(0.44, 4), (0.46, 5), (-1, 0), (2, 10)])
+    def test_index(self, data, time, expected):
+        assert data.index('slow', time) == expected
+
+    @pytest.mark.parametrize('time', [-1, 0.5, 2])
+    def test_index_single_sample(self, data, time):
+        data.add('single', [0.5], [1.0])
+        assert data.index('single', time) == 0
+
+    def test_index_empty(self, data):
+        data.add('empty', [], [])
+        with pytest.raises(ValueError):
+            data.index('empty', 0)
+
+    def test_add_invalid(self, data):
+        with pytest.raises(ValueError):
+            data.add('slow', [0, 1], [0, 1])
+        with pytest.raises(ValueError):
+            data.add('other', [0, 1], [0])
+
+
+class TestMultiRateDepth:
+    def test_barometer_native_rate(self, df):
+        """ Depth from a barometer at a quarter of the rate matches the full rate """
+        full = BarometerDepth(df.set_index('time')['depth'], 5630, 14260)
+        data = MultiRateTimeseries.from_frames([df[['time', 'Y-Axis']], df[['time', 'depth']].iloc[::4]])
+        depth = BarometerDepth(data, 5630 // 4, 14260 // 4, channel='depth')
+
+        assert len(depth.depth) == len(data.values('depth'))
+        assert depth.distance_traveled == pytest.approx(full.distance_traveled, abs=0.1)
+        np.testing.assert_allclose(depth.at(df['time'].values).values, full.depth.values, atol=0.2)
+
+    def test_accelerometer(self, df):
+        neutral = get_neutral_bias_at_border(df['Y-Axis'], fractional_basis=0.01)
+        start = get_acceleration_start(neutral)
+        stop = get_acceleration_stop(get_neutral_bias_at_border(df['Y-Axis'], direction='backward'))
+        data = MultiRateTimeseries.from_frames([pd.DataFrame({'time': df['time'], 'Y-Axis': neutral})])
+        expected = AccelerometerDepth(data.series('Y-Axis'), start, stop)
+        depth = AccelerometerDepth(data, start, stop)
+        np.testing.assert_equal(depth.depth.values, expected.depth.values)
+
+    def test_channel_required(self, data):
+        with pytest.raises(ValueError):
+            BarometerDepth(data, 1, 5)